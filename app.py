@@ -3,6 +3,8 @@ from flask_cors import CORS
 from config import Config
 from database import db
 from search_system import SearchEngine
+from services import admission, metrics, profiler, warmup
+from services.logging_service import get_logger
 import os
 
 # Blueprints (Planos de rutas)
@@ -11,6 +13,7 @@ from routes.payment import payment_bp
 from routes.search import search_bp
 
 app = Flask(__name__, static_folder='static')
+logger = get_logger('app')
 app.config.from_object(Config)
 
 # CORS configuration for production (Render) and development
@@ -21,13 +24,19 @@ CORS(app,
      resources={r"/api/*": {"origins": allowed_origins}},
      supports_credentials=True,
      allow_headers=['Content-Type', 'X-API-Key', 'Authorization'],
-     expose_headers=['Content-Type'],
+     expose_headers=['Content-Type', 'Server-Timing', 'Retry-After'],
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS']
 )
 
 # Inicialización
 db.init_db()
+# Único punto de carga del índice: tras reindexar hay que reiniciar (y el warm-up se repite)
 SearchEngine.load_data()
+metrics.init_app(app)
+profiler.init_app(app)
+admission.init_app(app)
+warmup.init_app(app)
+warmup.start()
 
 # Registro de rutas
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -39,7 +48,7 @@ app.register_blueprint(search_bp, url_prefix='/api')
 def internal_error(error):
     """Handle all 500 errors with JSON response"""
     from flask import jsonify
-    print(f"❌ 500 ERROR HANDLER TRIGGERED: {error}")
+    logger.error("500 error handler triggered: %s", error)
     return jsonify({
         'error': 'Internal server error',
         'details': str(error)
@@ -49,10 +58,7 @@ def internal_error(error):
 def handle_exception(error):
     """Catch-all handler for unhandled exceptions"""
     from flask import jsonify
-    import traceback
-    print(f"❌ UNHANDLED EXCEPTION: {type(error).__name__}")
-    print(f"   Details: {error}")
-    traceback.print_exc()
+    logger.error("Unhandled exception: %s", type(error).__name__, exc_info=error)
     return jsonify({
         'error': 'Unexpected server error',
         'type': type(error).__name__,
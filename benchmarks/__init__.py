@@ -0,0 +1,5 @@
+"""
+Micro-benchmarks del motor de búsqueda y utilidades de texto.
+
+Ejecución: python -m benchmarks.run (ver benchmarks/run.py).
+"""
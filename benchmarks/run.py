@@ -0,0 +1,175 @@
+"""
+Micro-benchmarks de SearchEngine, utilidades de texto y serialización.
+
+    python -m benchmarks.run                                 # todos los casos
+    python -m benchmarks.run -k search --sizes 1000,5000     # filtrar por nombre
+    python -m benchmarks.run --save .benchmarks/base.json    # guardar una referencia
+    python -m benchmarks.run --compare .benchmarks/base.json --threshold 0.15
+
+Con --compare el proceso termina con código 1 si algún caso es más lento que
+la referencia por encima de --threshold (fracción de la mediana), así se puede
+usar como paso de CI. MongoDB es el stand-in en memoria de loadtest y los
+datos son sintéticos (loadtest.catalog): los números solo son comparables
+entre ejecuciones en la misma máquina.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import numpy as np
+
+from benchmarks import runner
+from database import Database
+from loadtest.catalog import build, seed_database
+from loadtest.fake_openai import vector_for
+from loadtest.memory_mongo import MemoryClient
+from search_system import SearchEngine
+from services import serialization
+from utils import limpiar_html, normalizar_texto
+
+TOP_KS = (1, 10, 50, 100)
+SEARCH_CATALOG = 5000
+
+
+def use_catalog(size, dim, workdir):
+    """Siembra un Mongo en memoria y deja embeddings.npy en workdir (directorio actual)"""
+    client = MemoryClient()
+    db = client['benchmarks']
+    seed_database(db, size, dim, workdir, store_embeddings=False)
+    Database.client = client
+    Database.db = db
+    os.chdir(workdir)
+
+
+def load_data_cases(sizes, dim, workdir):
+    for size in sizes:
+        def setup(size=size):
+            use_catalog(size, dim, os.path.join(workdir, f"load_{size}"))
+            return SearchEngine.load_data
+        yield f"load_data[{size}]", setup
+
+
+def search_cases(dim, workdir):
+    state = {}
+
+    def prepare():
+        if not state:
+            use_catalog(SEARCH_CATALOG, dim, os.path.join(workdir, 'search'))
+            SearchEngine.load_data()
+            state['queries'] = [vector_for(f"query {i}", dim) for i in range(64)]
+            state['n'] = 0
+        os.chdir(os.path.join(workdir, 'search'))
+        return state
+
+    def next_query():
+        state['n'] += 1
+        return state['queries'][state['n'] % len(state['queries'])]
+
+    for top_k in TOP_KS:
+        def setup_rank(top_k=top_k):
+            prepare()
+            return lambda: SearchEngine.rank(next_query(), top_k)
+
+        def setup_search(top_k=top_k):
+            prepare()
+            return lambda: SearchEngine.search(next_query(), top_k)
+
+        yield f"rank[top_k={top_k}]", setup_rank
+        yield f"search[top_k={top_k}]", setup_search
+
+
+def text_cases():
+    docs, _ = build(1000, 8)
+    descriptions = [d['description'] for d in docs]
+    cleaned = [limpiar_html(d) for d in descriptions]
+    # Texto con acentos y mayúsculas, como las consultas reales
+    queries = [f"Ánime de acción con CORAZÓN {i} y música épica" for i in range(1000)]
+
+    yield "limpiar_html[1000 descripciones]", lambda: lambda: [limpiar_html(d) for d in descriptions]
+    yield "normalizar_texto[1000 descripciones]", lambda: lambda: [normalizar_texto(d) for d in cleaned]
+    yield "normalizar_texto[1000 consultas]", lambda: lambda: [normalizar_texto(q) for q in queries]
+
+
+def serialization_cases():
+    docs, vectors = build(50, 256)
+    for doc, vector in zip(docs, vectors):
+        doc['embedding'] = vector.tolist()
+    ranked = [(doc['id'], 90.0 - i) for i, doc in enumerate(docs)]
+    by_id = {doc['id']: doc for doc in docs}
+
+    def hydrate(ids):
+        return {i: by_id[i] for i in ids}
+
+    def cold():
+        serialization.clear()
+        return serialization.card_fragments(ranked, 'bench', hydrate)
+
+    def warm_setup():
+        serialization.clear()
+        serialization.card_fragments(ranked, 'bench', hydrate)
+        return lambda: serialization.fragment_response({'count': 50}, {'results': serialization.card_fragments(ranked, 'bench', hydrate)})
+
+    cards = [{field: d[field] for field in serialization.CARD_FIELDS if field in d} for d in docs]
+
+    yield "serialize.dumps[50 animes]", lambda: lambda: serialization.dumps(cards)
+    yield "serialize.card_fragments_cold[50]", lambda: cold
+    yield "serialize.response_warm[50]", warm_setup
+
+
+def collect_cases(sizes, dim, workdir):
+    yield from load_data_cases(sizes, dim, workdir)
+    yield from search_cases(dim, workdir)
+    yield from text_cases()
+    yield from serialization_cases()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks del motor de búsqueda')
+    parser.add_argument('-k', dest='keyword', default=None, help='Solo los casos cuyo nombre contiene este texto')
+    parser.add_argument('--sizes', default='1000,5000,20000', help='Tamaños de catálogo para load_data')
+    parser.add_argument('--dim', type=int, default=256, help='Dimensión de los embeddings sintéticos')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Segundos mínimos por caso')
+    parser.add_argument('--save', default=None, help='Guardar resultados en este JSON')
+    parser.add_argument('--compare', default=None, help='JSON de referencia con el que comparar')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Regresión máxima tolerada (0.10 = 10%%)')
+    args = parser.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(',') if x.strip()]
+    cwd = os.getcwd()
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='otaku_bench_') as workdir:
+        try:
+            for name, setup in collect_cases(sizes, args.dim, workdir):
+                if args.keyword and args.keyword not in name:
+                    continue
+                func = setup()
+                results[name] = runner.measure(func, min_time=args.min_time)
+                print(f"  {name}: {runner.fmt_time(results[name]['median'])}", flush=True)
+        finally:
+            os.chdir(cwd)
+
+    print()
+    runner.print_results(results)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        runner.save(args.save, results)
+        print(f"\nResultados guardados en {args.save}")
+
+    if args.compare:
+        rows = runner.compare(results, runner.load(args.compare), args.threshold)
+        print()
+        runner.print_comparison(rows, args.threshold)
+        if any(r['regression'] for r in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
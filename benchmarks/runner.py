@@ -0,0 +1,130 @@
+"""
+Medición, guardado y comparación de benchmarks (al estilo de pytest-benchmark).
+
+Cada caso se calibra para que una ronda dure al menos MIN_ROUND_SECONDS y se
+repite hasta completar min_time; la comparación usa la mediana por llamada.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+MIN_ROUND_SECONDS = 0.005
+
+
+def calibrate(func):
+    """Número de llamadas por ronda para que la ronda no quede por debajo de la resolución del reloj"""
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_ROUND_SECONDS or iterations >= 1 << 20:
+            return iterations
+        iterations *= 10 if elapsed < MIN_ROUND_SECONDS / 10 else 2
+
+
+def measure(func, min_time=0.5, min_rounds=5, max_rounds=1000):
+    """Estadísticas en segundos por llamada: min, median, mean, stddev, ops"""
+    func()  # calentamiento (imports perezosos, cachés de CPU, etc.)
+    iterations = calibrate(func)
+    rounds = []
+    deadline = time.perf_counter() + min_time
+    while len(rounds) < max_rounds and (len(rounds) < min_rounds or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        rounds.append((time.perf_counter() - start) / iterations)
+
+    median = statistics.median(rounds)
+    return {
+        'rounds': len(rounds),
+        'iterations': iterations,
+        'min': min(rounds),
+        'median': median,
+        'mean': statistics.fmean(rounds),
+        'stddev': statistics.stdev(rounds) if len(rounds) > 1 else 0.0,
+        'ops': 1 / median if median else 0.0,
+    }
+
+
+def machine_info():
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    try:
+        info['commit'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        info['commit'] = None
+    return info
+
+
+def save(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'machine': machine_info(), 'benchmarks': results}, f, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['benchmarks']
+
+
+def compare(current, baseline, threshold=0.10):
+    """
+    Compara medianas contra una ejecución guardada.
+
+    Devuelve [{name, baseline, current, change, regression}] con change como
+    fracción (+0.25 = 25% más lento). Los casos que no están en ambas se ignoran.
+    """
+    rows = []
+    for name, stats in current.items():
+        base = baseline.get(name)
+        if not base or not base.get('median'):
+            continue
+        change = stats['median'] / base['median'] - 1
+        rows.append({
+            'name': name,
+            'baseline': base['median'],
+            'current': stats['median'],
+            'change': change,
+            'regression': change > threshold,
+        })
+    return rows
+
+
+def fmt_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def print_results(results, out=sys.stdout):
+    width = max((len(n) for n in results), default=10)
+    print(f"{'benchmark':<{width}} {'min':>10} {'median':>10} {'stddev':>10} {'ops/s':>12} {'rounds':>7}", file=out)
+    for name, s in results.items():
+        print(f"{name:<{width}} {fmt_time(s['min']):>10} {fmt_time(s['median']):>10} "
+              f"{fmt_time(s['stddev']):>10} {s['ops']:>12.1f} {s['rounds']:>7}", file=out)
+
+
+def print_comparison(rows, threshold, out=sys.stdout):
+    width = max((len(r['name']) for r in rows), default=10)
+    print(f"{'benchmark':<{width}} {'baseline':>10} {'actual':>10} {'cambio':>9}", file=out)
+    for r in rows:
+        flag = '  REGRESIÓN' if r['regression'] else ''
+        print(f"{r['name']:<{width}} {fmt_time(r['baseline']):>10} {fmt_time(r['current']):>10} "
+              f"{r['change'] * 100:>+8.1f}%{flag}", file=out)
+    regressions = sum(r['regression'] for r in rows)
+    print(f"\n{regressions} regresión(es) por encima del {threshold * 100:.0f}%", file=out)
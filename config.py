@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables (.env must be in the root directory)
@@ -22,6 +23,91 @@ class Config:
     OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
     EMBEDDING_MODEL = "text-embedding-3-large"
     
+    # Embedding de consultas: presupuesto de latencia y circuit breaker por worker
+    EMBEDDING_TIMEOUT = float(os.environ.get('EMBEDDING_TIMEOUT', 3.0))  # segundos, sin reintentos
+    EMBEDDING_SLOW_MS = float(os.environ.get('EMBEDDING_SLOW_MS', 1500))  # más lento cuenta como fallo
+    EMBEDDING_CACHE_SIZE = int(os.environ.get('EMBEDDING_CACHE_SIZE', 10000))  # vectores de consulta
+    BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 5))  # fallos seguidos
+    BREAKER_RESET_SECONDS = float(os.environ.get('BREAKER_RESET_SECONDS', 30))
+    # Coalescencia entre workers: directorio compartido con un lock por consulta (vacío = solo en el worker)
+    EMBEDDING_SHARED_DIR = os.environ.get('EMBEDDING_SHARED_DIR', '')
+    EMBEDDING_SHARED_TTL = float(os.environ.get('EMBEDDING_SHARED_TTL', 600))  # segundos
+    
+    # Control de admisión: llamadas de embedding simultáneas por worker y cola por prioridad
+    ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 4))  # 0 = sin límite
+    ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 16))
+    ADMISSION_MAX_WAIT = os.environ.get('ADMISSION_MAX_WAIT', 'premium=10,free=4,anonymous=1.5')  # segundos
+    
+    # Caché semántica: reutiliza el ranking de consultas casi idénticas (paráfrasis)
+    SEMANTIC_CACHE_SIZE = int(os.environ.get('SEMANTIC_CACHE_SIZE', 2000))  # 0 = desactivada
+    SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.97))  # coseno mínimo
+    SEMANTIC_CACHE_AUDIT_RATE = float(os.environ.get('SEMANTIC_CACHE_AUDIT_RATE', 0.05))  # aciertos que se verifican
+    
+    # Caché de resultados exactos (consulta normalizada, top_k): LRU local + ficheros compartidos entre workers
+    RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 5000))  # 0 = desactivada
+    RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'otakudescriptor_results'))  # vacío = solo local
+    RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 3600))  # segundos (nivel compartido)
+    RESULT_CACHE_MAX_FILES = int(os.environ.get('RESULT_CACHE_MAX_FILES', 20000))
+    
+    # Warm-up al arrancar: consultas más frecuentes de los logs de búsqueda -> cachés
+    WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'true').lower() == 'true'
+    WARMUP_TOP_N = int(os.environ.get('WARMUP_TOP_N', 500))  # consultas distintas
+    WARMUP_WINDOW_HOURS = float(os.environ.get('WARMUP_WINDOW_HOURS', 72))
+    WARMUP_TOP_K = int(os.environ.get('WARMUP_TOP_K', 10))  # top_k con el que se precalculan resultados
+    WARMUP_BATCH_SIZE = int(os.environ.get('WARMUP_BATCH_SIZE', 100))  # textos por llamada de embeddings
+    WARMUP_MAX_SECONDS = float(os.environ.get('WARMUP_MAX_SECONDS', 60))
+    WARMUP_BACKGROUND = os.environ.get('WARMUP_BACKGROUND', 'false').lower() == 'true'  # no bloquear el arranque
+    # Lo fija gunicorn.conf.py con preload_app: el warm-up en segundo plano se lanza en cada worker
+    WARMUP_AFTER_FORK = os.environ.get('WARMUP_AFTER_FORK', 'false').lower() == 'true'
+    
+    # Pipeline de datos (descarga, enriquecimiento, embeddings)
+    BULK_WRITE_BATCH_SIZE = int(os.environ.get('BULK_WRITE_BATCH_SIZE', 500))  # operaciones por bulk_write
+    ENRICH_WORKERS = int(os.environ.get('ENRICH_WORKERS', 8))  # llamadas al LLM en paralelo
+    ENRICH_RPM = int(os.environ.get('ENRICH_RPM', 500))  # límite de peticiones/minuto del modelo
+    ENRICH_TPM = int(os.environ.get('ENRICH_TPM', 200000))  # límite de tokens/minuto del modelo
+    ENRICH_MAX_RETRIES = int(os.environ.get('ENRICH_MAX_RETRIES', 5))  # reintentos por anime (429, 5xx, red)
+    ENRICH_PACK_SIZE = int(os.environ.get('ENRICH_PACK_SIZE', 5))  # animes por petición al LLM (1 = sin empaquetar)
+    BATCH_DIR = os.environ.get('BATCH_DIR', 'batches')  # ficheros JSONL del modo --batch
+    BATCH_POLL_SECONDS = float(os.environ.get('BATCH_POLL_SECONDS', 60))
+    BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 50000))  # límite de OpenAI por fichero
+    
+    # Facetas (conteos por género/formato/década/estudio)
+    FACET_LIMIT = int(os.environ.get('FACET_LIMIT', 20))  # valores por faceta
+    FACET_BUDGET_MS = float(os.environ.get('FACET_BUDGET_MS', 5))
+    
+    # Atajo por título: si la consulta es un título conocido no se llama a OpenAI
+    TITLE_SHORTCUT_ENABLED = os.environ.get('TITLE_SHORTCUT_ENABLED', 'true').lower() == 'true'
+    TITLE_SHORTCUT_MAX_EDITS = int(os.environ.get('TITLE_SHORTCUT_MAX_EDITS', 2))
+    
+    # Serialización: fragmentos JSON pre-codificados por anime (card/detail)
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 20000))
+    
+    # Fichas de detalle (/api/anime/<id>): LRU en proceso + ETag / Cache-Control
+    DETAIL_CACHE_SIZE = int(os.environ.get('DETAIL_CACHE_SIZE', 5000))
+    DETAIL_MAX_AGE = int(os.environ.get('DETAIL_MAX_AGE', 300))  # segundos
+    
+    # Métricas (Server-Timing + /metrics en formato Prometheus)
+    # Cada worker vuelca sus contadores en METRICS_DIR; /metrics los suma todos
+    METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'otakudescriptor_metrics'))
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))  # segundos
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # opcional: exige 'Authorization: Bearer <token>'
+    
+    # Logging (JSON por línea, escrito desde un hilo aparte)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    # Muestreo de INFO/DEBUG por endpoint, ej. 'search.search_semantic=0.1,*=1'
+    LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', '*=1')
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    
+    # Perfilado bajo demanda (pilas colapsadas para flame graphs)
+    PROFILE_ADMIN_TOKEN = os.environ.get('PROFILE_ADMIN_TOKEN')  # cabecera X-Profile
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # 0.01 = 1% de las peticiones
+    PROFILE_STARTUP = os.environ.get('PROFILE_STARTUP', 'false').lower() == 'true'  # perfilar load_data
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'otakudescriptor_profiles'))
+    PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+    PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', 30))
+    PROFILE_MAX_CONCURRENT = int(os.environ.get('PROFILE_MAX_CONCURRENT', 1))  # por worker
+    PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 200))
+    
     # PayPal
     PAYPAL_CLIENT_ID = os.environ.get("PAYPAL_CLIENT_ID")
     PAYPAL_CLIENT_SECRET = os.environ.get("PAYPAL_CLIENT_SECRET")
@@ -1,38 +1,51 @@
+import threading
 from pymongo import MongoClient
 from config import Config
+from services.logging_service import get_logger
+
+logger = get_logger('database')
 
 class Database:
     client = None
     db = None
+    _lock = threading.Lock()
 
     @classmethod
-    def init_db(cls):
-        if not cls.client:
-            print("Conectando a MongoDB Atlas...")
-            print(f"URI: {Config.MONGO_URI[:50]}...")
-            print(f"Base de datos: {Config.DB_NAME}")
+    def init_db(cls, client=None):
+        # client permite inyectar un cliente ya creado (p. ej. el stand-in en memoria de loadtest)
+        # MongoClient es seguro entre hilos; solo la creación necesita el lock
+        if cls.client:
+            return
+        with cls._lock:
+            if cls.client:
+                return
+            logger.info("Conectando a MongoDB Atlas", extra={'uri': Config.MONGO_URI[:50], 'db_name': Config.DB_NAME})
             try:
                 # Conectar con timeout de 10 segundos
-                cls.client = MongoClient(
-                    Config.MONGO_URI,
-                    serverSelectionTimeoutMS=10000,
-                    connectTimeoutMS=10000
-                )
+                if client is None:
+                    client = MongoClient(
+                        Config.MONGO_URI,
+                        serverSelectionTimeoutMS=10000,
+                        connectTimeoutMS=10000
+                    )
                 
                 # Verificar conexión
-                cls.client.admin.command('ping')
-                print("✓ Ping exitoso a MongoDB Atlas")
+                client.admin.command('ping')
+                logger.debug("Ping exitoso a MongoDB Atlas")
                 
-                cls.db = cls.client[Config.DB_NAME]
+                database = client[Config.DB_NAME]
                 
                 # Crear índices
-                cls.db.users.create_index("email", unique=True, sparse=True)
-                cls.db.users.create_index("api_key", unique=True)
-                cls.db.users.create_index("google_id", unique=True, sparse=True)
-                print("✓ MongoDB conectado y configurado correctamente")
+                database.users.create_index("email", unique=True, sparse=True)
+                database.users.create_index("api_key", unique=True)
+                database.users.create_index("google_id", unique=True, sparse=True)
+                
+                # Publicar al final: otros hilos solo ven un cliente ya listo
+                cls.db = database
+                cls.client = client
+                logger.info("MongoDB conectado y configurado correctamente")
             except Exception as e:
-                print(f"X Error conectando a MongoDB: {e}")
-                print(f"X Tipo de error: {type(e).__name__}")
+                logger.error("Error conectando a MongoDB: %s", e, extra={'error_type': type(e).__name__})
                 raise
 
 db = Database
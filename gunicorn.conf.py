@@ -5,8 +5,13 @@ import os
 bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
 
 # Worker processes
-workers = 2
-worker_class = 'sync'
+# 'gthread' (por defecto): cada worker atiende varias peticiones en hilos, así
+# una llamada lenta a OpenAI no bloquea estáticos ni /api/anime/<id>.
+# SearchEngine, Database y las cachés son seguros entre hilos.
+# GUNICORN_WORKER_CLASS=sync vuelve al modo anterior (1 petición por worker).
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
 
 # Timeouts (INCREASED to handle SMTP delays)
 timeout = 120  # Increased from default 30s to 120s
@@ -31,3 +36,19 @@ tmp_upload_dir = None
 
 # Preload app for faster worker spawn
 preload_app = True
+# Los hilos del master no sobreviven al fork: con WARMUP_BACKGROUND=true el
+# warm-up no arranca en el master y cada worker lanza el suyo en post_fork
+os.environ['WARMUP_AFTER_FORK'] = 'true' if preload_app else 'false'
+
+# Server hooks
+def on_starting(server):
+    # Las métricas se agregan desde ficheros por worker: limpiar los de arranques previos
+    from services import metrics
+    metrics.reset_shared_dir()
+    # Con preload_app el master ya cargó la app (load_data, warm-up): volcarlo antes
+    # del fork, porque los workers empiezan con el registro vacío
+    metrics.flush(force=True)
+
+def post_fork(server, worker):
+    from services import warmup
+    warmup.start_after_fork()
@@ -0,0 +1,4 @@
+"""
+Herramientas de prueba de carga para OtakuDescriptor.
+Se ejecutan contra un servidor ya levantado (local o staging).
+"""
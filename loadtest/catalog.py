@@ -0,0 +1,84 @@
+"""
+Catálogo sintético para pruebas de carga y benchmarks.
+
+Genera documentos con la misma forma que los de AniList enriquecidos
+(títulos, géneros, estudios, tags, descripción...) y el embeddings.npy
+correspondiente, ordenado por 'id' como espera SearchEngine.
+"""
+import os
+import random
+
+import numpy as np
+
+from loadtest.fake_openai import vector_for
+
+GENRES = ['Action', 'Adventure', 'Comedy', 'Drama', 'Fantasy', 'Horror', 'Mecha', 'Music',
+          'Mystery', 'Psychological', 'Romance', 'Sci-Fi', 'Slice of Life', 'Sports', 'Supernatural', 'Thriller']
+FORMATS = ['TV', 'TV_SHORT', 'MOVIE', 'OVA', 'ONA', 'SPECIAL']
+STUDIOS = ['MAPPA', 'Wit Studio', 'Bones', 'Kyoto Animation', 'Madhouse', 'Production I.G',
+           'Sunrise', 'ufotable', 'Trigger', 'Shaft', 'A-1 Pictures', 'CloverWorks']
+TAGS = ['Time Travel', 'Military', 'Gore', 'Isekai', 'Cooking', 'Tragedy', 'School', 'Found Family',
+        'Revenge', 'Space', 'Idol', 'Detective', 'Survival', 'Magic', 'Post-Apocalyptic']
+WORDS = ['shingeki', 'kimi', 'sora', 'hoshi', 'yume', 'tokyo', 'kaze', 'hikari', 'kokoro', 'mirai',
+         'sekai', 'tenshi', 'yoru', 'hana', 'ryuu', 'kage', 'natsu', 'fuyu', 'majo', 'senshi']
+EN_WORDS = ['attack', 'your', 'sky', 'star', 'dream', 'tokyo', 'wind', 'light', 'heart', 'future',
+            'world', 'angel', 'night', 'flower', 'dragon', 'shadow', 'summer', 'winter', 'witch', 'warrior']
+
+
+def make_anime(anime_id, rnd):
+    n = rnd.randint(1, 3)
+    picks = [rnd.randrange(len(WORDS)) for _ in range(n)]
+    romaji = ' '.join(WORDS[i] for i in picks).title() + f" {anime_id}"
+    english = ' '.join(EN_WORDS[i] for i in picks).title() + f" {anime_id}"
+    genres = rnd.sample(GENRES, rnd.randint(1, 4))
+    tags = rnd.sample(TAGS, rnd.randint(2, 5))
+    description = (f"<p>A {genres[0].lower()} story about {tags[0].lower()}.</p><br>"
+                   + ' '.join(rnd.choice(EN_WORDS) for _ in range(rnd.randint(40, 120))))
+    return {
+        'id': anime_id,
+        'idMal': 100000 + anime_id,
+        'title': {'romaji': romaji, 'english': english, 'native': None},
+        'main_title': english,
+        'synonyms': [romaji.split()[0] + f" {anime_id}"],
+        'description': description,
+        'enhanced_description': description.replace('<p>', '').replace('</p><br>', ' '),
+        'genres': genres,
+        'tags': tags,
+        'vibe_keywords': rnd.sample(EN_WORDS, 3),
+        'format': rnd.choice(FORMATS),
+        'year': rnd.choice([None] + list(range(1985, 2026))),
+        'studios': [rnd.choice(STUDIOS)],
+        'popularity': int(rnd.paretovariate(1.2) * 1000),
+        'averageScore': rnd.randint(40, 92),
+        'episodes': rnd.choice([1, 12, 13, 24, 26, 50]),
+        'cover_image': f"https://example.invalid/covers/{anime_id}.jpg",
+    }
+
+
+def build(size, dim, seed=42):
+    """Devuelve (docs, matriz de embeddings float32 ordenada por id)"""
+    rnd = random.Random(seed)
+    docs = []
+    vectors = np.empty((size, dim), dtype=np.float32)
+    for i in range(size):
+        doc = make_anime(i + 1, rnd)
+        vectors[i] = vector_for(f"{doc['main_title']} {' '.join(doc['genres'])}", dim)
+        docs.append(doc)
+    return docs, vectors
+
+
+def seed_database(db, size, dim, workdir, seed=42, store_embeddings=True):
+    """
+    Inserta el catálogo en db.animes y escribe workdir/embeddings.npy.
+
+    Con store_embeddings=True cada documento guarda también su vector, como en
+    producción (así la proyección {'embedding': 0} tiene el mismo efecto).
+    """
+    docs, vectors = build(size, dim, seed)
+    for doc, vector in zip(docs, vectors):
+        doc['embedding'] = vector.tolist() if store_embeddings else True
+    db.animes.insert_many(docs)
+    db.animes.create_index('id', unique=True)
+    os.makedirs(workdir, exist_ok=True)
+    np.save(os.path.join(workdir, 'embeddings.npy'), vectors)
+    return [doc['id'] for doc in docs]
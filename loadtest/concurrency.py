@@ -0,0 +1,138 @@
+"""
+Mide cómo escala el throughput de un endpoint con la concurrencia.
+
+Uso (con la app corriendo, p. ej. `gunicorn -c gunicorn.conf.py app:app`):
+
+    python -m loadtest.concurrency --url http://localhost:5000 --levels 1,2,4,8,16
+    python -m loadtest.concurrency --endpoint detail --levels 1,8,32 --duration 20
+
+Cada nivel lanza N clientes en hilos durante --duration segundos. Para /api/search
+cada cliente usa un User-Agent distinto, así el límite anónimo (10/día por
+sesión) no convierte la prueba en una prueba de 429s.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+QUERIES = [
+    "anime about time travel that makes you cry",
+    "dark fantasy with a tragic hero",
+    "wholesome slice of life with cooking",
+    "mecha war drama with political intrigue",
+    "isekai where the protagonist is overpowered",
+    "sports anime about volleyball",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(pct / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def build_request(base_url, endpoint, n, anime_ids):
+    """Construye la petición n-ésima para el endpoint elegido"""
+    if endpoint == 'search':
+        body = json.dumps({'query': QUERIES[n % len(QUERIES)], 'top_k': 10}).encode()
+        return urllib.request.Request(
+            f"{base_url}/api/search",
+            data=body,
+            headers={'Content-Type': 'application/json', 'User-Agent': f'loadtest/{n}'},
+            method='POST'
+        )
+    if endpoint == 'detail':
+        return urllib.request.Request(f"{base_url}/api/anime/{anime_ids[n % len(anime_ids)]}")
+    if endpoint == 'browse':
+        return urllib.request.Request(f"{base_url}/api/animes?page={n % 10 + 1}&per_page=24")
+    return urllib.request.Request(f"{base_url}/")
+
+
+def run_level(base_url, endpoint, concurrency, duration, anime_ids, timeout=130):
+    """Ejecuta un nivel de concurrencia y devuelve sus métricas"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            req = build_request(base_url, endpoint, next(counter), anime_ids)
+            start = time.perf_counter()
+            ok = True
+            try:
+                with urllib.request.urlopen(req, timeout=timeout) as resp:
+                    resp.read()
+            except urllib.error.HTTPError as e:
+                ok = e.code < 500
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def print_table(rows):
+    print(f"{'conc':>5} {'reqs':>7} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'speedup':>8}")
+    base = rows[0]['rps'] if rows and rows[0]['rps'] else None
+    for r in rows:
+        speedup = f"{r['rps'] / base:.2f}x" if base else '-'
+        print(f"{r['concurrency']:>5} {r['requests']:>7} {r['errors']:>5} {r['rps']:>9.1f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {speedup:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput vs concurrencia de un endpoint')
+    parser.add_argument('--url', default='http://localhost:5000', help='URL base del servidor')
+    parser.add_argument('--endpoint', choices=['search', 'detail', 'browse', 'static'], default='search')
+    parser.add_argument('--levels', default='1,2,4,8,16', help='Niveles de concurrencia separados por coma')
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos por nivel')
+    parser.add_argument('--ids', default='1,5,20,21,30', help='IDs para el endpoint detail')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados en JSON')
+    args = parser.parse_args()
+
+    levels = [int(x) for x in args.levels.split(',') if x.strip()]
+    anime_ids = [int(x) for x in args.ids.split(',') if x.strip()]
+    base_url = args.url.rstrip('/')
+
+    rows = []
+    for level in levels:
+        rows.append(run_level(base_url, args.endpoint, level, args.duration, anime_ids))
+        if not args.json:
+            print(f"  nivel {level}: {rows[-1]['rps']:.1f} req/s", flush=True)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print()
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Servidor local que imita la API de OpenAI para pruebas de carga y del pipeline.
+
+- POST /v1/embeddings: vectores deterministas (sembrados con sha256 del texto)
+  con latencia configurable, así las pruebas no gastan cuota ni dependen de la red.
+- POST /v1/chat/completions: un JSON de enriquecimiento determinista; si el
+  prompt trae varios animes (líneas '### <id>'), un objeto con una clave por id.
+- Batch API: POST /v1/files (multipart), GET /v1/files/{id}/content,
+  POST /v1/batches, GET /v1/batches[/{id}]. Un batch pasa a in_progress y, tras
+  --batch-seconds, a completed con sus ficheros de salida y de errores.
+
+    python -m loadtest.fake_openai --port 8765 --dim 256 --latency-ms 150 --jitter-ms 50
+
+La app lo usa exportando OPENAI_BASE_URL=http://127.0.0.1:8765/v1 (el SDK lo lee al crear el cliente).
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+def vector_for(text, dim):
+    """Vector unitario determinista para un texto"""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:4], 'little')
+    v = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def enrichment_for(text):
+    """Respuesta de enriquecimiento determinista para un prompt"""
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()[:8]
+    return {
+        'world_lore': f"Mundo de prueba {digest}.",
+        'vibe_check': f"Vibe de prueba {digest}.",
+        'vibe_keywords': [f"kw-{digest}", "test"]
+    }
+
+
+def _error(message):
+    return {'error': {'message': message, 'type': 'invalid_request_error'}}
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length)
+        path = self.path.rstrip('/')
+        if path == '/v1/files':
+            return self._send(*self.server.upload(self.headers.get('Content-Type', ''), raw))
+        try:
+            data = json.loads(raw or b'{}')
+        except ValueError:
+            return self._send(400, _error('Invalid JSON'))
+
+        server = self.server
+        if path == '/v1/batches':
+            return self._send(*server.create_batch(data))
+        if path not in ('/v1/embeddings', '/v1/chat/completions'):
+            return self._send(404, _error(f'Unknown path {self.path}'))
+
+        delay = server.latency + random.uniform(-server.jitter, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        self._send(*server.dispatch(path, data))
+
+    def do_GET(self):
+        parts = self.path.rstrip('/').split('?')[0].split('/')[1:]  # ['v1', 'batches', id]
+        server = self.server
+        with server.lock:
+            if parts[1:] == ['batches']:
+                return self._send(200, {'object': 'list', 'data': list(server.batches.values()), 'has_more': False})
+            if len(parts) == 3 and parts[1] == 'batches' and parts[2] in server.batches:
+                return self._send(200, server.batches[parts[2]])
+            if len(parts) == 4 and parts[1] == 'files' and parts[3] == 'content' and parts[2] in server.files:
+                body = server.files[parts[2]]['content']
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+        self._send(404, _error(f'Unknown path {self.path}'))
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, dim=256, latency_ms=0.0, jitter_ms=0.0, batch_seconds=1.0, batch_error_every=0):
+        super().__init__(address, FakeOpenAIHandler)
+        self.dim = dim
+        self.latency = latency_ms / 1000
+        self.jitter = min(jitter_ms, latency_ms) / 1000
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.inputs = 0
+        self.files = {}
+        self.batches = {}
+        self.batch_seconds = batch_seconds
+        self.batch_error_every = batch_error_every  # cada N peticiones de un batch, una falla (0 = nunca)
+
+    def dispatch(self, path, data):
+        """(status, cuerpo) de una petición a un endpoint; sirve para síncrono y batch"""
+        if path == '/v1/chat/completions':
+            return self._chat(data)
+        return self._embeddings(data)
+
+    def _embeddings(self, data):
+        inputs = data.get('input')
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        if not inputs or not all(isinstance(t, str) for t in inputs):
+            return 400, _error('input must be a string or list of strings')
+        with self.lock:
+            self.requests += 1
+            self.inputs += len(inputs)
+
+        dim = data.get('dimensions') or self.dim
+        use_base64 = data.get('encoding_format') == 'base64'
+        items = []
+        for i, text in enumerate(inputs):
+            vector = vector_for(text, dim)
+            embedding = base64.b64encode(vector.tobytes()).decode() if use_base64 else vector.tolist()
+            items.append({'object': 'embedding', 'index': i, 'embedding': embedding})
+        tokens = sum(len(t.split()) for t in inputs)
+        return 200, {
+            'object': 'list',
+            'data': items,
+            'model': data.get('model', 'fake'),
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}
+        }
+
+    def _chat(self, data):
+        messages = data.get('messages') or []
+        if not messages:
+            return 400, _error('messages is required')
+        prompt = messages[-1].get('content') or ''
+        with self.lock:
+            self.requests += 1
+            self.inputs += 1
+        ids = re.findall(r'^### (\S+)$', prompt, re.M)
+        if ids:
+            result = {anime_id: enrichment_for(f"{anime_id}:{prompt}") for anime_id in ids}
+        else:
+            result = enrichment_for(prompt)
+        content = json.dumps(result, ensure_ascii=False)
+        tokens = sum(len((m.get('content') or '').split()) for m in messages)
+        completion = len(content.split())
+        return 200, {
+            'id': f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': data.get('model', 'fake'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': tokens, 'completion_tokens': completion, 'total_tokens': tokens + completion}
+        }
+
+    # --- Batch API ---
+
+    def _store_file(self, content, filename, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        meta = {'id': file_id, 'object': 'file', 'bytes': len(content), 'created_at': int(time.time()),
+                'filename': filename, 'purpose': purpose}
+        with self.lock:
+            self.files[file_id] = dict(meta, content=content)
+        return meta
+
+    def upload(self, content_type, raw):
+        message = BytesParser(policy=default_policy).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + raw)
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            fields[name] = (part.get_filename(), part.get_payload(decode=True))
+        if 'file' not in fields:
+            return 400, _error('file is required')
+        filename, content = fields['file']
+        purpose = (fields.get('purpose') or (None, b'batch'))[1].decode()
+        return 200, self._store_file(content, filename or 'upload.jsonl', purpose)
+
+    def create_batch(self, data):
+        with self.lock:
+            source = self.files.get(data.get('input_file_id'))
+        if source is None:
+            return 400, _error('input_file_id not found')
+        lines = [json.loads(line) for line in source['content'].decode('utf-8').splitlines() if line.strip()]
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        batch = {
+            'id': batch_id, 'object': 'batch', 'endpoint': data.get('endpoint'),
+            'input_file_id': data['input_file_id'], 'completion_window': data.get('completion_window', '24h'),
+            'status': 'validating', 'output_file_id': None, 'error_file_id': None,
+            'created_at': int(time.time()), 'completed_at': None, 'errors': None,
+            'request_counts': {'total': len(lines), 'completed': 0, 'failed': 0},
+            'metadata': data.get('metadata') or {}
+        }
+        with self.lock:
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._run_batch, args=(batch_id, lines), daemon=True).start()
+        return 200, batch
+
+    def _run_batch(self, batch_id, lines):
+        with self.lock:
+            self.batches[batch_id]['status'] = 'in_progress'
+        time.sleep(self.batch_seconds)
+        output, errors = [], []
+        for n, line in enumerate(lines, 1):
+            result = {'id': f"batch_req_{uuid.uuid4().hex[:16]}", 'custom_id': line.get('custom_id'), 'error': None}
+            if self.batch_error_every and n % self.batch_error_every == 0:
+                result['response'] = {'status_code': 500, 'body': _error('simulated failure')}
+                errors.append(result)
+                continue
+            status, body = self.dispatch(line.get('url', '').rstrip('/'), line.get('body') or {})
+            result['response'] = {'status_code': status, 'request_id': uuid.uuid4().hex, 'body': body}
+            (output if status == 200 else errors).append(result)
+
+        def as_file(results, name):
+            if not results:
+                return None
+            content = ''.join(json.dumps(r) + '\n' for r in results).encode('utf-8')
+            return self._store_file(content, name, 'batch_output')['id']
+
+        output_id = as_file(output, f"{batch_id}_output.jsonl")
+        error_id = as_file(errors, f"{batch_id}_error.jsonl")
+        with self.lock:
+            batch = self.batches[batch_id]
+            batch.update(status='completed', output_file_id=output_id, error_file_id=error_id,
+                         completed_at=int(time.time()),
+                         request_counts={'total': len(lines), 'completed': len(output), 'failed': len(errors)})
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_in_thread(port=0, **kwargs):
+    """Arranca el servidor en un hilo daemon y lo devuelve (port=0: puerto libre)"""
+    server = FakeOpenAIServer(('127.0.0.1', port), **kwargs)
+    threading.Thread(target=server.serve_forever, name='fake-openai', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor falso de embeddings de OpenAI')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--dim', type=int, default=256, help='Dimensión de los vectores (debe coincidir con embeddings.npy)')
+    parser.add_argument('--latency-ms', type=float, default=150.0, help='Latencia media simulada')
+    parser.add_argument('--jitter-ms', type=float, default=50.0, help='Variación uniforme +/- sobre la latencia')
+    parser.add_argument('--batch-seconds', type=float, default=5.0, help='Tiempo que tarda en completarse un batch')
+    parser.add_argument('--batch-error-every', type=int, default=0, help='Cada N peticiones de un batch, una falla (0 = nunca)')
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(('127.0.0.1', args.port), dim=args.dim, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                              batch_seconds=args.batch_seconds, batch_error_every=args.batch_error_every)
+    print(f"Fake OpenAI escuchando en {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
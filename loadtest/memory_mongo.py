@@ -0,0 +1,324 @@
+"""
+Stand-in en memoria de MongoDB para pruebas de carga y benchmarks.
+
+Implementa solo el subconjunto de la API de pymongo que usa la aplicación
+(find/sort/skip/limit, find_one, count_documents, insert_one, update_one,
+bulk_write con UpdateOne, delete_one, create_index, command('ping')). No pretende ser un reemplazo
+general: si la app empieza a usar otro operador, hay que añadirlo aquí.
+"""
+import copy
+import threading
+
+from bson import ObjectId
+
+
+def _get(doc, path):
+    value = doc
+    for part in path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+class _Missing:
+    def __repr__(self):
+        return '<missing>'
+
+
+_MISSING = _Missing()
+
+
+def _compare(value, op, arg):
+    if op == '$exists':
+        return (value is not _MISSING) == bool(arg)
+    if op == '$ne':
+        return value != arg
+    if op == '$in':
+        if isinstance(value, list):
+            return any(v in arg for v in value)
+        return value in arg
+    if op == '$nin':
+        return not _compare(value, '$in', arg)
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == '$gt':
+            return value > arg
+        if op == '$gte':
+            return value >= arg
+        if op == '$lt':
+            return value < arg
+        if op == '$lte':
+            return value <= arg
+    except TypeError:
+        return False
+    raise NotImplementedError(f"Operador no soportado: {op}")
+
+
+def matches(doc, filt):
+    for key, cond in (filt or {}).items():
+        if key == '$or':
+            if not any(matches(doc, sub) for sub in cond):
+                return False
+            continue
+        if key == '$and':
+            if not all(matches(doc, sub) for sub in cond):
+                return False
+            continue
+        value = _get(doc, key)
+        if isinstance(cond, dict) and cond and all(k.startswith('$') for k in cond):
+            if not all(_compare(value, op, arg) for op, arg in cond.items()):
+                return False
+        elif isinstance(value, list) and not isinstance(cond, list):
+            if cond not in value:
+                return False
+        elif value is _MISSING:
+            if cond is not None:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != '_id'}
+    exclude = {k for k, v in projection.items() if not v}
+    if include:
+        out = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+        if '_id' not in exclude and '_id' in doc:
+            out['_id'] = doc['_id']
+        return out
+    return {k: copy.deepcopy(v) for k, v in doc.items() if k not in exclude}
+
+
+class MemoryCursor:
+    def __init__(self, collection, filt, projection):
+        self._collection = collection
+        self._filter = filt
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=1):
+        if isinstance(key, list):
+            self._sort = key
+        else:
+            self._sort = [(key, direction)]
+        return self
+
+    def skip(self, n):
+        self._skip = n
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def __iter__(self):
+        docs = self._collection._matching(self._filter)
+        for key, direction in reversed(self._sort):
+            present = [d for d in docs if _get(d, key) not in (_MISSING, None)]
+            absent = [d for d in docs if _get(d, key) in (_MISSING, None)]
+            present.sort(key=lambda d: _get(d, key), reverse=direction < 0)
+            docs = absent + present if direction > 0 else present + absent
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return iter([project(d, self._projection) for d in docs])
+
+
+class UpdateResult:
+    def __init__(self, matched, modified, upserted_id=None):
+        self.matched_count = matched
+        self.modified_count = modified
+        self.upserted_id = upserted_id
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class DeleteResult:
+    def __init__(self, deleted):
+        self.deleted_count = deleted
+
+
+class BulkWriteResult:
+    def __init__(self, bulk_api_result):
+        self.bulk_api_result = bulk_api_result
+
+
+def _apply_update(doc, update, inserting=False):
+    for op, fields in update.items():
+        if op == '$set' or (op == '$setOnInsert' and inserting):
+            for k, v in fields.items():
+                _set(doc, k, copy.deepcopy(v))
+        elif op == '$unset':
+            for k in fields:
+                doc.pop(k, None)
+        elif op == '$inc':
+            for k, v in fields.items():
+                current = _get(doc, k)
+                _set(doc, k, (0 if current is _MISSING else current) + v)
+        elif op != '$setOnInsert':
+            raise NotImplementedError(f"Operador de actualización no soportado: {op}")
+
+
+def _set(doc, path, value):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _value(doc, expr):
+    if isinstance(expr, str) and expr.startswith('$'):
+        value = _get(doc, expr[1:])
+        return None if value is _MISSING else value
+    return expr
+
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        key = _value(doc, spec['_id'])
+        out = groups.setdefault(repr(key), {'_id': key})
+        for field, acc in spec.items():
+            if field == '_id':
+                continue
+            (op, expr), = acc.items()
+            if op != '$sum':
+                raise NotImplementedError(f"Acumulador no soportado: {op}")
+            out[field] = out.get(field, 0) + (_value(doc, expr) or 0)
+    return list(groups.values())
+
+
+class MemoryCollection:
+    def __init__(self, name):
+        self.name = name
+        self._docs = []
+        self._lock = threading.RLock()
+
+    def _matching(self, filt):
+        with self._lock:
+            return [d for d in self._docs if matches(d, filt)]
+
+    def find(self, filt=None, projection=None):
+        return MemoryCursor(self, filt or {}, projection)
+
+    def find_one(self, filt=None, projection=None):
+        for doc in self.find(filt, projection).limit(1):
+            return doc
+        return None
+
+    def count_documents(self, filt):
+        return len(self._matching(filt))
+
+    def insert_one(self, doc):
+        with self._lock:
+            doc.setdefault('_id', ObjectId())
+            self._docs.append(copy.deepcopy(doc))
+            return InsertOneResult(doc['_id'])
+
+    def insert_many(self, docs):
+        return [self.insert_one(d).inserted_id for d in docs]
+
+    def update_one(self, filt, update, upsert=False):
+        with self._lock:
+            for doc in self._docs:
+                if matches(doc, filt):
+                    _apply_update(doc, update)
+                    return UpdateResult(1, 1)
+            if not upsert:
+                return UpdateResult(0, 0)
+            doc = {k: v for k, v in filt.items() if not k.startswith('$') and not isinstance(v, dict)}
+            doc.setdefault('_id', ObjectId())
+            _apply_update(doc, update, inserting=True)
+            self._docs.append(doc)
+            return UpdateResult(0, 0, doc['_id'])
+
+    def bulk_write(self, requests, ordered=True):
+        """Solo operaciones UpdateOne (las que usa el pipeline de datos)"""
+        result = {'nMatched': 0, 'nModified': 0, 'nUpserted': 0, 'writeErrors': []}
+        with self._lock:
+            for op in requests:
+                updated = self.update_one(op._filter, op._doc, upsert=op._upsert)
+                result['nMatched'] += updated.matched_count
+                result['nModified'] += updated.modified_count
+                result['nUpserted'] += updated.upserted_id is not None
+        return BulkWriteResult(result)
+
+    def delete_one(self, filt):
+        with self._lock:
+            for i, doc in enumerate(self._docs):
+                if matches(doc, filt):
+                    del self._docs[i]
+                    return DeleteResult(1)
+            return DeleteResult(0)
+
+    def aggregate(self, pipeline, **kwargs):
+        """Subconjunto de etapas: $match, $group ($sum), $sort, $skip y $limit"""
+        docs = self._matching({})
+        for stage in pipeline:
+            (op, arg), = stage.items()
+            if op == '$match':
+                docs = [d for d in docs if matches(d, arg)]
+            elif op == '$group':
+                docs = _group(docs, arg)
+            elif op == '$sort':
+                for key, direction in reversed(list(arg.items())):
+                    docs.sort(key=lambda d: _get(d, key), reverse=direction < 0)
+            elif op == '$skip':
+                docs = docs[arg:]
+            elif op == '$limit':
+                docs = docs[:arg]
+            else:
+                raise NotImplementedError(f"Etapa de agregación no soportada: {op}")
+        return iter([copy.deepcopy(d) for d in docs])
+
+    def create_index(self, keys, **kwargs):
+        return keys if isinstance(keys, str) else '_'.join(f"{k}_{d}" for k, d in keys)
+
+
+class MemoryDatabase:
+    def __init__(self, name):
+        self.name = name
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = MemoryCollection(name)
+            return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def command(self, name, *args, **kwargs):
+        if name == 'ping':
+            return {'ok': 1.0}
+        raise NotImplementedError(name)
+
+
+class MemoryClient:
+    """Equivalente a MongoClient: client[db_name][collection]"""
+
+    def __init__(self):
+        self._databases = {}
+        self.admin = MemoryDatabase('admin')
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(name)
+        return self._databases[name]
@@ -0,0 +1,198 @@
+"""
+Prueba de carga de extremo a extremo con tráfico mixto.
+
+Arranca el servidor falso de embeddings (en este proceso) y la app con el
+Mongo en memoria (loadtest.serve, en un subproceso), espera a que responda y
+lanza clientes concurrentes con una mezcla ponderada de peticiones:
+
+    search  POST /api/search            (anónimo, User-Agent único por petición)
+    browse  GET  /api/animes?page=N
+    detail  GET  /api/anime/<id>
+    status  GET  /api/auth/status       (usuario premium sembrado)
+
+    python -m loadtest.run --catalog-size 5000 --concurrency 16 --duration 30
+    python -m loadtest.run --mix search=1 --latency-ms 400 --jitter-ms 100
+    python -m loadtest.run --url http://localhost:5000   # contra una app ya arrancada
+
+Informa por endpoint de throughput, p50/p95/p99 y tasa de errores.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from loadtest.concurrency import QUERIES, percentile
+from loadtest.fake_openai import start_in_thread
+from loadtest.serve import PREMIUM_API_KEY, PROJECT_ROOT
+
+DEFAULT_MIX = 'search=4,browse=3,detail=4,status=1'
+
+
+def parse_mix(spec):
+    """'search=4,browse=3' -> [('search', 4.0), ('browse', 3.0)]"""
+    mix = []
+    for item in spec.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ('search', 'browse', 'detail', 'status'):
+            raise ValueError(f"Endpoint desconocido en --mix: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def build_request(base_url, kind, n, rnd, catalog_size):
+    if kind == 'search':
+        body = json.dumps({'query': QUERIES[n % len(QUERIES)], 'top_k': 10}).encode()
+        return urllib.request.Request(
+            f"{base_url}/api/search", data=body, method='POST',
+            headers={'Content-Type': 'application/json', 'User-Agent': f'loadtest-run/{n}'}
+        )
+    if kind == 'browse':
+        return urllib.request.Request(f"{base_url}/api/animes?page={rnd.randint(1, 20)}&per_page=24")
+    if kind == 'detail':
+        # Sesgo hacia los primeros ids: imita que unos pocos títulos concentran las visitas
+        anime_id = min(catalog_size, int(rnd.paretovariate(1.0)))
+        return urllib.request.Request(f"{base_url}/api/anime/{anime_id}")
+    return urllib.request.Request(f"{base_url}/api/auth/status", headers={'X-API-Key': PREMIUM_API_KEY})
+
+
+def drive(base_url, mix, concurrency, duration, catalog_size, seed=1, timeout=130):
+    """Lanza 'concurrency' clientes durante 'duration' segundos; devuelve métricas por endpoint"""
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    samples = {name: [] for name in names}
+    statuses = {name: {} for name in names}
+    lock = threading.Lock()
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    def client(worker_id):
+        rnd = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            kind = rnd.choices(names, weights)[0]
+            req = build_request(base_url, kind, next(counter), rnd, catalog_size)
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=timeout) as resp:
+                    resp.read()
+                    status = resp.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[kind].append(elapsed)
+                statuses[kind][status] = statuses[kind].get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for worker_id in range(concurrency):
+            pool.submit(client, worker_id)
+    wall = time.perf_counter() - started
+
+    rows = []
+    for name in names:
+        latencies = samples[name]
+        errors = sum(c for s, c in statuses[name].items() if not (isinstance(s, int) and s < 400))
+        rows.append({
+            'endpoint': name,
+            'requests': len(latencies),
+            'rps': len(latencies) / wall if wall else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'error_rate': errors / len(latencies) if latencies else 0.0,
+            'statuses': {str(s): c for s, c in statuses[name].items()},
+        })
+    return rows
+
+
+def print_table(rows):
+    print(f"{'endpoint':<9} {'reqs':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'err %':>7}  status")
+    for r in rows:
+        codes = ' '.join(f"{s}:{c}" for s, c in sorted(r['statuses'].items()))
+        print(f"{r['endpoint']:<9} {r['requests']:>7} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['error_rate'] * 100:>6.2f}%  {codes}")
+    total = sum(r['requests'] for r in rows)
+    print(f"{'total':<9} {total:>7} {sum(r['rps'] for r in rows):>8.1f}")
+
+
+def wait_until_ready(base_url, process=None, timeout=300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"La app terminó durante el arranque (código {process.returncode})")
+        try:
+            with urllib.request.urlopen(f"{base_url}/ready", timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"La app no respondió en {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga con stand-ins locales de OpenAI y MongoDB')
+    parser.add_argument('--url', default=None, help='Usar una app ya arrancada en vez de lanzar loadtest.serve')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--catalog-size', type=int, default=5000)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--mongo-uri', default=None, help='mongod local en vez del Mongo en memoria')
+    parser.add_argument('--latency-ms', type=float, default=150.0, help='Latencia simulada de OpenAI')
+    parser.add_argument('--jitter-ms', type=float, default=50.0)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Pesos por endpoint (search, browse, detail, status)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--warmup', type=float, default=3.0, help='Segundos de tráfico descartado antes de medir')
+    parser.add_argument('--json', action='store_true', help='Imprimir resultados en JSON')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    process = None
+    fake = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        fake = start_in_thread(dim=args.dim, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+        base_url = f"http://127.0.0.1:{args.port}"
+        cmd = [sys.executable, '-m', 'loadtest.serve', '--port', str(args.port),
+               '--catalog-size', str(args.catalog_size), '--dim', str(args.dim), '--openai-url', fake.base_url]
+        if args.mongo_uri:
+            cmd += ['--mongo-uri', args.mongo_uri]
+        env = dict(os.environ, LOG_LEVEL=os.environ.get('LOG_LEVEL', 'WARNING'))
+        process = subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env)
+
+    try:
+        wait_until_ready(base_url, process)
+        if args.warmup > 0:
+            drive(base_url, mix, args.concurrency, args.warmup, args.catalog_size, seed=0)
+        rows = drive(base_url, mix, args.concurrency, args.duration, args.catalog_size)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if fake is not None:
+            fake.shutdown()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print()
+        print(f"{args.concurrency} clientes, {args.duration:.0f}s, mezcla {args.mix}")
+        print_table(rows)
+        if fake is not None:
+            print(f"\nOpenAI falso: {fake.requests} peticiones de embeddings")
+
+
+if __name__ == "__main__":
+    main()
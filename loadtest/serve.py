@@ -0,0 +1,82 @@
+"""
+Arranca la app Flask contra stand-ins locales (sin OpenAI ni Atlas reales).
+
+    python -m loadtest.serve --port 5055 --catalog-size 5000 --dim 256 \
+        --openai-url http://127.0.0.1:8765/v1
+
+Por defecto MongoDB es el stand-in en memoria de loadtest.memory_mongo; con
+--mongo-uri mongodb://localhost:27017 se usa un mongod local (la base
+--db-name se vacía y se vuelve a sembrar, nunca uses la de producción).
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Usuarios sembrados para el tráfico autenticado de las pruebas
+PREMIUM_API_KEY = 'loadtest-premium'
+FREE_API_KEY = 'loadtest-free'
+
+
+def seed_users(db):
+    now = datetime.now()
+    db.users.insert_one({'email': 'premium@loadtest.invalid', 'api_key': PREMIUM_API_KEY,
+                         'is_premium': True, 'premium_until': now + timedelta(days=30), 'created_at': now})
+    db.users.insert_one({'email': 'free@loadtest.invalid', 'api_key': FREE_API_KEY,
+                         'is_premium': False, 'created_at': now})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='App con stand-ins locales para pruebas de carga')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--catalog-size', type=int, default=5000)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--openai-url', default='http://127.0.0.1:8765/v1', help='Base URL del servidor falso de embeddings')
+    parser.add_argument('--mongo-uri', default=None, help='MongoDB local en vez del stand-in en memoria')
+    parser.add_argument('--db-name', default='otaku_loadtest')
+    parser.add_argument('--workdir', default=None, help='Directorio para embeddings.npy (por defecto uno temporal)')
+    args = parser.parse_args()
+
+    # Config lee el entorno al importarse: hay que fijarlo antes de importar la app
+    os.environ['OPENAI_BASE_URL'] = args.openai_url
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-loadtest')
+    os.environ['DB_NAME'] = args.db_name
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+
+    from loadtest.catalog import seed_database
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        os.environ['MONGO_URI'] = args.mongo_uri
+        client = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)
+        client.drop_database(args.db_name)
+    else:
+        from loadtest.memory_mongo import MemoryClient
+        client = MemoryClient()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='otaku_loadtest_')
+    db = client[args.db_name]
+    seed_database(db, args.catalog_size, args.dim, workdir)
+    seed_users(db)
+
+    # SearchEngine lee embeddings.npy del directorio actual
+    os.chdir(workdir)
+    from database import Database
+    Database.init_db(client=client)
+
+    from app import app
+    from werkzeug.serving import run_simple
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    print(f"App de carga en http://{args.host}:{args.port} ({args.catalog_size} animes, dim {args.dim}, "
+          f"{'mongod ' + args.mongo_uri if args.mongo_uri else 'Mongo en memoria'})", flush=True)
+    run_simple(args.host, args.port, app, threaded=True, use_reloader=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,10 @@ from database import db
 from utils import generate_api_key
 from services.email_service import send_login_email, send_reset_password_email
 from config import Config
+from services.logging_service import get_logger
 
 auth_bp = Blueprint('auth', __name__)
+logger = get_logger('auth')
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -53,16 +55,14 @@ def register_password():
     """Password registration - account created ONLY after email verification"""
     # CRITICAL: Wrap EVERYTHING to prevent HTML 500 errors
     try:
-        print("\n" + "="*50)
-        print("🔐 PASSWORD REGISTRATION ATTEMPT")
-        print("="*50)
+        logger.info("Password registration attempt")
         
         # Verify database connection first
         try:
             db.db.command('ping')
-            print("✅ Database connection verified")
+            logger.debug("Database connection verified")
         except Exception as db_err:
-            print(f"❌ DATABASE CONNECTION FAILED: {db_err}")
+            logger.error("Database connection failed: %s", db_err)
             return jsonify({
                 'error': 'Database connection error',
                 'details': 'Cannot connect to database. Please try again later.',
@@ -73,10 +73,10 @@ def register_password():
         try:
             data = request.get_json()
             if not data:
-                print("❌ No JSON data in request")
+                logger.warning("No JSON data in request")
                 return jsonify({'error': 'Invalid request: No data provided'}), 400
         except Exception as json_err:
-            print(f"❌ JSON parsing error: {json_err}")
+            logger.warning("JSON parsing error: %s", json_err)
             return jsonify({
                 'error': 'Invalid request format',
                 'details': 'Request must contain valid JSON data'
@@ -85,64 +85,61 @@ def register_password():
         email = data.get('email')
         password = data.get('password')
         
-        print(f"📧 Email: {email}")
-        print(f"🔑 Password provided: {'Yes' if password else 'No'}")
-        print(f"🌐 Host URL: {request.host_url}")
+        logger.debug("Registration data", extra={'email': email, 'password_provided': bool(password), 'host_url': request.host_url})
         
         if not email or not password:
-            print("❌ Missing email or password")
+            logger.warning("Missing email or password")
             return jsonify({'error': 'Email and password required'}), 400
         
-        print("\n1️⃣ Checking for existing account...")
+        logger.debug("Checking for existing account")
         # Check if email already has an ACTIVE account
         try:
             existing_user = db.db.users.find_one({'email': email})
             if existing_user:
-                print(f"⚠️ Registration attempt with existing email: {email}")
+                logger.warning("Registration attempt with existing email", extra={'email': email})
                 return jsonify({'error': 'Email already registered'}), 409
-            print("   ✅ No existing account found")
+            logger.debug("No existing account found")
         except Exception as db_err:
-            print(f"❌ Database query error (existing user): {db_err}")
+            logger.error("Database query error (existing user): %s", db_err)
             return jsonify({
                 'error': 'Database error',
                 'details': 'Error checking existing accounts'
             }), 500
         
-        print("\n2️⃣ Checking for pending registrations...")
+        logger.debug("Checking for pending registrations")
         # Check if there's already a pending registration
         try:
             pending = db.db.pending_registrations.find_one({'email': email})
             if pending:
                 # Check if token is expired
                 if pending.get('token_expires') and datetime.now() > pending['token_expires']:
-                    print(f"   🧹 Cleaning expired pending registration for: {email}")
+                    logger.info("Cleaning expired pending registration", extra={'email': email})
                     db.db.pending_registrations.delete_one({'_id': pending['_id']})
-                    print("   ✅ Expired registration removed, proceeding with new registration")
+                    logger.debug("Expired registration removed, proceeding with new registration")
                 else:
                     # Pending registration still valid, resend email
-                    print(f"⚠️ Valid pending registration found for: {email}, resending email")
+                    logger.info("Valid pending registration found, resending email", extra={'email': email})
                     from services.email_service import send_verification_email
                     send_verification_email(email, pending['verification_token'], request.host_url)
                     return jsonify({
                         'message': 'A verification email has already been sent. Please check your inbox.',
                         'require_email_verification': True
                     }), 200
-            print("   ✅ No pending registration found")
+            logger.debug("No pending registration found")
         except Exception as db_err:
-            print(f"❌ Database query error (pending): {db_err}")
+            logger.error("Database query error (pending): %s", db_err)
             return jsonify({
                 'error': 'Database error',
                 'details': 'Error checking pending registrations'
             }), 500
             
-        print("\n3️⃣ Creating new pending registration...")
+        logger.debug("Creating new pending registration")
         # Generate verification token and password hash
         try:
             hashed = generate_password_hash(password)
             verification_token = secrets.token_urlsafe(32)
-            print(f"   Generated token: {verification_token[:20]}...")
         except Exception as hash_err:
-            print(f"❌ Error generating hash/token: {hash_err}")
+            logger.error("Error generating hash/token: %s", hash_err)
             return jsonify({
                 'error': 'Cryptographic error',
                 'details': 'Error generating secure credentials'
@@ -158,45 +155,41 @@ def register_password():
                 'token_expires': datetime.now() + timedelta(hours=24),
                 'created_at': datetime.now()
             })
-            print("   ✅ Pending registration saved to database")
+            logger.debug("Pending registration saved to database")
         except Exception as db_err:
-            print(f"❌ Database insert error: {db_err}")
+            logger.error("Database insert error: %s", db_err)
             return jsonify({
                 'error': 'Database error',
                 'details': 'Error saving registration data'
             }), 500
         
-        print("\n4️⃣ Sending verification email...")
+        logger.debug("Sending verification email")
         # Send verification email
         try:
             from services.email_service import send_verification_email
             email_sent = send_verification_email(email, verification_token, request.host_url)
             
             if email_sent:
-                print(f"✅ Registration process completed successfully for: {email}")
-                print("=" * 50 + "\n")
+                logger.info("Registration process completed successfully", extra={'email': email})
                 return jsonify({
                     'message': 'Registration initiated. Please check your email to complete registration.',
                     'require_email_verification': True
                 }), 201
             else:
                 # If email fails, remove pending registration
-                print("❌ Email sending failed, rolling back...")
+                logger.error("Email sending failed, rolling back", extra={'email': email})
                 try:
                     db.db.pending_registrations.delete_one({'email': email})
-                    print(f"⚠️ Pending registration removed: {email}")
+                    logger.warning("Pending registration removed", extra={'email': email})
                 except Exception:
-                    print(f"⚠️ Could not rollback pending registration for: {email}")
-                print("=" * 50 + "\n")
+                    logger.warning("Could not rollback pending registration", extra={'email': email})
                 return jsonify({
                     'error': 'Failed to send verification email',
                     'details': 'Email service not available. Please check your SendGrid API configuration or try again later.',
                     'email_error': True
                 }), 500
         except Exception as email_err:
-            print(f"❌ Email service error: {email_err}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Email service error", extra={'email': email})
             # Rollback
             try:
                 db.db.pending_registrations.delete_one({'email': email})
@@ -210,11 +203,7 @@ def register_password():
     
     except Exception as e:
         # This is the FINAL catch-all to prevent HTML 500 errors
-        print(f"\n❌ CRITICAL UNEXPECTED ERROR in register_password: {type(e).__name__}")
-        print(f"   Error details: {e}")
-        import traceback
-        traceback.print_exc()
-        print("=" * 50 + "\n")
+        logger.exception("Critical unexpected error in register_password: %s", type(e).__name__)
         return jsonify({
             'error': 'Internal server error',
             'type': type(e).__name__,
@@ -277,7 +266,7 @@ def verify_email():
     # Remove from pending registrations
     db.db.pending_registrations.delete_one({'_id': pending_user['_id']})
     
-    print(f"✅ Account created and email verified for: {pending_user.get('email')}")
+    logger.info("Account created and email verified", extra={'email': pending_user.get('email')})
     
     # Redirect to main page with API key for auto-login
     from flask import redirect
@@ -3,8 +3,10 @@ from datetime import datetime, timedelta
 from database import db
 from services.paypal_service import create_paypal_order, capture_paypal_order
 from config import Config
+from services.logging_service import get_logger
 
 payment_bp = Blueprint('payment', __name__)
+logger = get_logger('payment')
 
 @payment_bp.route('/create-order', methods=['POST'])
 def create_order():
@@ -28,32 +30,32 @@ def capture_order():
     data = request.get_json()
     order_id = data.get('order_id')
     
-    print(f"📥 Order capture requested: {order_id}")
+    logger.info("Order capture requested", extra={'order_id': order_id})
     
     if not order_id: 
-        print("❌ Error: No order_id provided")
+        logger.warning("No order_id provided")
         return jsonify({'error': 'Order ID required'}), 400
     
     # Capture payment with PayPal
     capture = capture_paypal_order(order_id)
-    print(f"📡 PayPal response: {capture}")
+    logger.debug("PayPal response", extra={'order_id': order_id, 'capture': capture})
     
     if not capture:
-        print("❌ Error: No response received from PayPal")
+        logger.error("No response received from PayPal", extra={'order_id': order_id})
         return jsonify({'error': 'PayPal capture failed - no response'}), 500
         
     if capture.get('status') != 'COMPLETED':
         status = capture.get('status', 'UNKNOWN')
-        print(f"❌ Error: Payment not completed. Status: {status}")
+        logger.warning("Payment not completed", extra={'order_id': order_id, 'status': status})
         return jsonify({'error': f'Payment not completed. Status: {status}'}), 400
         
     # Update user
     try:
         purchase_units = capture.get('purchase_units', [])
-        print(f"📦 Purchase units: {purchase_units}")
+        logger.debug("Purchase units", extra={'order_id': order_id, 'purchase_units': purchase_units})
         
         if not purchase_units:
-            print("❌ Error: No purchase units in response")
+            logger.error("No purchase units in response", extra={'order_id': order_id})
             return jsonify({'error': 'Invalid PayPal response - no purchase units'}), 500
         
         # The custom_id is inside payments > captures[0] in PayPal response
@@ -61,14 +63,14 @@ def capture_order():
         captures = payments.get('captures', [])
         
         if not captures:
-            print("❌ Error: No captures in response")
+            logger.error("No captures in response", extra={'order_id': order_id})
             return jsonify({'error': 'Invalid PayPal response - no captures'}), 500
             
         user_id_str = captures[0].get('custom_id')
-        print(f"👤 User ID from PayPal (from captures): {user_id_str}")
+        logger.debug("User ID from PayPal captures", extra={'order_id': order_id, 'user_id': user_id_str})
         
         if not user_id_str:
-            print("❌ Error: custom_id not found in captures")
+            logger.error("custom_id not found in captures", extra={'order_id': order_id})
             return jsonify({'error': 'User ID not found in payment'}), 500
         
         from bson.objectid import ObjectId
@@ -82,7 +84,7 @@ def capture_order():
             {'$set': {'is_premium': True, 'premium_until': premium_until}}
         )
         
-        print(f"✅ User updated: matched={result.matched_count}, modified={result.modified_count}")
+        logger.info("User updated", extra={'user_id': user_id_str, 'matched': result.matched_count, 'modified': result.modified_count})
         
         # Log payment
         db.db.payments.insert_one({
@@ -93,11 +95,9 @@ def capture_order():
             'created_at': datetime.now()
         })
         
-        print(f"✅ Payment completed successfully for user {user_id_str}")
+        logger.info("Payment completed successfully", extra={'order_id': order_id, 'user_id': user_id_str})
         return jsonify({'status': 'success', 'message': 'Premium activated'})
         
     except Exception as e:
-        import traceback
-        print(f"❌ Error processing payment capture: {e}")
-        print(f"❌ Traceback: {traceback.format_exc()}")
+        logger.exception("Error processing payment capture", extra={'order_id': order_id})
         return jsonify({'error': f'Error processing payment: {str(e)}'}), 500
@@ -1,18 +1,26 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from datetime import datetime, timedelta
 import numpy as np
 import hashlib
-from openai import OpenAI
 
 from database import db
 from search_system import SearchEngine
-from utils import normalizar_texto, limpiar_html
+from utils import normalizar_texto
 from config import Config
+from services import admission, embedding_service, metrics, result_cache, serialization
+from services.embedding_service import EmbeddingUnavailable
+from services.profiler import profiled
+from services.logging_service import get_logger
+from services.cache import LRUCache
 
 search_bp = Blueprint('search', __name__)
-client = OpenAI(api_key=Config.OPENAI_API_KEY)
+logger = get_logger('search')
+
+# Fichas ya serializadas por (id solicitado, versión de datos): un acierto no toca MongoDB
+detail_cache = LRUCache(maxsize=Config.DETAIL_CACHE_SIZE)
 
 @search_bp.route('/search', methods=['POST'])
+@profiled
 def search_semantic():
     api_key = request.headers.get('X-API-Key')
     
@@ -24,10 +32,11 @@ def search_semantic():
         
         # Count anonymous searches in the last day
         one_day_ago = datetime.now() - timedelta(days=1)
-        anonymous_count = db.db.anonymous_searches.count_documents({
-            'session_id': session_id,
-            'timestamp': {'$gt': one_day_ago}
-        })
+        with metrics.stage('quota'):
+            anonymous_count = db.db.anonymous_searches.count_documents({
+                'session_id': session_id,
+                'timestamp': {'$gt': one_day_ago}
+            })
         
         if anonymous_count >= 10:
             return jsonify({
@@ -47,7 +56,8 @@ def search_semantic():
         is_anonymous = True
     else:
         # Registered user - verify if API key is valid
-        user = db.db.users.find_one({'api_key': api_key})
+        with metrics.stage('auth'):
+            user = db.db.users.find_one({'api_key': api_key})
         
         # If API key is invalid, treat as anonymous user instead of returning error
         if not user:
@@ -56,10 +66,11 @@ def search_semantic():
             
             # Count anonymous searches in the last day
             one_day_ago = datetime.now() - timedelta(days=1)
-            anonymous_count = db.db.anonymous_searches.count_documents({
-                'session_id': session_id,
-                'timestamp': {'$gt': one_day_ago}
-            })
+            with metrics.stage('quota'):
+                anonymous_count = db.db.anonymous_searches.count_documents({
+                    'session_id': session_id,
+                    'timestamp': {'$gt': one_day_ago}
+                })
             
             if anonymous_count >= 10:
                 return jsonify({
@@ -88,10 +99,11 @@ def search_semantic():
             else:
                 time_ago = datetime.now() - timedelta(days=1)
             
-            count = db.db.searches.count_documents({
-                'api_key': api_key,
-                'timestamp': {'$gt': time_ago}
-            })
+            with metrics.stage('quota'):
+                count = db.db.searches.count_documents({
+                    'api_key': api_key,
+                    'timestamp': {'$gt': time_ago}
+                })
             
             if count >= limit:
                 return jsonify({'error': 'Limit reached', 'limit': limit, 'used': count}), 429
@@ -102,6 +114,7 @@ def search_semantic():
     data = request.get_json(force=True)
     query = data.get('query', '')
     top_k = data.get('top_k', 10)
+    include_facets = bool(data.get('facets', False))
     
     # Process
     MAX_QUERY_LENGTH = 250
@@ -110,43 +123,91 @@ def search_semantic():
             'error': f'Query too long. Maximum {MAX_QUERY_LENGTH} characters allowed.'
         }), 400
     
+    # Exact-result cache: a popular query is served without embedding, FAISS or MongoDB
+    normalized = normalizar_texto(query)
+    version = SearchEngine.version
+    with metrics.stage('result_cache'):
+        cached = result_cache.get(normalized, top_k, version)
+    
+    # Title shortcut: an (almost) exact title skips the OpenAI call and
+    # reuses that anime's indexed embedding to find similar ones
+    title_id = None
+    if cached is None:
+        with metrics.stage('title'):
+            title_id = SearchEngine.title_match(query)
+    
+    # Admission control: only searches that will call the embedding API take a
+    # slot (not duplicates of a call already in flight), and they are shed
+    # before being logged so they don't use up quota
+    if (cached is None and title_id is None and not embedding_service.has_vector(normalized)
+            and not embedding_service.in_flight(normalized)):
+        tier = 'anonymous' if is_anonymous else ('premium' if is_premium else 'free')
+        try:
+            with metrics.stage('admission'):
+                admission.admit(tier)
+        except admission.Overloaded as e:
+            return jsonify({
+                'error': 'Server busy',
+                'message': 'Too many searches in progress. Please retry shortly.',
+                'retry_after': e.retry_after
+            }), 503, {'Retry-After': str(e.retry_after)}
+    
     # Log search
     if is_anonymous:
-        print(f"📝 ANONYMOUS SEARCH - Logging search for session_id: {search_key[:16]}...")
-        print(f"   Query: '{query}'")
-        print(f"   Timestamp: {datetime.now()}")
-        db.db.anonymous_searches.insert_one({
-            'session_id': search_key,
-            'query': query,
-            'timestamp': datetime.now()
-        })
-        print(f"   ✅ Search logged successfully")
+        with metrics.stage('log'):
+            db.db.anonymous_searches.insert_one({
+                'session_id': search_key,
+                'query': query,
+                'timestamp': datetime.now()
+            })
+        logger.info("Anonymous search logged", extra={'session': search_key[:16], 'query': query})
     else:
-        db.db.searches.insert_one({
-            'api_key': search_key,
-            'query': query,
-            'timestamp': datetime.now()
-        })
+        with metrics.stage('log'):
+            db.db.searches.insert_one({
+                'api_key': search_key,
+                'query': query,
+                'timestamp': datetime.now()
+            })
     
-    # Embedding
     try:
-        resp = client.embeddings.create(
-            model=Config.EMBEDDING_MODEL,
-            input=normalizar_texto(query)
-        )
-        vector = resp.data[0].embedding
-        
-        # Use pure vector search (embeddings only)
-        results = SearchEngine.search(vector, top_k=top_k)
+        degraded = False
+        if cached is not None:
+            ranked = cached.ranked
+            search_mode = cached.search_mode
+        elif title_id is not None:
+            ranked = SearchEngine.similar_to(title_id, top_k=top_k)
+            search_mode = 'title'
+        else:
+            try:
+                # Embedding (cached vector, or OpenAI call behind the circuit breaker)
+                try:
+                    vector, _ = embedding_service.embed_query(normalized)
+                finally:
+                    admission.release()
+                ranked = SearchEngine.rank_cached(vector, top_k=top_k)
+                search_mode = 'embeddings'
+            except EmbeddingUnavailable as e:
+                # Embedding API down or too slow: lexical search over titles/tags/keywords
+                logger.warning("Embedding unavailable, using lexical fallback", extra={'reason': str(e)})
+                ranked = SearchEngine.lexical_search(query, top_k=top_k)
+                search_mode = 'lexical'
+                degraded = True
+        if cached is not None:
+            results = cached.results
+        else:
+            results = serialization.card_fragments(ranked, version, SearchEngine.hydrate)
+            if not degraded:
+                result_cache.put(normalized, top_k, version, search_mode, ranked, results)
         
         # Recalculate count after logging to get accurate remaining searches
         if is_anonymous:
             one_day_ago = datetime.now() - timedelta(days=1)
-            count = db.db.anonymous_searches.count_documents({
-                'session_id': search_key,
-                'timestamp': {'$gt': one_day_ago}
-            })
-            print(f"📊 ANONYMOUS COUNT AFTER SEARCH: {count}/{limit}")
+            with metrics.stage('quota'):
+                count = db.db.anonymous_searches.count_documents({
+                    'session_id': search_key,
+                    'timestamp': {'$gt': one_day_ago}
+                })
+            logger.debug("Anonymous count after search", extra={'used': count, 'limit': limit})
         else:
             # Recalculate with same time period logic
             if is_premium:
@@ -154,54 +215,106 @@ def search_semantic():
             else:
                 time_ago = datetime.now() - timedelta(days=1)
             
-            count = db.db.searches.count_documents({
-                'api_key': search_key,
-                'timestamp': {'$gt': time_ago}
-            })
+            with metrics.stage('quota'):
+                count = db.db.searches.count_documents({
+                    'api_key': search_key,
+                    'timestamp': {'$gt': time_ago}
+                })
         
-        return jsonify({
-            'results': results,
+        response = {
             'searches_remaining': limit - count,
             'is_premium': is_premium,
             'is_anonymous': is_anonymous,
-            'search_mode': 'embeddings'  # Indicate vector search was used
-        })
+            'search_mode': search_mode,  # 'embeddings' (vector search), 'title' (shortcut) or 'lexical' (fallback)
+            'degraded': degraded  # True when results come from the lexical fallback
+        }
+        if include_facets:
+            with metrics.stage('facets'):
+                response['facets'] = SearchEngine.facet_counts([anime_id for anime_id, _ in ranked])
+        
+        # Resultados ya codificados: se concatenan sin volver a serializar
+        return serialization.fragment_response(response, {'results': results})
 
         
     except Exception as e:
-        print(f"Search Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Search error", extra={'query': query})
         return jsonify({'error': 'Search failed'}), 500
 
 @search_bp.route('/animes', methods=['GET'])
+@profiled
 def get_all():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 24, type=int)
+    include_facets = request.args.get('facets', 0, type=int) == 1
     
     skip = (page - 1) * per_page
     
     try:
-        total = db.db.animes.count_documents({})
-        cursor = db.db.animes.find({}, {'embedding': 0}).skip(skip).limit(per_page)
-        animes = []
-        for anime in cursor:
-            if '_id' in anime:
-                anime['_id'] = str(anime['_id'])
-            anime['description_clean'] = limpiar_html(anime.get('description', ''))
-            animes.append(anime)
+        with metrics.stage('browse_query'):
+            total = db.db.animes.count_documents({})
+            # Solo los IDs de la página; los documentos salen de la caché de fragmentos
+            cursor = db.db.animes.find({}, {'id': 1}).skip(skip).limit(per_page)
+            page_ids = [(doc['id'], None) for doc in cursor if 'id' in doc]
+        animes = serialization.card_fragments(page_ids, SearchEngine.version, SearchEngine.hydrate)
             
-        return jsonify({
-            'animes': animes,
+        response = {
             'total': total,
             'page': page
-        })
+        }
+        if include_facets:
+            # Sin filtros, el conjunto de resultados es el catálogo completo
+            with metrics.stage('facets'):
+                response['facets'] = SearchEngine.facet_counts()
+            
+        return serialization.fragment_response(response, {'animes': animes})
     except Exception as e:
-        print(f"Error en get_all: {e}")
+        logger.exception("Error en get_all")
         return jsonify({'error': 'Database error'}), 500
 
+@search_bp.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    """Sugerencias de títulos en memoria (sin OpenAI ni MongoDB, no consume cuota)"""
+    query = request.args.get('q', '')[:100]
+    limit = max(1, min(request.args.get('limit', 10, type=int), 20))
+    return serialization.json_response({
+        'query': query,
+        'suggestions': SearchEngine.autocomplete(query, limit=limit)
+    })
+
+@search_bp.route('/titles/lookup', methods=['GET'])
+def titles_lookup():
+    """Búsqueda de títulos tolerante a errores (índice de trigramas, no consume cuota)"""
+    query = request.args.get('q', '')[:100]
+    limit = max(1, min(request.args.get('limit', 5, type=int), 20))
+    return serialization.json_response({
+        'query': query,
+        'matches': SearchEngine.fuzzy_lookup(query, limit=limit)
+    })
+
 @search_bp.route('/anime/<int:anime_id>', methods=['GET'])
 def get_one(anime_id):
-    anime = SearchEngine.get_by_id(anime_id)
-    if anime: return jsonify(anime)
-    return jsonify({'error': 'Not found'}), 404
+    version = SearchEngine.version
+    # El ETag depende solo de (versión de datos, id): un 304 no necesita ni la caché
+    etag = f"{version}-{anime_id}"
+    headers = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': f'public, max-age={Config.DETAIL_MAX_AGE}'
+    }
+    if version and request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+    
+    key = (anime_id, version)
+    # Como result_cache: sin versión no hay invalidación posible, así que no se cachea
+    encoded = detail_cache.get(key) if version else None
+    if encoded is None:
+        anime = SearchEngine.get_by_id(anime_id)
+        if not anime:
+            return jsonify({'error': 'Not found'}), 404
+        encoded = serialization.fragment(anime, version, kind='detail')
+        if version:
+            detail_cache.set(key, encoded)
+    
+    if not version:
+        # Sin índice cargado no hay versión estable: no anunciar caché compartida
+        headers = {'Cache-Control': 'no-cache'}
+    return serialization.json_response(encoded, headers=headers)
@@ -0,0 +1,157 @@
+"""
+Modo Batch API de OpenAI para reconstrucciones completas (enriquecimiento y embeddings).
+
+Flujo: peticiones en JSONL -> subir el fichero -> crear el batch -> sondear
+hasta que termine -> descargar el fichero de resultados e ingerirlo con bulk
+writes. Cada trabajo se guarda en la colección batch_jobs (ids de fichero y de
+batch, estado y hash de entrada de cada elemento), así que el proceso puede
+reiniciarse en cualquier punto: run() retoma primero los trabajos abiertos.
+Los elementos que fallan no se escriben y vuelven a salir como pendientes en
+la siguiente ejecución, porque su hash no llegó a guardarse.
+"""
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+
+# Estados finales de un batch en OpenAI; 'ingested' y 'abandoned' son nuestros
+TERMINAL = ('completed', 'failed', 'expired', 'cancelled')
+CLOSED = ('ingested', 'abandoned')
+
+
+class BatchRunner:
+    def __init__(self, client, kind, endpoint, jobs, workdir, max_requests=50000):
+        self.client = client
+        self.kind = kind            # 'enrich' o 'embed'
+        self.endpoint = endpoint    # '/v1/chat/completions' o '/v1/embeddings'
+        self.jobs = jobs            # colección batch_jobs
+        self.workdir = workdir
+        self.max_requests = max_requests
+        self.ingested = 0
+        self.failed = 0
+
+    def open_jobs(self):
+        return list(self.jobs.find({'kind': self.kind, 'status': {'$nin': list(CLOSED)}}).sort('created_at', 1))
+
+    def in_flight(self):
+        """custom_id de los elementos que ya están en un trabajo abierto"""
+        ids = set()
+        for job in self.open_jobs():
+            ids.update(job['items'])
+        return ids
+
+    def _update(self, job, **fields):
+        fields['updated_at'] = datetime.now()
+        self.jobs.update_one({'_id': job['_id']}, {'$set': fields})
+        job.update(fields)
+
+    # --- Envío ---
+
+    def submit(self, requests):
+        """requests: [(custom_id, body, hash)] -> trabajos creados (uno por cada max_requests)"""
+        os.makedirs(self.workdir, exist_ok=True)
+        created = []
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        for start in range(0, len(requests), self.max_requests):
+            chunk = requests[start:start + self.max_requests]
+            # El id viaja en metadata y permite encontrar el batch tras un reinicio: debe ser único
+            job_id = f"{self.kind}-{stamp}-{uuid.uuid4().hex[:8]}"
+            path = os.path.join(self.workdir, f"{job_id}.jsonl")
+            with open(path, 'w', encoding='utf-8') as f:
+                for custom_id, body, _ in chunk:
+                    f.write(json.dumps({'custom_id': custom_id, 'method': 'POST',
+                                        'url': self.endpoint, 'body': body}, ensure_ascii=False) + '\n')
+            job = {'_id': job_id, 'kind': self.kind, 'endpoint': self.endpoint, 'status': 'created',
+                   'path': path, 'items': {custom_id: item_hash for custom_id, _, item_hash in chunk},
+                   'created_at': datetime.now()}
+            self.jobs.insert_one(job)
+            self._advance(job)
+            created.append(job)
+            print(f"📤 Trabajo {job_id}: {len(chunk)} peticiones enviadas (batch {job.get('batch_id')})")
+        return created
+
+    def _advance(self, job):
+        """Lleva un trabajo a medio enviar hasta 'submitted' (idempotente tras un reinicio)"""
+        if job['status'] == 'created':
+            if not os.path.exists(job['path']):
+                self._update(job, status='abandoned', error='fichero JSONL perdido antes de subirlo')
+                return
+            with open(job['path'], 'rb') as f:
+                uploaded = self.client.files.create(file=f, purpose='batch')
+            self._update(job, status='uploaded', input_file_id=uploaded.id)
+        if job['status'] == 'uploaded':
+            # Si el proceso murió justo después de crear el batch, se recupera por metadata
+            batch = self._find_remote(job) or self.client.batches.create(
+                input_file_id=job['input_file_id'], endpoint=self.endpoint,
+                completion_window='24h', metadata={'job_id': job['_id']})
+            self._update(job, status=batch.status, batch_id=batch.id)
+
+    def _find_remote(self, job):
+        for batch in self.client.batches.list(limit=100):
+            if (batch.metadata or {}).get('job_id') == job['_id']:
+                return batch
+        return None
+
+    # --- Sondeo e ingesta ---
+
+    def poll(self, job):
+        """Actualiza el estado del trabajo; devuelve True si ya terminó en OpenAI"""
+        batch = self.client.batches.retrieve(job['batch_id'])
+        counts = batch.request_counts
+        self._update(job, status=batch.status, output_file_id=batch.output_file_id,
+                     error_file_id=batch.error_file_id,
+                     counts={'total': counts.total, 'completed': counts.completed, 'failed': counts.failed}
+                     if counts else None)
+        return batch.status in TERMINAL
+
+    def _lines(self, file_id):
+        if not file_id:
+            return []
+        content = self.client.files.content(file_id)
+        return [json.loads(line) for line in content.text.splitlines() if line.strip()]
+
+    def ingest(self, job, handle):
+        """
+        Aplica handle(custom_id, body, hash) -> bool a cada respuesta correcta.
+        Un batch expirado o cancelado también trae los resultados que llegó a completar.
+        """
+        ok = failed = 0
+        for line in self._lines(job.get('output_file_id')):
+            response = line.get('response') or {}
+            item_hash = job['items'].get(line.get('custom_id'))
+            if response.get('status_code') == 200 and item_hash and handle(line['custom_id'], response['body'], item_hash):
+                ok += 1
+            else:
+                failed += 1
+        errors = self._lines(job.get('error_file_id'))
+        failed += len(errors)
+        for line in errors[:5]:
+            error = line.get('error') or (line.get('response') or {}).get('body', {}).get('error')
+            print(f"   ⚠️ {line.get('custom_id')}: {error}")
+        self.ingested += ok
+        self.failed += failed
+        self._update(job, status='ingested', ingested=ok, failed=failed, batch_status=job['status'])
+        print(f"📥 Trabajo {job['_id']} ({job['batch_status']}): {ok} ingeridos, {failed} fallidos")
+
+    def run(self, handle, wait=True, poll_interval=30.0):
+        """
+        Retoma los trabajos abiertos y, si wait, sondea hasta ingerirlos todos.
+        Devuelve cuántos trabajos siguen abiertos.
+        """
+        while True:
+            pending = 0
+            for job in self.open_jobs():
+                self._advance(job)
+                if job['status'] in CLOSED:
+                    continue
+                if self.poll(job):
+                    self.ingest(job, handle)
+                else:
+                    pending += 1
+                    counts = job.get('counts') or {}
+                    print(f"⏳ Trabajo {job['_id']}: {job['status']} "
+                          f"({counts.get('completed', 0)}/{counts.get('total', len(job['items']))})")
+            if not pending or not wait:
+                return pending
+            time.sleep(poll_interval)
@@ -0,0 +1,94 @@
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+
+class BulkWriter:
+    """
+    Acumula escrituras y las envía con bulk_write desordenado en lotes.
+
+    Cada lote es un solo viaje de ida y vuelta a Atlas en vez de uno por
+    documento. Con ordered=False un documento que falla no detiene al resto:
+    los fallos se recogen (índice, filtro, mensaje) para el resumen final.
+    Uso:
+
+        with BulkWriter(collection, batch_size=500) as writer:
+            writer.upsert({'id': 1}, {'$set': {...}})
+        print(writer.summary())
+    """
+
+    def __init__(self, collection, batch_size=500, max_errors=100):
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.max_errors = max_errors
+        self.pending = []
+        self.batches = 0
+        self.matched = 0
+        self.modified = 0
+        self.upserted = 0
+        self.failed = 0
+        self.errors = []  # [{'filter': ..., 'code': ..., 'message': ...}]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def add(self, operation):
+        self.pending.append(operation)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def update(self, filter, update, upsert=False):
+        self.add(UpdateOne(filter, update, upsert=upsert))
+
+    def upsert(self, filter, update):
+        self.update(filter, update, upsert=True)
+
+    def flush(self):
+        """Envía lo pendiente; devuelve cuántas operaciones fallaron en este lote"""
+        if not self.pending:
+            return 0
+        ops, self.pending = self.pending, []
+        self.batches += 1
+        try:
+            result = self.collection.bulk_write(ops, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+        except Exception as e:
+            # Fallo del lote entero (red, autenticación...): todas sus operaciones cuentan como fallidas
+            self.failed += len(ops)
+            self._record({'filter': None, 'code': None, 'message': f"{type(e).__name__}: {e} ({len(ops)} ops)"})
+            return len(ops)
+
+        self.matched += details.get('nMatched', 0)
+        self.modified += details.get('nModified', 0)
+        self.upserted += details.get('nUpserted', 0)
+        write_errors = details.get('writeErrors', [])
+        self.failed += len(write_errors)
+        for error in write_errors:
+            op = ops[error['index']]
+            self._record({
+                'filter': getattr(op, '_filter', None),
+                'code': error.get('code'),
+                'message': error.get('errmsg')
+            })
+        return len(write_errors)
+
+    def _record(self, error):
+        if len(self.errors) < self.max_errors:
+            self.errors.append(error)
+
+    @property
+    def written(self):
+        return self.matched + self.upserted
+
+    def summary(self):
+        text = (f"{self.batches} lotes: {self.upserted} insertados, {self.modified} modificados, "
+                f"{self.matched - self.modified} sin cambios, {self.failed} fallidos")
+        for error in self.errors[:10]:
+            text += f"\n   ⚠️ {error['filter']}: {error['message']}"
+        if self.failed > 10:
+            text += f"\n   ... y {self.failed - min(10, len(self.errors))} fallos más"
+        return text
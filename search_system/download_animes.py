@@ -1,27 +1,139 @@
+import argparse
+import random
 import requests
+import threading
 import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict
 import os
 import re
+from requests.adapters import HTTPAdapter
 from database import Database, db
+from search_system.bulk_writer import BulkWriter
 from config import Config
 
-# Inicializar conexión a DB
-Database.init_db()
+class RateLimiter:
+    """
+    Ritmo de peticiones compartido entre hilos, guiado por las cabeceras de AniList.
+
+    AniList anuncia su límite por minuto en X-RateLimit-Limit (90, o 30 en modo
+    degradado) y lo que queda en X-RateLimit-Remaining; al pasarse responde 429
+    con Retry-After. Las peticiones se espacian 60/límite segundos y, tras un 429
+    o con el cupo agotado, todos los hilos esperan.
+    """
+    
+    def __init__(self, requests_per_minute: int = 90):
+        self.interval = 60.0 / requests_per_minute
+        self.next_slot = 0.0
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+    
+    def wait(self):
+        """Bloquea hasta que el hilo puede enviar su petición"""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot, self.paused_until)
+            self.next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    
+    def update(self, headers):
+        """Ajusta el ritmo con las cabeceras de una respuesta"""
+        with self.lock:
+            try:
+                limit = int(headers.get('X-RateLimit-Limit', 0))
+                if limit > 0:
+                    self.interval = 60.0 / limit
+                remaining = headers.get('X-RateLimit-Remaining')
+                if remaining is not None and int(remaining) <= 0:
+                    self._pause(self._reset_delay(headers, default=60.0))
+            except ValueError:
+                pass
+    
+    def throttled(self, headers) -> float:
+        """Registra un 429 y devuelve cuántos segundos hay que esperar"""
+        with self.lock:
+            delay = self._reset_delay(headers, default=60.0)
+            self._pause(delay)
+            return delay
+    
+    def _pause(self, delay):
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+    
+    @staticmethod
+    def _reset_delay(headers, default):
+        retry_after = headers.get('Retry-After')
+        if retry_after:
+            try:
+                return max(1.0, float(retry_after))
+            except ValueError:
+                pass
+        reset = headers.get('X-RateLimit-Reset')
+        if reset:
+            try:
+                return max(1.0, float(reset) - time.time())
+            except ValueError:
+                pass
+        return default
+
+
+class SyncCheckpoint:
+    """
+    Estado de la sincronización con AniList, un documento en la colección sync_state.
+
+    Campos: mode ('full' o 'incremental'), status ('running' o 'done'),
+    last_page (última página contigua ya guardada), max_updated_at (mayor
+    updatedAt visto en la pasada en curso) y last_updated_at (marca de agua de
+    la última pasada terminada, desde la que empieza la siguiente incremental).
+    """
+    
+    def __init__(self, collection, key: str = 'anilist_anime'):
+        self.collection = collection
+        self.key = key
+    
+    def load(self) -> Dict:
+        return self.collection.find_one({'_id': self.key}) or {}
+    
+    def save(self, **fields):
+        fields['saved_at'] = datetime.now()
+        self.collection.update_one({'_id': self.key}, {'$set': fields}, upsert=True)
+    
+    def reset(self):
+        self.collection.delete_one({'_id': self.key})
+
 
 class AnimeDatasetDownloader:
     """
     Descarga el dataset completo de anime desde AniList GraphQL API y lo guarda en MongoDB
     """
     
-    def __init__(self):
+    CHECKPOINT_EVERY = 10  # páginas entre checkpoints de la descarga completa
+    
+    def __init__(self, workers: int = 4, max_retries: int = 5, batch_size: int = Config.BULK_WRITE_BATCH_SIZE):
         self.api_url = "https://graphql.anilist.co"
         self.collection = db.db.animes
+        self.writer = BulkWriter(self.collection, batch_size=batch_size)
+        self.checkpoint = SyncCheckpoint(db.db.sync_state)
+        self.max_updated_at = 0
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.rate_limiter = RateLimiter()
+        
+        # Sesión con pool de conexiones: reutiliza TCP/TLS entre páginas e hilos
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        })
         
     def get_query(self) -> str:
         """Query GraphQL para obtener información completa de anime"""
         return '''
-        query ($page: Int, $perPage: Int) {
+        query ($page: Int, $perPage: Int, $sort: [MediaSort]) {
             Page(page: $page, perPage: $perPage) {
                 pageInfo {
                     total
@@ -30,8 +142,9 @@ class AnimeDatasetDownloader:
                     hasNextPage
                     perPage
                 }
-                media(type: ANIME, sort: POPULARITY_DESC) {
+                media(type: ANIME, sort: $sort) {
                     id
+                    updatedAt
                     idMal
                     title {
                         romaji
@@ -74,16 +187,12 @@ class AnimeDatasetDownloader:
         }
         '''
     
-    def fetch_page(self, page: int, per_page: int = 50) -> Dict:
+    def fetch_page(self, page: int, per_page: int = 50, sort: str = 'POPULARITY_DESC') -> Dict:
         """Obtiene una página de resultados"""
         variables = {
             'page': page,
-            'perPage': per_page
-        }
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
+            'perPage': per_page,
+            'sort': [sort, 'ID'] if sort != 'ID' else ['ID']  # ID desempata para que la paginación sea estable
         }
         
         payload = {
@@ -91,30 +200,40 @@ class AnimeDatasetDownloader:
             'variables': variables
         }
         
-        try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            # Verificar si hay errores en la respuesta
-            if 'errors' in data:
-                print(f"❌ Errores en la API: {data['errors']}")
-                return None
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                response = self.session.post(self.api_url, json=payload, timeout=30)
+                self.rate_limiter.update(response.headers)
+                
+                if response.status_code == 429:
+                    delay = self.rate_limiter.throttled(response.headers)
+                    print(f"\n⏳ Rate limit en página {page}, esperando {delay:.0f}s...")
+                    continue
+                
+                response.raise_for_status()
+                data = response.json()
                 
-            return data
+                # Verificar si hay errores en la respuesta
+                if 'errors' in data:
+                    print(f"\n❌ Errores en la API (página {page}): {data['errors']}")
+                    return None
+                    
+                return data
+                
+            except requests.exceptions.Timeout:
+                error = "timeout"
+            except requests.exceptions.RequestException as e:
+                error = str(e)
             
-        except requests.exceptions.Timeout:
-            print(f"⏱️ Timeout en página {page}, reintentando...")
-            time.sleep(2)
-            return None
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Error en página {page}: {e}")
-            return None
+            # Backoff exponencial con jitter antes del siguiente intento
+            if attempt < self.max_retries:
+                delay = min(30.0, 2 ** attempt) * random.uniform(0.5, 1.5)
+                print(f"\n⚠️ Página {page}: {error}, reintento {attempt + 1}/{self.max_retries} en {delay:.1f}s")
+                time.sleep(delay)
+        
+        print(f"\n❌ Página {page} falló tras {self.max_retries + 1} intentos")
+        return None
     
     def clean_description(self, description: str) -> str:
         """Limpia la descripción"""
@@ -172,7 +291,8 @@ class AnimeDatasetDownloader:
             'studios': [s['name'] for s in anime.get('studios', {}).get('nodes', []) if s],
             'cover_image': anime.get('coverImage', {}).get('extraLarge'),
             'banner_image': anime.get('bannerImage'),
-            'synonyms': anime.get('synonyms', [])
+            'synonyms': anime.get('synonyms', []),
+            'updated_at': anime.get('updatedAt')
         }
     
     def test_connection(self) -> bool:
@@ -191,15 +311,13 @@ class AnimeDatasetDownloader:
         '''
         
         try:
-            response = requests.post(
+            self.rate_limiter.wait()
+            response = self.session.post(
                 self.api_url,
                 json={'query': test_query},
-                headers={
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json',
-                },
                 timeout=10
             )
+            self.rate_limiter.update(response.headers)
             response.raise_for_status()
             data = response.json()
             
@@ -214,98 +332,224 @@ class AnimeDatasetDownloader:
             print(f"❌ Error de conexión: {e}")
             return False
     
-    def download_all(self, max_pages: int = None, retry_failed: bool = True):
-        """Descarga todo el dataset y lo guarda en MongoDB"""
+    def save_page(self, media: List[Dict]) -> int:
+        """Procesa los animes de una página y encola sus upserts; devuelve cuántos"""
+        upserted_count = 0
+        for anime in media:
+            try:
+                processed = self.process_anime(anime)
+                # Upsert en lote: el writer lo envía con bulk_write al llenar el lote
+                self.writer.upsert({'id': processed['id']}, {'$set': processed})
+                self.max_updated_at = max(self.max_updated_at, processed['updated_at'] or 0)
+                upserted_count += 1
+            except Exception as e:
+                print(f"\n⚠️ Error procesando anime: {e}")
+        return upserted_count
+    
+    def _advance(self, done_pages: set, last_page: int) -> int:
+        """Última página contigua descargada (las páginas terminan fuera de orden)"""
+        while last_page + 1 in done_pages:
+            last_page += 1
+            done_pages.discard(last_page)
+        return last_page
+    
+    def _save_progress(self, mode: str, last_page: int, **fields):
+        """Vacía las escrituras pendientes y luego guarda el checkpoint"""
+        self.writer.flush()
+        self.checkpoint.save(mode=mode, status='running', last_page=last_page,
+                             max_updated_at=self.max_updated_at, **fields)
+    
+    def _finish_sync(self, mode: str, last_page: int, previous_updated_at: int, **fields):
+        """Marca la sincronización como terminada y avanza la marca de agua de updatedAt"""
+        self.writer.flush()
+        # Con escrituras fallidas no se avanza: la próxima incremental vuelve a pedir esos cambios
+        last_updated_at = previous_updated_at if self.writer.failed else max(previous_updated_at, self.max_updated_at)
+        self.checkpoint.save(mode=mode, status='done', last_page=last_page,
+                             last_updated_at=last_updated_at, finished_at=datetime.now(), **fields)
+        return last_updated_at
+    
+    def download_all(self, max_pages: int = None, retry_failed: bool = True, per_page: int = 50,
+                     resume: bool = True):
+        """
+        Descarga todo el dataset y lo guarda en MongoDB.
+        
+        La primera página da el total; el resto se piden en paralelo con
+        self.workers hilos, al ritmo que marca el RateLimiter. Cada
+        CHECKPOINT_EVERY páginas se guarda la última página contigua en
+        sync_state, y una descarga interrumpida continúa desde ahí.
+        
+        Reanudar por número de página solo es seguro con un orden que no cambia
+        entre ejecuciones, así que la descarga completa va por ID. Con max_pages
+        se quieren los más populares: ese orden se mueve de una ejecución a otra
+        (los títulos saltarían de página), de modo que esa descarga no se reanuda.
+        """
         # Primero probar conexión
         if not self.test_connection():
             print("\n❌ No se pudo conectar con la API. Verifica tu conexión a internet.")
             return
         
-        print("\n🚀 Iniciando descarga del dataset de anime hacia MongoDB...")
+        print(f"\n🚀 Iniciando descarga del dataset de anime hacia MongoDB ({self.workers} hilos)...")
         
         # Crear índice único para id si no existe
         self.collection.create_index("id", unique=True)
         
-        page = 1
-        total_pages = None
+        sort = 'POPULARITY_DESC' if max_pages else 'ID'
+        resumable = sort == 'ID'
+        resume = resume and resumable
+        
+        def save_progress(page, **fields):
+            # Una descarga no reanudable no pisa el checkpoint de una completa a medias
+            if resumable:
+                self._save_progress('full', page, per_page=per_page, sort=sort, **fields)
+            else:
+                self.writer.flush()
+        
+        state = self.checkpoint.load()
+        previous_updated_at = state.get('last_updated_at') or 0
+        first_page = 1
+        if (resume and state.get('status') == 'running' and state.get('mode') == 'full'
+                and state.get('per_page') == per_page and state.get('sort') == sort):
+            first_page = state['last_page'] + 1
+            self.max_updated_at = state.get('max_updated_at') or 0
+            if max_pages and first_page > max_pages:
+                first_page, self.max_updated_at = 1, 0
+            else:
+                print(f"♻️ Reanudando la descarga interrumpida desde la página {first_page}")
+        
+        started = time.perf_counter()
         failed_pages = []
+        done_pages = set()
+        last_page = first_page - 1
         total_upserted = 0
+        pages_done = 0
         
-        while True:
-            if max_pages and page > max_pages:
-                break
-                
-            print(f"📥 Página {page}/{total_pages or '?'}...", end=" ", flush=True)
-            
-            data = self.fetch_page(page)
-            
-            if not data or 'data' not in data:
-                print("❌ Error")
-                failed_pages.append(page)
-                page += 1
-                time.sleep(2)
-                continue
-            
-            page_data = data['data']['Page']
-            page_info = page_data['pageInfo']
-            
-            if total_pages is None:
-                total_pages = page_info['lastPage']
-                print(f"\n📊 Total de páginas: {total_pages} (~{total_pages * 50} animes)")
-                print("-" * 60)
-            
-            # Procesar animes de esta página
-            upserted_count = 0
-            for anime in page_data['media']:
-                try:
-                    processed = self.process_anime(anime)
-                    # Upsert en MongoDB
-                    self.collection.update_one(
-                        {'id': processed['id']},
-                        {'$set': processed},
-                        upsert=True
-                    )
-                    upserted_count += 1
-                except Exception as e:
-                    print(f"\n⚠️ Error procesando anime: {e}")
-            
-            total_upserted += upserted_count
-            print(f"✅ (+{upserted_count} animes, total procesados: {total_upserted})")
-            
-            if not page_info['hasNextPage']:
-                print("\n✨ ¡Todas las páginas descargadas!")
-                break
-            
-            page += 1
-            time.sleep(0.7)  # Rate limiting amigable
+        data = self.fetch_page(first_page, per_page, sort)
+        if not data or 'data' not in data:
+            print(f"❌ No se pudo descargar la página {first_page}")
+            return
+        
+        page_data = data['data']['Page']
+        total_pages = page_data['pageInfo']['lastPage']
+        if max_pages:
+            total_pages = min(total_pages, max_pages)
+        print(f"📊 Total de páginas: {total_pages} (~{total_pages * per_page} animes)")
+        print("-" * 60)
+        total_upserted += self.save_page(page_data['media'])
+        pages_done += 1
+        last_page = first_page
+        save_progress(last_page, started_at=datetime.now())
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.fetch_page, page, per_page, sort): page
+                       for page in range(first_page + 1, total_pages + 1)}
+            for future in as_completed(futures):
+                page = futures[future]
+                data = future.result()
+                if not data or 'data' not in data:
+                    failed_pages.append(page)
+                    continue
+                # Los upserts se hacen en este hilo mientras los demás siguen descargando
+                total_upserted += self.save_page(data['data']['Page']['media'])
+                pages_done += 1
+                done_pages.add(page)
+                advanced = self._advance(done_pages, last_page)
+                if advanced - last_page >= self.CHECKPOINT_EVERY or (advanced > last_page and advanced == total_pages):
+                    save_progress(advanced)
+                last_page = advanced
+                elapsed = time.perf_counter() - started
+                print(f"📥 {pages_done}/{total_pages - first_page + 1} páginas, {total_upserted} animes, "
+                      f"{pages_done / elapsed:.2f} páginas/s", end="\r", flush=True)
+        print()
         
-        # Reintentar páginas fallidas
+        # Reintentar páginas fallidas (cada una ya agotó sus reintentos con backoff)
         if failed_pages and retry_failed:
             print(f"\n🔄 Reintentando {len(failed_pages)} páginas fallidas...")
-            for failed_page in failed_pages:
+            for failed_page in sorted(failed_pages):
                 print(f"   Reintentando página {failed_page}...", end=" ")
-                data = self.fetch_page(failed_page)
+                data = self.fetch_page(failed_page, per_page, sort)
                 if data and 'data' in data:
-                    upserted_count = 0
-                    for anime in data['data']['Page']['media']:
-                        try:
-                            processed = self.process_anime(anime)
-                            self.collection.update_one(
-                                {'id': processed['id']},
-                                {'$set': processed},
-                                upsert=True
-                            )
-                            upserted_count += 1
-                        except:
-                            pass
-                    total_upserted += upserted_count
+                    total_upserted += self.save_page(data['data']['Page']['media'])
+                    pages_done += 1
+                    failed_pages.remove(failed_page)
+                    done_pages.add(failed_page)
+                    last_page = self._advance(done_pages, last_page)
                     print("✅")
                 else:
                     print("❌")
-                time.sleep(1)
+        
+        if failed_pages:
+            # Queda como interrumpida: la próxima ejecución reanuda desde la primera página que falta
+            save_progress(last_page)
+        elif resumable or state.get('status') != 'running':
+            self._finish_sync('full', last_page, previous_updated_at, per_page=per_page, sort=sort)
+        
+        elapsed = time.perf_counter() - started
+        print(f"\n✨ {pages_done} páginas en {elapsed:.1f}s ({pages_done / elapsed:.2f} páginas/s), "
+              f"{total_upserted - self.writer.failed} animes guardados")
+        print(f"💾 Escrituras en MongoDB: {self.writer.summary()}")
+        if failed_pages and resumable:
+            print(f"⚠️ Páginas sin descargar: {sorted(failed_pages)} (se reanudará desde la página {last_page + 1})")
+        elif failed_pages:
+            print(f"⚠️ Páginas sin descargar: {sorted(failed_pages)} (vuelve a ejecutar la descarga)")
         
         self.print_statistics()
     
+    def sync_incremental(self, per_page: int = 50, since: int = None, max_pages: int = None):
+        """
+        Descarga solo los animes modificados desde la última sincronización.
+        
+        Pide las páginas ordenadas por updatedAt descendente y se detiene en
+        la primera entrada que no es más reciente que la marca de agua
+        guardada en sync_state. Sin checkpoint previo hace una descarga completa.
+        """
+        if not self.test_connection():
+            print("\n❌ No se pudo conectar con la API. Verifica tu conexión a internet.")
+            return
+        
+        state = self.checkpoint.load()
+        if state.get('status') == 'running' and state.get('mode') == 'incremental' and since is None:
+            since = state['since']
+            page = state['last_page'] + 1
+            self.max_updated_at = state.get('max_updated_at') or since
+            print(f"♻️ Reanudando la sincronización incremental desde la página {page}")
+        else:
+            if since is None:
+                since = state.get('last_updated_at')
+            if not since:
+                print("ℹ️ No hay checkpoint de sincronización: se hace una descarga completa")
+                return self.download_all(max_pages=max_pages, per_page=per_page)
+            page = 1
+            self.max_updated_at = since
+        
+        print(f"\n🔄 Sincronizando cambios desde {datetime.fromtimestamp(since):%Y-%m-%d %H:%M}...")
+        self.collection.create_index("id", unique=True)
+        started = time.perf_counter()
+        changed = 0
+        
+        while True:
+            data = self.fetch_page(page, per_page, sort='UPDATED_AT_DESC')
+            if not data or 'data' not in data:
+                self._save_progress('incremental', page - 1, since=since)
+                print(f"❌ La página {page} falló; la próxima ejecución reanuda desde ella")
+                return
+            page_data = data['data']['Page']
+            media = page_data['media']
+            fresh = [anime for anime in media if (anime.get('updatedAt') or 0) > since]
+            changed += self.save_page(fresh)
+            print(f"📥 Página {page}: {len(fresh)} animes modificados", end="\r", flush=True)
+            # Orden descendente: en cuanto aparece uno antiguo, el resto también lo es
+            if len(fresh) < len(media) or not page_data['pageInfo']['hasNextPage']:
+                break
+            self._save_progress('incremental', page, since=since)
+            page += 1
+        print()
+        
+        last_updated_at = self._finish_sync('incremental', page, since, since=since)
+        elapsed = time.perf_counter() - started
+        print(f"\n✨ {changed - self.writer.failed} animes actualizados en {page} páginas ({elapsed:.1f}s)")
+        print(f"💾 Escrituras en MongoDB: {self.writer.summary()}")
+        print(f"🕒 Próxima sincronización desde {datetime.fromtimestamp(last_updated_at):%Y-%m-%d %H:%M}")
+    
     def print_statistics(self):
         """Imprime estadísticas del dataset en MongoDB"""
         count = self.collection.count_documents({})
@@ -330,14 +574,23 @@ def main():
     print("  DESCARGADOR DE DATASET DE ANIME - AniList API -> MongoDB")
     print("="*60)
     
-    downloader = AnimeDatasetDownloader()
-    
-    # Descarga todo el dataset
-    # Para pruebas rápidas puedes descomentar la siguiente línea
-    # downloader.download_all(max_pages=5) 
+    parser = argparse.ArgumentParser(description='Descarga el catálogo de AniList a MongoDB')
+    parser.add_argument('--max-pages', type=int, default=20, help='Páginas a descargar (0 = todas); 20 páginas = 1000 animes')
+    parser.add_argument('--per-page', type=int, default=50, help='Animes por página (máximo de AniList: 50)')
+    parser.add_argument('--workers', type=int, default=4, help='Peticiones en paralelo')
+    parser.add_argument('--max-retries', type=int, default=5, help='Reintentos por página con backoff')
+    parser.add_argument('--batch-size', type=int, default=Config.BULK_WRITE_BATCH_SIZE, help='Upserts por bulk_write')
+    parser.add_argument('--incremental', action='store_true', help='Solo animes modificados desde la última sincronización')
+    parser.add_argument('--restart', action='store_true', help='Ignorar el checkpoint y empezar desde la página 1')
+    args = parser.parse_args()
     
-    # Descarga 1000 animes (20 páginas * 50 animes)
-    downloader.download_all(max_pages=20)
+    Database.init_db()
+    downloader = AnimeDatasetDownloader(workers=args.workers, max_retries=args.max_retries, batch_size=args.batch_size)
+    per_page = min(50, args.per_page)
+    if args.incremental:
+        downloader.sync_incremental(per_page=per_page)
+    else:
+        downloader.download_all(max_pages=args.max_pages or None, per_page=per_page, resume=not args.restart)
     
     print("\n✅ ¡Proceso de descarga completado!")
     print("📝 Siguiente paso: Ejecutar generate_embeddings.py")
@@ -1,13 +1,121 @@
 import os
+import random
+import threading
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import openai
 from openai import OpenAI
 from database import Database, db
+from search_system.batch_api import BatchRunner
+from search_system.bulk_writer import BulkWriter
 from config import Config
+from utils import content_hash
 from tqdm import tqdm
 
-# Inicializar conexión a DB
-Database.init_db()
+class TokenBucket:
+    """Cubeta que se rellena a ritmo constante; admite ráfagas de hasta 10 s de cupo"""
+    
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        # OpenAI aplica los límites también en ventanas cortas: no se acumula un minuto entero
+        self.capacity = max(1.0, self.rate * 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+    
+    def set_rate(self, per_minute):
+        self._refill(time.monotonic())
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * 10)
+        self.tokens = min(self.tokens, self.capacity)
+    
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount, now):
+        """Segundos hasta que hay `amount` tokens (0 si ya los hay)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+    
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class LLMRateLimiter:
+    """
+    Presupuesto combinado de peticiones (RPM) y tokens (TPM) compartido entre hilos.
+    
+    acquire() bloquea hasta que caben la petición y sus tokens estimados. Tras
+    un 429 todos los hilos esperan Retry-After y el ritmo baja un 30%; cada
+    respuesta correcta lo recupera un 2% hasta volver al límite configurado.
+    """
+    
+    def __init__(self, rpm, tpm, min_scale=0.1):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.min_scale = min_scale
+        self.scale = 1.0
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self.throttle_count = 0
+        self.lock = threading.Lock()
+    
+    def acquire(self, tokens):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                delay = max(self.paused_until - now,
+                            self.requests.wait_time(1, now),
+                            self.tokens.wait_time(tokens, now))
+                if delay <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return
+            time.sleep(min(delay, 1.0))
+    
+    def settle(self, reserved, used):
+        """Corrige la estimación de tokens con lo que informó la API"""
+        with self.lock:
+            self.tokens.tokens = min(self.tokens.capacity, self.tokens.tokens + reserved - used)
+    
+    def success(self):
+        with self.lock:
+            if self.scale < 1.0:
+                self._set_scale(min(1.0, self.scale + 0.02))
+    
+    def throttled(self, delay):
+        with self.lock:
+            self.throttle_count += 1
+            self._set_scale(max(self.min_scale, self.scale * 0.7))
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+    
+    def _set_scale(self, scale):
+        self.scale = scale
+        self.requests.set_rate(self.rpm * scale)
+        self.tokens.set_rate(self.tpm * scale)
+
+
+def _retry_after(error, default):
+    """Segundos de espera que pide una respuesta 429 de OpenAI"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    for name, factor in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return max(0.5, float(value) * factor)
+            except ValueError:
+                pass
+    return default
+
+
+# Campos que se piden al LLM (compartido por el prompt individual y el empaquetado)
+FIELDS_SPEC = """1. "world_lore": 2-3 oraciones explicando el sistema de magia/tecnología del mundo, las estructuras de poder, y el setting. Si no aplica magia/tecnología especial, describe el mundo y su contexto.
+2. "vibe_check": 1-2 oraciones usando jerga de la comunidad, memes, y referencias culturales que los fans usan para describir este anime. Sé informal y auténtico.
+3. "vibe_keywords": Array de 5-10 términos específicos, frases icónicas, o memes asociados con este anime. Incluye tanto términos en japonés como en español/inglés si son relevantes."""
+
 
 class LLMEnricher:
     """
@@ -15,59 +123,129 @@ class LLMEnricher:
     - world_lore: Sistema de magia/tecnología y geopolítica del mundo
     - vibe_check: Descripción con memes y referencias culturales
     - vibe_keywords: Términos clave que la comunidad usa
+
+    Cada documento guarda enrichment_hash (hash del prompt) y enrichment_model;
+    solo se vuelve a llamar al LLM si alguno de los dos cambió.
     """
     
-    def __init__(self, test_mode=False):
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+    SYSTEM_PROMPT = "Eres un experto en anime que genera metadatos estructurados en formato JSON."
+    MAX_TOKENS = 500
+    REQUIRED_FIELDS = ('world_lore', 'vibe_check', 'vibe_keywords')
+    
+    def __init__(self, test_mode=False, batch_size=Config.BULK_WRITE_BATCH_SIZE, workers=Config.ENRICH_WORKERS,
+                 rpm=Config.ENRICH_RPM, tpm=Config.ENRICH_TPM, max_retries=Config.ENRICH_MAX_RETRIES,
+                 pack_size=Config.ENRICH_PACK_SIZE):
+        # Los reintentos (429, 5xx, red) los gestiona _complete con el limitador compartido
+        self.client = OpenAI(api_key=Config.OPENAI_API_KEY, max_retries=0)
         self.collection = db.db.animes
         self.model = "gpt-4o-mini"
         self.test_mode = test_mode
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.limiter = LLMRateLimiter(rpm, tpm)
+        self.pack_size = max(1, pack_size)
+        # Consumo real de la ejecución: peticiones, tokens y animes reintentados fuera de su paquete
+        self.usage = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'split': 0}
+        self._usage_lock = threading.Lock()
         
-    def create_enrichment_prompt(self, anime):
-        """Crea el prompt para enriquecer un anime"""
+    def describe(self, anime):
+        """Bloque con los datos de un anime que se le pasan al LLM"""
         title = anime.get('main_title', 'Unknown')
         description = anime.get('description', '')[:1000]  # Limitar a 1000 chars
         genres = ', '.join(anime.get('genres', []))
         tags = ', '.join(anime.get('tags', [])[:10])
-        
-        prompt = f"""Eres un experto en anime y miembro activo de la comunidad otaku. Analiza este anime:
-
-Título: {title}
+        return f"""Título: {title}
 Sinopsis: {description}
 Géneros: {genres}
-Tags: {tags}
+Tags: {tags}"""
+    
+    def create_enrichment_prompt(self, anime):
+        """Crea el prompt para enriquecer un anime"""
+        prompt = f"""Eres un experto en anime y miembro activo de la comunidad otaku. Analiza este anime:
+
+{self.describe(anime)}
 
 Genera una respuesta en formato JSON con exactamente estos campos:
-1. "world_lore": 2-3 oraciones explicando el sistema de magia/tecnología del mundo, las estructuras de poder, y el setting. Si no aplica magia/tecnología especial, describe el mundo y su contexto.
-2. "vibe_check": 1-2 oraciones usando jerga de la comunidad, memes, y referencias culturales que los fans usan para describir este anime. Sé informal y auténtico.
-3. "vibe_keywords": Array de 5-10 términos específicos, frases icónicas, o memes asociados con este anime. Incluye tanto términos en japonés como en español/inglés si son relevantes.
+{FIELDS_SPEC}
 
 Responde SOLAMENTE con el JSON, sin texto adicional."""
 
         return prompt
     
+    def create_packed_prompt(self, animes):
+        """Prompt con varios animes: instrucciones una sola vez y respuesta JSON con una clave por id"""
+        blocks = '\n\n'.join(f"### {anime['id']}\n{self.describe(anime)}" for anime in animes)
+        keys = ', '.join(f'"{anime["id"]}"' for anime in animes)
+        return f"""Eres un experto en anime y miembro activo de la comunidad otaku. Analiza estos {len(animes)} animes (cada uno empieza con ### y su id):
+
+{blocks}
+
+Genera una respuesta en formato JSON: un objeto con una clave por anime ({keys}) cuyo valor tenga exactamente estos campos:
+{FIELDS_SPEC}
+
+Trata cada anime por separado y responde SOLAMENTE con el JSON, sin texto adicional."""
+    
+    def request_body(self, prompt, max_tokens=None):
+        """Parámetros de la chat completion (los mismos en modo síncrono y en batch)"""
+        return {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            'temperature': 0.7,
+            'max_tokens': max_tokens or self.MAX_TOKENS,
+            'response_format': {"type": "json_object"}
+        }
+    
+    def _complete(self, prompt, max_tokens=None):
+        """
+        Chat completion dentro del presupuesto RPM/TPM, con reintentos.
+        
+        La reserva de tokens es una estimación (~3 caracteres por token del
+        prompt más max_tokens, que OpenAI también descuenta del TPM); se corrige
+        con usage al recibir la respuesta.
+        """
+        max_tokens = max_tokens or self.MAX_TOKENS
+        reserved = (len(self.SYSTEM_PROMPT) + len(prompt)) // 3 + max_tokens
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(reserved)
+            try:
+                response = self.client.chat.completions.create(**self.request_body(prompt, max_tokens))
+            except openai.RateLimitError as e:
+                if getattr(e, 'code', None) == 'insufficient_quota' or attempt == self.max_retries:
+                    raise  # sin saldo no tiene sentido reintentar
+                self.limiter.throttled(_retry_after(e, default=min(60.0, 2 ** attempt)))
+                continue
+            except (openai.APIConnectionError, openai.InternalServerError):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(min(30.0, 2 ** attempt) * random.uniform(0.5, 1.5))
+                continue
+            usage = getattr(response, 'usage', None)
+            with self._usage_lock:
+                self.usage['requests'] += 1
+                if usage is not None:
+                    self.usage['prompt_tokens'] += usage.prompt_tokens
+                    self.usage['completion_tokens'] += usage.completion_tokens
+            if usage is not None:
+                self.limiter.settle(reserved, usage.prompt_tokens + max_tokens)
+            self.limiter.success()
+            return response
+    
     def enrich_anime(self, anime):
-        """Enriquece un anime con LLM"""
+        """Enriquece un anime con LLM; los errores se quedan en este anime (devuelve None)"""
+        content = None
         try:
             prompt = self.create_enrichment_prompt(anime)
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Eres un experto en anime que genera metadatos estructurados en formato JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=500,
-                response_format={"type": "json_object"}
-            )
+            response = self._complete(prompt)
             
             content = response.choices[0].message.content
             enriched_data = json.loads(content)
             
             # Validar que los campos existan
-            required_fields = ['world_lore', 'vibe_check', 'vibe_keywords']
-            for field in required_fields:
+            for field in self.REQUIRED_FIELDS:
                 if field not in enriched_data:
                     print(f"⚠️ Campo faltante {field} en respuesta para {anime.get('main_title')}")
                     return None
@@ -83,76 +261,187 @@ Responde SOLAMENTE con el JSON, sin texto adicional."""
             print(f"❌ Error enriqueciendo {anime.get('main_title')}: {e}")
             return None
     
+    def _valid(self, item):
+        return (isinstance(item, dict) and all(item.get(field) for field in self.REQUIRED_FIELDS)
+                and isinstance(item['vibe_keywords'], list))
+    
+    def enrich_many(self, animes):
+        """
+        Enriquece varios animes con una sola petición -> resultados alineados con animes.
+        
+        Cada elemento de la respuesta se valida por separado; los que faltan o
+        no tienen REQUIRED_FIELDS se reintentan uno a uno con enrich_anime.
+        """
+        if len(animes) == 1:
+            return [self.enrich_anime(animes[0])]
+        packed = {}
+        try:
+            response = self._complete(self.create_packed_prompt(animes), max_tokens=self.MAX_TOKENS * len(animes))
+            packed = json.loads(response.choices[0].message.content)
+            if not isinstance(packed, dict):
+                packed = {}
+        except Exception as e:
+            print(f"⚠️ Falló un paquete de {len(animes)} animes ({e}); se reintentan uno a uno")
+        
+        results = []
+        for anime in animes:
+            item = packed.get(str(anime['id']))
+            results.append({field: item[field] for field in self.REQUIRED_FIELDS} if self._valid(item) else None)
+        retry = [i for i, result in enumerate(results) if result is None]
+        with self._usage_lock:
+            self.usage['split'] += len(retry)
+        for i in retry:
+            results[i] = self.enrich_anime(animes[i])
+        return results
+    
+    # Campos que necesitan el prompt y la detección de cambios
+    PROJECTION = {'_id': 0, 'id': 1, 'main_title': 1, 'description': 1, 'genres': 1, 'tags': 1,
+                  'enrichment_hash': 1, 'enrichment_model': 1, 'world_lore': 1, 'vibe_check': 1,
+                  'vibe_keywords': 1}
+    
+    def check(self, anime, skip_enriched=True):
+        """
+        Qué hacer con un anime -> (acción, hash del prompt).
+
+        'skip' si el prompt y el modelo no cambiaron, 'adopt' si se enriqueció
+        antes de existir enrichment_hash (se da por bueno y solo se registra el
+        hash) y 'enrich' en el resto de casos.
+        """
+        prompt_hash = content_hash(self.create_enrichment_prompt(anime))
+        if not skip_enriched:
+            return 'enrich', prompt_hash
+        if anime.get('enrichment_hash') == prompt_hash and anime.get('enrichment_model') == self.model:
+            return 'skip', prompt_hash
+        enriched = all(anime.get(f) for f in ('world_lore', 'vibe_check', 'vibe_keywords'))
+        if enriched and 'enrichment_hash' not in anime:
+            return 'adopt', prompt_hash
+        return 'enrich', prompt_hash
+    
+    def adopt(self, writer, anime, prompt_hash):
+        writer.update({'id': anime['id']}, {'$set': {'enrichment_hash': prompt_hash, 'enrichment_model': self.model}})
+    
+    def pending(self, writer, limit=None, skip_enriched=True):
+        """Animes cuyo prompt o modelo cambió desde su último enriquecimiento -> [(anime, hash)]"""
+        pending = []
+        adopted = 0
+        for anime in self.collection.find({}, self.PROJECTION):
+            action, prompt_hash = self.check(anime, skip_enriched)
+            if action == 'adopt':
+                self.adopt(writer, anime, prompt_hash)
+                adopted += 1
+            elif action == 'enrich' and (not limit or len(pending) < limit):
+                pending.append((anime, prompt_hash))
+        if adopted:
+            print(f"🏷️ {adopted} animes ya enriquecidos registrados con su hash (sin llamar al LLM)")
+        return pending
+    
     def process_all(self, limit=None, skip_enriched=True):
-        """Procesa todos los animes en la DB"""
+        """Enriquece los animes nuevos o con datos de entrada modificados"""
         print(f"🚀 Iniciando enriquecimiento LLM con {self.model}...")
         
-        # Filtro: solo los que no tienen los campos enriquecidos
-        query = {}
-        if skip_enriched:
-            query = {
-                "$or": [
-                    {"world_lore": {"$exists": False}},
-                    {"vibe_check": {"$exists": False}},
-                    {"vibe_keywords": {"$exists": False}}
-                ]
-            }
-        
-        total_to_process = self.collection.count_documents(query)
+        # Las actualizaciones se acumulan y se envían con bulk_write por lotes
+        writer = BulkWriter(self.collection, batch_size=self.batch_size)
+        pending = self.pending(writer, limit=limit, skip_enriched=skip_enriched)
+        total_to_process = len(pending)
         
         if limit:
-            total_to_process = min(total_to_process, limit)
             print(f"📊 Modo de prueba: procesando {total_to_process} animes")
         else:
             print(f"📊 Animes a enriquecer: {total_to_process}")
         
         if total_to_process == 0:
+            writer.flush()
             print("✅ Todos los animes ya están enriquecidos.")
             return
         
-        cursor = self.collection.find(query).limit(limit) if limit else self.collection.find(query)
-        
         success_count = 0
         error_count = 0
+        started = time.perf_counter()
         
         # Barra de progreso
         pbar = tqdm(total=total_to_process, desc="Enriqueciendo")
         
-        for anime in cursor:
-            enriched_data = self.enrich_anime(anime)
-            
-            if enriched_data:
-                # Actualizar en MongoDB
-                self.collection.update_one(
-                    {'id': anime['id']},
-                    {'$set': enriched_data}
-                )
-                success_count += 1
-                
-                if self.test_mode and success_count <= 2:
-                    print(f"\n✅ Ejemplo enriquecido: {anime.get('main_title')}")
-                    print(f"   World Lore: {enriched_data['world_lore'][:100]}...")
-                    print(f"   Vibe Check: {enriched_data['vibe_check'][:100]}...")
-                    print(f"   Keywords: {', '.join(enriched_data['vibe_keywords'][:5])}")
-            else:
-                error_count += 1
-            
-            pbar.update(1)
-            
-            # Rate limiting: OpenAI tiene límite de ~3000 RPM para GPT-4o-mini
-            # Con 1000 animes, vamos a hacerlo a ~10/segundo para estar seguros
-            time.sleep(0.15)
+        # Paquetes de pack_size animes en paralelo al ritmo del limitador; las escrituras, en este hilo
+        packs = [pending[i:i + self.pack_size] for i in range(0, total_to_process, self.pack_size)]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='enrich') as pool:
+            futures = {pool.submit(self.enrich_many, [anime for anime, _ in pack]): pack for pack in packs}
+            for future in as_completed(futures):
+                for (anime, prompt_hash), enriched_data in zip(futures[future], future.result()):
+                    if enriched_data:
+                        # Actualizar en MongoDB (en lote), con el hash de la entrada usada
+                        enriched_data.update(enrichment_hash=prompt_hash, enrichment_model=self.model)
+                        writer.update({'id': anime['id']}, {'$set': enriched_data})
+                        success_count += 1
+                        
+                        if self.test_mode and success_count <= 2:
+                            print(f"\n✅ Ejemplo enriquecido: {anime.get('main_title')}")
+                            print(f"   World Lore: {enriched_data['world_lore'][:100]}...")
+                            print(f"   Vibe Check: {enriched_data['vibe_check'][:100]}...")
+                            print(f"   Keywords: {', '.join(enriched_data['vibe_keywords'][:5])}")
+                    else:
+                        error_count += 1
+                    
+                    pbar.update(1)
         
         pbar.close()
+        elapsed = time.perf_counter() - started
+        writer.flush()
+        success_count -= writer.failed
+        error_count += writer.failed
         
         print("\n" + "="*60)
         print("📊 RESUMEN DE ENRIQUECIMIENTO")
         print("="*60)
         print(f"✅ Exitosos: {success_count}")
         print(f"❌ Errores: {error_count}")
+        print(f"⏱️ {elapsed:.1f}s ({total_to_process / elapsed:.1f} animes/s), "
+              f"{self.limiter.throttle_count} respuestas 429, ritmo final {self.limiter.scale:.0%} del límite")
+        print(f"🔢 {self.usage['requests']} peticiones ({self.pack_size} animes por paquete), "
+              f"{self.usage['prompt_tokens']} tokens de entrada, {self.usage['completion_tokens']} de salida, "
+              f"{self.usage['split']} reintentados por separado")
+        print(f"💾 Escrituras en MongoDB: {writer.summary()}")
         print(f"📈 Tasa de éxito: {success_count/total_to_process*100:.1f}%")
         print("="*60)
         
+    def process_batch_api(self, limit=None, skip_enriched=True, wait=True, poll_interval=Config.BATCH_POLL_SECONDS):
+        """
+        Enriquecimiento con el Batch API (mitad de coste, sin RPM/TPM síncrono).
+        
+        Si hay trabajos abiertos de una ejecución anterior se retoman y no se
+        envían nuevos; si no, se envían los animes pendientes. Con wait=False
+        solo envía/sondea una vez: basta con volver a ejecutarlo más tarde.
+        """
+        print(f"🚀 Enriquecimiento con Batch API ({self.model})...")
+        writer = BulkWriter(self.collection, batch_size=self.batch_size)
+        runner = BatchRunner(self.client, 'enrich', '/v1/chat/completions', db.db.batch_jobs,
+                             Config.BATCH_DIR, max_requests=Config.BATCH_MAX_REQUESTS)
+        
+        def handle(custom_id, body, prompt_hash):
+            try:
+                enriched_data = json.loads(body['choices'][0]['message']['content'])
+            except (KeyError, IndexError, TypeError, ValueError):
+                return False
+            if not all(field in enriched_data for field in self.REQUIRED_FIELDS):
+                return False
+            enriched_data.update(enrichment_hash=prompt_hash, enrichment_model=self.model)
+            writer.update({'id': int(custom_id)}, {'$set': enriched_data})
+            return True
+        
+        if runner.open_jobs():
+            print("♻️ Hay trabajos de una ejecución anterior: se retoman antes de enviar más")
+        else:
+            pending = self.pending(writer, limit=limit, skip_enriched=skip_enriched)
+            print(f"📊 Animes a enriquecer: {len(pending)}")
+            runner.submit([(str(anime['id']), self.request_body(self.create_enrichment_prompt(anime)), prompt_hash)
+                           for anime, prompt_hash in pending])
+        
+        remaining = runner.run(handle, wait=wait, poll_interval=poll_interval)
+        writer.flush()
+        print(f"\n✅ Ingeridos: {runner.ingested - writer.failed}  ❌ Fallidos: {runner.failed + writer.failed}")
+        print(f"💾 Escrituras en MongoDB: {writer.summary()}")
+        if remaining:
+            print(f"⏳ {remaining} trabajos siguen en curso: vuelve a ejecutar con --batch para ingerirlos")
+        
     def get_statistics(self):
         """Muestra estadísticas de enriquecimiento"""
         total = self.collection.count_documents({})
@@ -178,7 +467,14 @@ def main():
     parser.add_argument('--test-mode', action='store_true', help='Modo de prueba (procesa solo 5 animes)')
     parser.add_argument('--limit', type=int, help='Limitar número de animes a procesar')
     parser.add_argument('--stats', action='store_true', help='Mostrar solo estadísticas')
-    parser.add_argument('--force', action='store_true', help='Forzar re-enriquecimiento de todos los animes')
+    parser.add_argument('--force', action='store_true', help='Re-enriquecer todos los animes aunque no hayan cambiado')
+    parser.add_argument('--batch-size', type=int, default=Config.BULK_WRITE_BATCH_SIZE, help='Actualizaciones por bulk_write')
+    parser.add_argument('--workers', type=int, default=Config.ENRICH_WORKERS, help='Llamadas al LLM en paralelo')
+    parser.add_argument('--rpm', type=int, default=Config.ENRICH_RPM, help='Límite de peticiones por minuto')
+    parser.add_argument('--tpm', type=int, default=Config.ENRICH_TPM, help='Límite de tokens por minuto')
+    parser.add_argument('--pack-size', type=int, default=Config.ENRICH_PACK_SIZE, help='Animes por petición (1 = sin empaquetar)')
+    parser.add_argument('--batch', action='store_true', help='Usar el Batch API de OpenAI (reanudable)')
+    parser.add_argument('--no-wait', action='store_true', help='Con --batch: enviar/sondear una vez y salir')
     
     args = parser.parse_args()
     
@@ -186,7 +482,9 @@ def main():
         print("❌ Error: OPENAI_API_KEY no encontrada en .env")
         return
     
-    enricher = LLMEnricher(test_mode=args.test_mode)
+    Database.init_db()
+    enricher = LLMEnricher(test_mode=args.test_mode, batch_size=args.batch_size, workers=args.workers,
+                           rpm=args.rpm, tpm=args.tpm, pack_size=args.pack_size)
     
     if args.stats:
         enricher.get_statistics()
@@ -199,7 +497,10 @@ def main():
     print("  ENRIQUECIMIENTO DE DATASET CON LLM")
     print("="*60)
     
-    enricher.process_all(limit=limit, skip_enriched=skip_enriched)
+    if args.batch:
+        enricher.process_batch_api(limit=limit, skip_enriched=skip_enriched, wait=not args.no_wait)
+    else:
+        enricher.process_all(limit=limit, skip_enriched=skip_enriched)
     enricher.get_statistics()
     
     print("\n✅ ¡Proceso de enriquecimiento completado!")
@@ -0,0 +1,103 @@
+import time
+import numpy as np
+
+
+def year_bucket(year):
+    """Agrupa el año de emisión por década (ej. 2013 -> '2010s')"""
+    if not year:
+        return None
+    return f"{int(year) // 10 * 10}s"
+
+
+class FacetIndex:
+    """
+    Conteos de facetas (género, formato, década, estudio) sobre un conjunto de filas.
+
+    Cada atributo se guarda en forma columnar como dos arrays paralelos
+    (fila, código de valor). Los atributos multivalor (géneros, estudios)
+    simplemente tienen varias parejas por fila. Contar un subconjunto de filas
+    es entonces una máscara booleana + np.bincount, sin tocar MongoDB.
+    """
+
+    # nombre de faceta -> función que extrae la lista de valores de un documento
+    EXTRACTORS = {
+        'genres': lambda doc: doc.get('genres') or [],
+        'format': lambda doc: [doc['format']] if doc.get('format') else [],
+        'year': lambda doc: [year_bucket(doc['year'])] if doc.get('year') else [],
+        'studios': lambda doc: doc.get('studios') or [],
+    }
+
+    def __init__(self, docs=()):
+        self.row_of = {}
+        self.labels = {}
+        self.rows = {}
+        self.codes = {}
+        self.totals = {}
+
+        pairs = {name: ([], []) for name in self.EXTRACTORS}
+        vocab = {name: {} for name in self.EXTRACTORS}
+
+        for doc in docs:
+            anime_id = doc.get('id')
+            if anime_id is None or anime_id in self.row_of:
+                continue
+            row = len(self.row_of)
+            self.row_of[anime_id] = row
+            for name, extract in self.EXTRACTORS.items():
+                rows, codes = pairs[name]
+                for value in extract(doc):
+                    code = vocab[name].setdefault(value, len(vocab[name]))
+                    rows.append(row)
+                    codes.append(code)
+
+        for name in self.EXTRACTORS:
+            rows, codes = pairs[name]
+            self.labels[name] = list(vocab[name])
+            self.rows[name] = np.array(rows, dtype=np.int32)
+            self.codes[name] = np.array(codes, dtype=np.int32)
+            # Conteo sobre todo el catálogo (caso /api/animes sin filtros)
+            self.totals[name] = np.bincount(self.codes[name], minlength=len(self.labels[name]))
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def counts(self, ids=None, limit=20, budget_ms=None):
+        """
+        Devuelve {faceta: [{'value': ..., 'count': ...}, ...]} ordenado por conteo.
+
+        ids=None cuenta sobre todo el catálogo. Si se supera budget_ms se dejan
+        de calcular las facetas restantes y se marca el resultado como parcial.
+        """
+        start = time.perf_counter()
+        selected = None
+        if ids is not None:
+            selected = np.zeros(len(self.row_of), dtype=bool)
+            rows = [self.row_of[i] for i in ids if i in self.row_of]
+            if rows:
+                selected[rows] = True
+
+        facets = {}
+        partial = False
+        for name in self.EXTRACTORS:
+            if budget_ms is not None and (time.perf_counter() - start) * 1000 > budget_ms:
+                partial = True
+                break
+
+            labels = self.labels[name]
+            if selected is None:
+                counts = self.totals[name]
+            else:
+                mask = selected[self.rows[name]]
+                counts = np.bincount(self.codes[name][mask], minlength=len(labels))
+
+            nonzero = np.flatnonzero(counts)
+            order = nonzero[np.argsort(-counts[nonzero], kind='stable')]
+            if limit:
+                order = order[:limit]
+            facets[name] = [{'value': labels[i], 'count': int(counts[i])} for i in order]
+
+        return {
+            'facets': facets,
+            'partial': partial,
+            'took_ms': round((time.perf_counter() - start) * 1000, 3)
+        }
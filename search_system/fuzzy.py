@@ -0,0 +1,157 @@
+import re
+import numpy as np
+from utils import normalizar_texto
+
+
+def fuzzy_key(texto):
+    """Forma normalizada sin puntuación (ej. "Journey's End" -> "journeys end")"""
+    texto = normalizar_texto(texto)
+    texto = re.sub(r"['’`]", '', texto)
+    texto = re.sub(r'[^\w\s]', ' ', texto)
+    return ' '.join(texto.split())
+
+
+def trigrams(texto):
+    """Trigramas de caracteres con relleno para dar peso al inicio de la palabra"""
+    padded = f"  {texto} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a, b, max_dist, prefix=False):
+    """
+    Distancia de edición limitada a max_dist (devuelve max_dist + 1 si la supera).
+
+    Solo se calcula la banda |i - j| <= max_dist y se corta en cuanto una fila
+    entera supera el límite. Con prefix=True se compara contra el mejor prefijo
+    de b (útil cuando el usuario escribe solo el comienzo del título).
+    """
+    big = max_dist + 1
+    if prefix:
+        b = b[:len(a) + max_dist]
+    elif abs(len(a) - len(b)) > max_dist:
+        return big
+    lb = len(b)
+
+    prev = [j if j <= max_dist else big for j in range(lb + 1)]
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - max_dist)
+        hi = min(lb, i + max_dist)
+        cur = [big] * (lb + 1)
+        cur[0] = i if i <= max_dist else big
+        ca = a[i - 1]
+        for j in range(lo, hi + 1):
+            cost = 0 if ca == b[j - 1] else 1
+            value = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            cur[j] = value if value < big else big
+        if min(cur[lo - 1:hi + 1]) >= big:
+            return big
+        prev = cur
+
+    return min(prev) if prefix else prev[lb]
+
+
+class TrigramIndex:
+    """
+    Búsqueda tolerante a errores sobre las variantes de título de un TitleIndex.
+
+    Los candidatos salen del solapamiento de trigramas (listas invertidas +
+    np.bincount) y solo los mejores se verifican con distancia de edición acotada.
+    """
+
+    def __init__(self, titles=None):
+        self.meta = titles.meta if titles is not None else {}
+        self.keys = []
+        self.ids = []
+        self.originals = []
+        seen = set()
+        if titles is not None:
+            for key, anime_id, original in zip(titles.keys, titles.ids.tolist(), titles.originals):
+                key = fuzzy_key(key)
+                if key and (key, anime_id) not in seen:
+                    seen.add((key, anime_id))
+                    self.keys.append(key)
+                    self.ids.append(anime_id)
+                    self.originals.append(original)
+
+        postings = {}
+        gram_counts = []
+        for row, key in enumerate(self.keys):
+            grams = trigrams(key)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(row)
+        self.postings = {g: np.array(rows, dtype=np.int32) for g, rows in postings.items()}
+        self.gram_counts = np.array(gram_counts, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def candidates(self, key, max_candidates=30, min_similarity=0.25):
+        """Filas con mayor coeficiente de Dice de trigramas respecto a key"""
+        grams = trigrams(key)
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            return []
+        overlap = np.bincount(np.concatenate(lists), minlength=len(self.keys))
+        dice = 2 * overlap / (len(grams) + self.gram_counts)
+        if len(dice) > max_candidates:
+            rows = np.argpartition(-dice, max_candidates)[:max_candidates]
+        else:
+            rows = np.arange(len(dice))
+        rows = rows[dice[rows] >= min_similarity]
+        return rows[np.argsort(-dice[rows], kind='stable')].tolist()
+
+    def lookup(self, query, limit=5, max_edit_ratio=0.25, prefix=True, max_candidates=30, max_dist=None):
+        """
+        Títulos a distancia de edición <= max_edit_ratio * len(query) (o max_dist).
+
+        Devuelve [{id, title, matched, distance, score, ...}] ordenado por
+        distancia y popularidad, un resultado por anime.
+        """
+        key = fuzzy_key(query)
+        if not key:
+            return []
+        if max_dist is None:
+            max_dist = max(1, int(len(key) * max_edit_ratio))
+
+        best = {}
+        for row in self.candidates(key, max_candidates=max_candidates):
+            target = self.keys[row]
+            distance = bounded_levenshtein(key, target, max_dist)
+            if prefix and distance > 0:
+                distance = min(distance, bounded_levenshtein(key, target, max_dist, prefix=True))
+            if distance > max_dist:
+                continue
+            anime_id = self.ids[row]
+            if anime_id not in best or distance < best[anime_id][0]:
+                best[anime_id] = (distance, row)
+
+        matches = []
+        for anime_id, (distance, row) in best.items():
+            meta = self.meta.get(anime_id, {'id': anime_id})
+            matches.append({
+                **meta,
+                'matched': self.originals[row],
+                'distance': distance,
+                'score': round(1 - distance / max(len(key), len(self.keys[row])), 4),
+                'exact': distance == 0 and key == self.keys[row]
+            })
+        matches.sort(key=lambda m: (m['distance'], -(m.get('popularity') or 0)))
+        return matches[:limit]
+
+    def exact_title(self, query, max_edits=1):
+        """
+        ID del anime cuyo título completo coincide con query (hasta max_edits
+        errores, nunca por prefijo). None si no hay coincidencia inequívoca.
+        """
+        key = fuzzy_key(query)
+        if len(key) < 4:
+            return None
+        # Consultas cortas no admiten errores: "mob" no debe convertirse en "moe"
+        max_edits = min(max_edits, len(key) // 8)
+        matches = self.lookup(key, limit=2, prefix=False, max_candidates=10, max_dist=max_edits)
+        if not matches:
+            return None
+        if matches[0]['distance'] > 0 and len(matches) > 1 and matches[1]['distance'] == matches[0]['distance']:
+            return None  # ambiguo; con coincidencia exacta gana el más popular
+        return matches[0]['id']
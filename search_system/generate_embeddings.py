@@ -3,18 +3,21 @@ import time
 import numpy as np
 from openai import OpenAI
 from database import Database, db
+from search_system.batch_api import BatchRunner
+from search_system.bulk_writer import BulkWriter
 from config import Config
-from utils import normalizar_texto
+from utils import normalizar_texto, content_hash
 from tqdm import tqdm
 
-# Inicializar conexión a DB
-Database.init_db()
-
 class EmbeddingGenerator:
-    def __init__(self):
+    def __init__(self, write_batch_size=Config.BULK_WRITE_BATCH_SIZE):
         self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
         self.collection = db.db.animes
         self.model = Config.EMBEDDING_MODEL
+        # Los embeddings se guardan con bulk_write; export_numpy lee después de vaciarlo
+        self.writer = BulkWriter(self.collection, batch_size=write_batch_size)
+        self.legacy = None  # IDs con embedding pero sin embedding_hash (se cargan al primer check)
+        self.adopted = 0
         
     def generate_embedding(self, text):
         """Genera embedding para un texto"""
@@ -25,108 +28,169 @@ class EmbeddingGenerator:
             print(f"Error generando embedding: {e}")
             return None
 
+    def build_text(self, anime):
+        """Texto normalizado que se embebe para un anime"""
+        # Usar enhanced_description + campos enriquecidos por LLM si existen
+        text_parts = [anime.get(field) for field in ('enhanced_description', 'world_lore', 'vibe_check')]
+        text_parts = [part for part in text_parts if part]
+        
+        # Fallback a description básica o título si no hay campos enriquecidos
+        if not text_parts:
+            text = anime.get('description') or anime.get('main_title')
+        else:
+            text = ' '.join(text_parts)
+        
+        # NORMALIZAR TEXTO (Importante para coincidir con la búsqueda)
+        return normalizar_texto(text)
+
+    # Campos que necesitan build_text y la detección de cambios
+    PROJECTION = {'_id': 0, 'id': 1, 'enhanced_description': 1, 'world_lore': 1, 'vibe_check': 1,
+                  'description': 1, 'main_title': 1, 'embedding_hash': 1, 'embedding_model': 1}
+
+    def load_legacy(self):
+        """Animes con embedding generado antes de existir embedding_hash (sin leer los vectores)"""
+        query = {'embedding': {'$exists': True}, 'embedding_hash': {'$exists': False}}
+        self.legacy = {doc['id'] for doc in self.collection.find(query, {'_id': 0, 'id': 1})}
+        return self.legacy
+
+    def check(self, anime, force_regenerate=False, allow_adopt=True):
+        """
+        Qué hacer con un anime -> (acción, {'id', 'text', 'hash'} o None).
+
+        'skip' si el texto y el modelo no cambiaron, 'adopt' si ya tiene un
+        embedding de antes de existir embedding_hash (se da por bueno y solo se
+        registra el hash, como LLMEnricher.adopt) y 'embed' en el resto de casos.
+        """
+        text = self.build_text(anime)
+        if not text:
+            return 'skip', None
+        item = {'id': anime['id'], 'text': text, 'hash': content_hash(text)}
+        if force_regenerate:
+            return 'embed', item
+        if anime.get('embedding_hash') == item['hash'] and anime.get('embedding_model') == self.model:
+            return 'skip', item
+        if self.legacy is None:
+            self.load_legacy()
+        if allow_adopt and 'embedding_hash' not in anime and anime['id'] in self.legacy:
+            return 'adopt', item
+        return 'embed', item
+
+    def adopt(self, item):
+        """Registra el hash del texto actual para un embedding existente, sin llamar a la API"""
+        self.writer.update({'id': item['id']}, {'$set': {'embedding_hash': item['hash'], 'embedding_model': self.model}})
+        self.legacy.discard(item['id'])
+        self.adopted += 1
+
+    def pending(self, force_regenerate=False):
+        """Animes cuyo texto o modelo cambió -> [item]; los embeddings sin hash se adoptan"""
+        pending = []
+        for anime in self.collection.find({}, self.PROJECTION):
+            action, item = self.check(anime, force_regenerate)
+            if action == 'adopt':
+                self.adopt(item)
+            elif action == 'embed':
+                pending.append(item)
+        if self.adopted:
+            print(f"🏷️ {self.adopted} embeddings existentes registrados con su hash (sin llamar a la API)")
+        return pending
+
     def process_all(self, batch_size=100, force_regenerate=False):
-        """Genera embeddings para todos los animes en la DB"""
+        """
+        Genera embeddings solo para los animes cuyo texto o modelo cambió.
+        
+        Cada documento guarda embedding_hash (hash del texto embebido) y
+        embedding_model; si coinciden con los actuales no se llama a la API.
+        Los embeddings anteriores al hash se adoptan; --force los regenera.
+        """
         print(f"🚀 Iniciando generación de embeddings usando {self.model}...")
         
-        # Filtro: solo los que no tienen embedding o todos si force_regenerate
-        query = {} if force_regenerate else {"embedding": {"$exists": False}}
-        total_to_process = self.collection.count_documents(query)
+        pending = self.pending(force_regenerate)
         
+        total_to_process = len(pending)
         print(f"📊 Animes a procesar: {total_to_process}")
         
         if total_to_process == 0:
-            print("✅ Todos los animes ya tienen embeddings.")
+            print("✅ Todos los embeddings están al día.")
+            self.writer.flush()
             self.export_numpy()
             return
-
-        cursor = self.collection.find(query)
-        batch = []
         
         # Barra de progreso
         pbar = tqdm(total=total_to_process)
         
-        for anime in cursor:
-            # Usar enhanced_description + campos enriquecidos por LLM si existen
-            text_parts = []
-            
-            # Enhanced description
-            enhanced = anime.get('enhanced_description')
-            if enhanced:
-                text_parts.append(enhanced)
-            
-            # World lore (enriquecido por LLM)
-            world_lore = anime.get('world_lore')
-            if world_lore:
-                text_parts.append(world_lore)
-            
-            # Vibe check (enriquecido por LLM)
-            vibe_check = anime.get('vibe_check')
-            if vibe_check:
-                text_parts.append(vibe_check)
-            
-            # Fallback a description básica o título si no hay campos enriquecidos
-            if not text_parts:
-                text = anime.get('description') or anime.get('main_title')
-            else:
-                text = ' '.join(text_parts)
-            
-            # NORMALIZAR TEXTO (Importante para coincidir con la búsqueda)
-            text = normalizar_texto(text)
-            
-            if not text:
-                pbar.update(1)
-                continue
-                
-            batch.append({
-                'id': anime['id'],
-                'text': text
-            })
-            
-            if len(batch) >= batch_size:
-                self.process_batch(batch)
-                pbar.update(len(batch))
-                batch = []
-                time.sleep(0.1) # Rate limiting
-        
-        # Procesar remanente
-        if batch:
+        for i in range(0, total_to_process, batch_size):
+            batch = pending[i:i + batch_size]
             self.process_batch(batch)
             pbar.update(len(batch))
+            if i + batch_size < total_to_process:
+                time.sleep(0.1) # Rate limiting
             
         pbar.close()
+        self.writer.flush()
+        print(f"💾 Escrituras en MongoDB: {self.writer.summary()}")
         self.export_numpy()
 
-    def process_batch(self, batch):
-        """Procesa un lote de animes"""
+    def process_batch_api(self, force_regenerate=False, wait=True, poll_interval=Config.BATCH_POLL_SECONDS):
+        """
+        Embeddings con el Batch API (mitad de coste). Reanudable como
+        LLMEnricher.process_batch_api; exporta embeddings.npy al terminar.
+        """
+        print(f"🚀 Embeddings con Batch API ({self.model})...")
+        runner = BatchRunner(self.client, 'embed', '/v1/embeddings', db.db.batch_jobs,
+                             Config.BATCH_DIR, max_requests=Config.BATCH_MAX_REQUESTS)
+        
+        def handle(custom_id, body, text_hash):
+            try:
+                embedding = body['data'][0]['embedding']
+            except (KeyError, IndexError, TypeError):
+                return False
+            self.save({'id': int(custom_id), 'hash': text_hash}, embedding)
+            return True
+        
+        if runner.open_jobs():
+            print("♻️ Hay trabajos de una ejecución anterior: se retoman antes de enviar más")
+        else:
+            pending = self.pending(force_regenerate)
+            print(f"📊 Animes a procesar: {len(pending)}")
+            runner.submit([(str(item['id']), {'model': self.model, 'input': item['text']}, item['hash'])
+                           for item in pending])
+        
+        remaining = runner.run(handle, wait=wait, poll_interval=poll_interval)
+        self.writer.flush()
+        print(f"💾 Escrituras en MongoDB: {self.writer.summary()}")
+        if remaining:
+            print(f"⏳ {remaining} trabajos siguen en curso: vuelve a ejecutar con --batch para ingerirlos")
+            return
+        self.export_numpy()
+
+    def embed_batch(self, batch):
+        """Embeddings de un lote, alineados con batch (None donde falló); no escribe en MongoDB"""
         try:
             texts = [item['text'] for item in batch]
             # OpenAI permite batches
             response = self.client.embeddings.create(input=texts, model=self.model)
-            
-            for i, data in enumerate(response.data):
-                embedding = data.embedding
-                anime_id = batch[i]['id']
-                
-                # Guardar en MongoDB
-                self.collection.update_one(
-                    {'id': anime_id},
-                    {'$set': {'embedding': embedding}}
-                )
-                
+            return [data.embedding for data in response.data]
         except Exception as e:
             print(f"❌ Error en batch: {e}")
-            # Fallback: intentar uno por uno si falla el batch
-            for item in batch:
-                # Ya está normalizado en process_all
-                embedding = self.generate_embedding(item['text'])
-                if embedding:
-                    self.collection.update_one(
-                        {'id': item['id']},
-                        {'$set': {'embedding': embedding}}
-                    )
-                else:
-                    print(f"⚠️ Falló embedding para anime {item['id']}")
+            # Fallback: intentar uno por uno si falla el batch (ya está normalizado)
+            return [self.generate_embedding(item['text']) for item in batch]
+    
+    def process_batch(self, batch):
+        """Procesa un lote de animes"""
+        for item, embedding in zip(batch, self.embed_batch(batch)):
+            if embedding:
+                # Guardar en MongoDB (en lote)
+                self.save(item, embedding)
+            else:
+                print(f"⚠️ Falló embedding para anime {item['id']}")
+    
+    def save(self, item, embedding):
+        """Encola el embedding junto con el hash del texto y el modelo usados"""
+        self.writer.update({'id': item['id']}, {'$set': {
+            'embedding': embedding,
+            'embedding_hash': item['hash'],
+            'embedding_model': self.model
+        }})
  
     def export_numpy(self):
         """Exporta todos los embeddings a un archivo .npy para FAISS"""
@@ -155,17 +219,34 @@ class EmbeddingGenerator:
             return
 
         embeddings_array = np.array(embeddings_list, dtype='float32')
-        np.save("embeddings.npy", embeddings_array)
+        # Escritura atómica: un proceso que recargue el índice nunca lee un fichero a medias
+        with open("embeddings.npy.tmp", 'wb') as f:
+            np.save(f, embeddings_array)
+        os.replace("embeddings.npy.tmp", "embeddings.npy")
         print(f"✅ Archivo 'embeddings.npy' guardado con {count} vectores.")
+        return count
 
 def main():
     if not Config.OPENAI_API_KEY:
         print("❌ Error: OPENAI_API_KEY no encontrada en .env")
         return
         
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Genera embeddings de los animes')
+    parser.add_argument('--force', action='store_true',
+                        help='Regenerar todos los embeddings aunque el texto no haya cambiado (también los anteriores a embedding_hash)')
+    parser.add_argument('--batch-size', type=int, default=100, help='Textos por llamada a la API de embeddings')
+    parser.add_argument('--batch', action='store_true', help='Usar el Batch API de OpenAI (reanudable)')
+    parser.add_argument('--no-wait', action='store_true', help='Con --batch: enviar/sondear una vez y salir')
+    args = parser.parse_args()
+    
+    Database.init_db()
     generator = EmbeddingGenerator()
-    # Forzar regeneración para aplicar normalización
-    generator.process_all(force_regenerate=True)
+    if args.batch:
+        generator.process_batch_api(force_regenerate=args.force, wait=not args.no_wait)
+    else:
+        generator.process_all(batch_size=args.batch_size, force_regenerate=args.force)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,90 @@
+import math
+import re
+import numpy as np
+from utils import normalizar_texto
+from .title_index import title_variants
+
+# Palabras sin contenido en consultas típicas (inglés y español)
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'of', 'in', 'on', 'with', 'about', 'that', 'this', 'is', 'are',
+    'to', 'for', 'where', 'who', 'makes', 'make', 'you', 'me', 'my', 'like', 'some', 'something',
+    'anime', 'animes', 'show', 'series',
+    'el', 'la', 'los', 'las', 'un', 'una', 'de', 'del', 'y', 'o', 'en', 'con', 'sobre', 'que',
+    'por', 'para', 'donde', 'me', 'algo', 'como',
+}
+
+# Peso de cada campo: un término del título pesa más que un tag
+FIELD_WEIGHTS = (('titles', 3.0), ('vibe_keywords', 2.0), ('tags', 1.5))
+
+
+def tokenize(texto):
+    return [t for t in re.findall(r'\w+', normalizar_texto(texto)) if len(t) > 1 and t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    Búsqueda léxica en memoria sobre títulos, tags y vibe_keywords.
+
+    Se usa como respaldo cuando no hay vector de consulta (API de embeddings
+    caída o lenta). Cada término tiene una lista invertida de (fila, peso del
+    campo) y la puntuación es sum(idf * peso) calculada con np.bincount.
+    """
+
+    def __init__(self, docs=()):
+        postings = {}
+        ids = []
+        popularity = []
+        for doc in docs:
+            anime_id = doc.get('id')
+            if anime_id is None:
+                continue
+            row = len(ids)
+            ids.append(anime_id)
+            popularity.append(doc.get('popularity') or 0)
+
+            fields = {
+                'titles': ' '.join(original for _, original in title_variants(doc)),
+                'vibe_keywords': ' '.join(doc.get('vibe_keywords') or []),
+                'tags': ' '.join(t for t in (doc.get('tags') or []) if isinstance(t, str)),
+            }
+            weights = {}
+            for field, weight in FIELD_WEIGHTS:
+                for token in tokenize(fields[field]):
+                    weights[token] = max(weights.get(token, 0.0), weight)
+            for token, weight in weights.items():
+                postings.setdefault(token, ([], []))
+                postings[token][0].append(row)
+                postings[token][1].append(weight)
+
+        self.ids = np.array(ids, dtype=np.int64)
+        n = max(1, len(ids))
+        self.postings = {}
+        for token, (rows, weights) in postings.items():
+            idf = math.log(1 + n / len(rows))
+            self.postings[token] = (np.array(rows, dtype=np.int32), np.array(weights, dtype=np.float32) * idf)
+        # Desempate suave por popularidad (nunca supera el peso de un término)
+        pop = np.log1p(np.array(popularity, dtype=np.float32))
+        self.pop_bonus = pop / (pop.max() * 100) if len(pop) and pop.max() > 0 else np.zeros(len(ids), np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, top_k=10):
+        """[(anime_id, score 0-100)] ordenado por relevancia léxica"""
+        tokens = set(tokenize(query))
+        hits = [self.postings[t] for t in tokens if t in self.postings]
+        if not hits:
+            return []
+        rows = np.concatenate([h[0] for h in hits])
+        scores = np.bincount(rows, weights=np.concatenate([h[1] for h in hits]), minlength=len(self.ids))
+        matched = np.flatnonzero(scores)
+        scores = scores[matched] + self.pop_bonus[matched]
+        if len(matched) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            best = np.arange(len(matched))
+        best = best[np.argsort(-scores[best], kind='stable')]
+
+        # Normalizar contra la puntuación de un documento que tuviera todos los términos en el título
+        ceiling = sum(float(h[1].max()) for h in hits) or 1.0
+        return [(int(self.ids[matched[i]]), round(min(100.0, float(scores[i]) / ceiling * 100), 2)) for i in best]
@@ -0,0 +1,300 @@
+"""
+Pipeline de datos completo: descarga -> enriquecimiento -> embeddings -> índice.
+
+    python -m search_system.pipeline                       # todo (descarga incremental si hay checkpoint)
+    python -m search_system.pipeline --since 7d            # solo lo modificado en AniList en 7 días
+    python -m search_system.pipeline --skip download --enrich-workers 8
+
+La descarga mantiene su propio checkpoint en sync_state. Enriquecimiento y
+embeddings comparten un único cursor sobre la colección: cada documento pasa
+por el LLM si su prompt cambió y, en cuanto vuelve, se encola para embeddings si
+su texto cambió, así que las dos etapas se solapan. Los hashes que se guardan
+con cada escritura hacen de checkpoint: una ejecución interrumpida solo repite
+lo que no llegó a escribirse. Al final se exporta embeddings.npy, el artefacto
+que carga SearchEngine.
+"""
+import argparse
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+
+from config import Config
+from database import Database, db
+from search_system.bulk_writer import BulkWriter
+from search_system.download_animes import AnimeDatasetDownloader, SyncCheckpoint
+from search_system.enrich_with_llm import LLMEnricher
+from search_system.generate_embeddings import EmbeddingGenerator
+
+STAGES = ('download', 'enrich', 'embed', 'index')
+
+
+class StageStats:
+    """Volumen y ventana de tiempo de una etapa (las etapas solapadas miden la suya)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.skipped = 0
+        self.errors = 0
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        if self.started is None:
+            self.started = time.perf_counter()
+
+    def stop(self):
+        if self.started is not None:
+            self.finished = time.perf_counter()
+
+    @property
+    def seconds(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    @property
+    def throughput(self):
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {'items': self.items, 'skipped': self.skipped, 'errors': self.errors,
+                'seconds': round(self.seconds, 2), 'per_second': round(self.throughput, 2)}
+
+
+def parse_since(value):
+    """'7d', '12h', '2026-10-01', '2026-10-01T06:00' o un timestamp Unix -> timestamp Unix"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([dh])', value)
+    if match:
+        amount = float(match.group(1))
+        delta = timedelta(days=amount) if match.group(2) == 'd' else timedelta(hours=amount)
+        return int((datetime.now() - delta).timestamp())
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+class Pipeline:
+    def __init__(self, stages=STAGES, since=None, force=False, max_pages=None, download_workers=4,
+                 enrich_workers=Config.ENRICH_WORKERS, embed_workers=2, embed_batch_size=100,
+                 write_batch_size=Config.BULK_WRITE_BATCH_SIZE, pack_size=Config.ENRICH_PACK_SIZE):
+        self.stages = [name for name in STAGES if name in stages]
+        self.since = since
+        self.force = force
+        self.max_pages = max_pages
+        self.download_workers = download_workers
+        self.enrich_workers = max(1, enrich_workers)
+        self.embed_workers = max(1, embed_workers)
+        self.embed_batch_size = embed_batch_size
+        self.write_batch_size = write_batch_size
+        self.stats = {name: StageStats(name) for name in self.stages}
+
+        # Un solo writer para enriquecimiento y embeddings; solo se usa desde el hilo principal
+        self.writer = BulkWriter(db.db.animes, batch_size=write_batch_size)
+        self.enricher = (LLMEnricher(batch_size=write_batch_size, workers=self.enrich_workers, pack_size=pack_size)
+                         if 'enrich' in self.stages else None)
+        self.generator = EmbeddingGenerator(write_batch_size=write_batch_size)
+        self.generator.writer = self.writer
+        self.checkpoint = SyncCheckpoint(db.db.sync_state, key='pipeline')
+
+        self._futures = {}  # future -> (etapa, payload)
+        self._pack = []     # (anime, hash) pendientes de enriquecer en un mismo paquete
+        self._batch = []    # textos pendientes de embedding
+        self._pools = {}
+
+    # --- Etapas ---
+
+    def download(self):
+        stats = self.stats['download']
+        stats.start()
+        downloader = AnimeDatasetDownloader(workers=self.download_workers, batch_size=self.write_batch_size)
+        downloader.sync_incremental(since=self.since, max_pages=self.max_pages)
+        stats.items = downloader.writer.written
+        stats.errors = downloader.writer.failed
+        stats.stop()
+
+    def stream(self):
+        """Un solo cursor: enriquecimiento y embeddings solapados documento a documento"""
+        query = {'updated_at': {'$gt': self.since}} if self.since else {}
+        projection = dict(EmbeddingGenerator.PROJECTION)
+        if self.enricher is not None:
+            projection.update(LLMEnricher.PROJECTION)
+        # Acota lo que hay en vuelo para no leer el cursor entero a memoria
+        max_in_flight = 2 * (self.enrich_workers + self.embed_workers)
+
+        print(f"\n🔁 Procesando documentos ({self.enrich_workers} hilos LLM, {self.embed_workers} hilos de embeddings)...")
+        with ThreadPoolExecutor(self.enrich_workers, thread_name_prefix='enrich') as enrich_pool, \
+                ThreadPoolExecutor(self.embed_workers, thread_name_prefix='embed') as embed_pool:
+            self._pools = {'enrich': enrich_pool, 'embed': embed_pool}
+            try:
+                for anime in db.db.animes.find(query, projection):
+                    self._route(anime)
+                    self._drain(block=len(self._futures) >= max_in_flight)
+                if self._pack:
+                    self._submit_enrichment()
+
+                # Los últimos enriquecidos todavía pueden añadir textos al lote de embeddings
+                while self._futures or self._batch:
+                    enriching = any(stage == 'enrich' for stage, _ in self._futures.values())
+                    if self._batch and not enriching:
+                        self._submit_embeddings()
+                    else:
+                        self._drain(block=True)
+            finally:
+                for pool in self._pools.values():
+                    pool.shutdown(cancel_futures=True)
+                self.writer.flush()
+
+    def build_index(self):
+        stats = self.stats['index']
+        stats.start()
+        self.writer.flush()
+        stats.items = self.generator.export_numpy() or 0
+        stats.stop()
+
+    # --- Enrutado por documento ---
+
+    def _route(self, anime):
+        if self.enricher is None:
+            return self._queue_embedding(anime)
+        stats = self.stats['enrich']
+        action, prompt_hash = self.enricher.check(anime, skip_enriched=not self.force)
+        if action == 'enrich':
+            self._pack.append((anime, prompt_hash))
+            if len(self._pack) >= self.enricher.pack_size:
+                self._submit_enrichment()
+            return
+        if action == 'adopt':
+            self.enricher.adopt(self.writer, anime, prompt_hash)
+        stats.skipped += 1
+        self._queue_embedding(anime)
+
+    def _submit_enrichment(self):
+        pack, self._pack = self._pack, []
+        self.stats['enrich'].start()
+        future = self._pools['enrich'].submit(self.enricher.enrich_many, [anime for anime, _ in pack])
+        self._futures[future] = ('enrich', pack)
+
+    def _queue_embedding(self, anime, allow_adopt=True):
+        if 'embed' not in self.stats:
+            return
+        action, item = self.generator.check(anime, self.force, allow_adopt=allow_adopt)
+        if action == 'adopt':
+            self.generator.adopt(item)
+        if action != 'embed':
+            self.stats['embed'].skipped += 1
+            return
+        self._batch.append(item)
+        if len(self._batch) >= self.embed_batch_size:
+            self._submit_embeddings()
+
+    def _submit_embeddings(self):
+        batch, self._batch = self._batch, []
+        self.stats['embed'].start()
+        future = self._pools['embed'].submit(self.generator.embed_batch, batch)
+        self._futures[future] = ('embed', batch)
+
+    def _drain(self, block):
+        """Recoge los resultados terminados y escribe desde este hilo"""
+        if not self._futures:
+            return
+        done, _ = wait(self._futures, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            stage, payload = self._futures.pop(future)
+            if stage == 'enrich':
+                for (anime, prompt_hash), enriched_data in zip(payload, future.result()):
+                    self._enriched(anime, prompt_hash, enriched_data)
+            else:
+                self._embedded(payload, future.result())
+
+    def _enriched(self, anime, prompt_hash, enriched_data):
+        stats = self.stats['enrich']
+        if enriched_data:
+            enriched_data.update(enrichment_hash=prompt_hash, enrichment_model=self.enricher.model)
+            self.writer.update({'id': anime['id']}, {'$set': enriched_data})
+            anime.update(enriched_data)
+            stats.items += 1
+        else:
+            stats.errors += 1
+        stats.stop()
+        # Con o sin enriquecimiento nuevo, el texto del embedding se compara por hash;
+        # si el texto acaba de cambiar, un embedding sin hash ya no vale y no se adopta
+        self._queue_embedding(anime, allow_adopt=not enriched_data)
+
+    def _embedded(self, batch, embeddings):
+        stats = self.stats['embed']
+        for item, embedding in zip(batch, embeddings):
+            if embedding:
+                self.generator.save(item, embedding)
+                stats.items += 1
+            else:
+                stats.errors += 1
+        stats.stop()
+        print(f"📥 {self.stats['embed'].items} embeddings, "
+              f"{self.stats['enrich'].items if 'enrich' in self.stats else 0} enriquecidos", end="\r", flush=True)
+
+    # --- Ejecución ---
+
+    def run(self):
+        started = time.perf_counter()
+        if 'download' in self.stages:
+            self.download()
+        if 'enrich' in self.stages or 'embed' in self.stages:
+            self.stream()
+        if 'index' in self.stages:
+            self.build_index()
+        elapsed = time.perf_counter() - started
+
+        self.checkpoint.save(stages=self.stages, since=self.since, finished_at=datetime.now(),
+                             seconds=round(elapsed, 2), stats={name: s.as_dict() for name, s in self.stats.items()})
+        self.report(elapsed)
+
+    def report(self, elapsed):
+        print("\n" + "=" * 60)
+        print("📊 RESUMEN DEL PIPELINE")
+        print("=" * 60)
+        print(f"{'Etapa':<10} {'Hechos':>8} {'Sin cambios':>12} {'Errores':>8} {'Tiempo':>9} {'Por seg':>8}")
+        for stats in self.stats.values():
+            print(f"{stats.name:<10} {stats.items:>8} {stats.skipped:>12} {stats.errors:>8} "
+                  f"{stats.seconds:>8.1f}s {stats.throughput:>8.1f}")
+        print(f"⏱️ Total: {elapsed:.1f}s")
+        print(f"💾 Escrituras en MongoDB: {self.writer.summary()}")
+        print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipeline completo: descarga, enriquecimiento, embeddings e índice')
+    parser.add_argument('--since', type=parse_since,
+                        help="Solo animes modificados en AniList desde esta fecha ('7d', '12h', '2026-10-01' o timestamp)")
+    parser.add_argument('--skip', action='append', choices=STAGES, default=[], help='Etapa a omitir (repetible)')
+    parser.add_argument('--force', action='store_true', help='Reprocesar aunque los hashes no hayan cambiado')
+    parser.add_argument('--max-pages', type=int, help='Límite de páginas si la descarga es completa')
+    parser.add_argument('--download-workers', type=int, default=4, help='Peticiones en paralelo a AniList')
+    parser.add_argument('--enrich-workers', type=int, default=Config.ENRICH_WORKERS,
+                        help='Llamadas al LLM en paralelo (al ritmo de ENRICH_RPM/ENRICH_TPM)')
+    parser.add_argument('--pack-size', type=int, default=Config.ENRICH_PACK_SIZE, help='Animes por petición al LLM')
+    parser.add_argument('--embed-workers', type=int, default=2, help='Lotes de embeddings en paralelo')
+    parser.add_argument('--embed-batch-size', type=int, default=100, help='Textos por llamada de embeddings')
+    parser.add_argument('--batch-size', type=int, default=Config.BULK_WRITE_BATCH_SIZE, help='Operaciones por bulk_write')
+    args = parser.parse_args()
+
+    stages = [name for name in STAGES if name not in args.skip]
+    if not Config.OPENAI_API_KEY and ('enrich' in stages or 'embed' in stages):
+        print("❌ Error: OPENAI_API_KEY no encontrada en .env")
+        return
+
+    print("=" * 60)
+    print("  PIPELINE DE DATOS: " + " -> ".join(stages))
+    print("=" * 60)
+
+    Database.init_db()
+    pipeline = Pipeline(stages=stages, since=args.since, force=args.force, max_pages=args.max_pages,
+                        download_workers=args.download_workers, enrich_workers=args.enrich_workers,
+                        embed_workers=args.embed_workers, embed_batch_size=args.embed_batch_size,
+                        write_batch_size=args.batch_size, pack_size=args.pack_size)
+    pipeline.run()
+
+
+if __name__ == "__main__":
+    main()
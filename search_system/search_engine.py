@@ -1,22 +1,89 @@
 import json
 import os
+import hashlib
+import threading
+import random
+import time
 import numpy as np
 import faiss
 from config import Config
 from utils import normalizar_texto, limpiar_html
 from database import Database, db
+from services import metrics, profiler
+from services.logging_service import get_logger
+from .facets import FacetIndex
+from .title_index import TitleIndex
+from .fuzzy import TrigramIndex
+from .lexical import LexicalIndex
+from .semantic_cache import SemanticCache, overlap
+
+logger = get_logger('search_engine')
+
+# Campos ligeros del catálogo que se mantienen en memoria (facetas, títulos, etc.)
+CATALOG_FIELDS = {
+    'id': 1, 'genres': 1, 'format': 1, 'year': 1, 'studios': 1,
+    'title': 1, 'main_title': 1, 'synonyms': 1, 'popularity': 1, 'cover_image': 1,
+    'tags': 1, 'vibe_keywords': 1
+}
+
+# Campos que cambia cualquier escritura del pipeline (descarga, enriquecimiento,
+# embeddings): entran en la versión de datos aunque embeddings.npy no cambie
+WATERMARK_FIELDS = ('score', 'status', 'episodes', 'updated_at',
+                    'enrichment_hash', 'enrichment_model', 'embedding_hash')
+
+
+def catalog_watermark(catalog):
+    """Hash del snapshot del catálogo (CATALOG_FIELDS + WATERMARK_FIELDS), independiente del orden"""
+    digest = hashlib.sha1()
+    for doc in sorted(catalog, key=lambda d: d.get('id') or 0):
+        digest.update(repr([(k, doc[k]) for k in sorted(doc) if k != '_id']).encode('utf-8'))
+    return digest.hexdigest()
 
 class SearchEngine:
     ids = []  # Lista de IDs que corresponde índice por índice con FAISS
     index = None
     dim = 0
+    facets = FacetIndex()
+    titles = TitleIndex()
+    fuzzy = TrigramIndex()
+    lexical = LexicalIndex()  # respaldo sin embeddings
+    semantic_cache = None  # rankings de consultas casi idénticas (se recrea en cada carga)
+    positions = {}  # anime_id -> fila en el índice FAISS
+    version = None  # Cambia cada vez que se recarga el índice/catálogo
+    _lock = threading.Lock()       # protege la publicación de ids/index/version
+    _load_lock = threading.Lock()  # serializa recargas concurrentes
 
     @classmethod
     def load_data(cls):
-        print("Inicializando motor de busqueda (conectado a MongoDB)...")
+        # Se construye todo en variables locales y se publica de golpe al final,
+        # así las búsquedas concurrentes nunca ven un índice a medio cargar
+        with cls._load_lock, metrics.stage('load_data'):
+            if Config.PROFILE_STARTUP:
+                with profiler.profile(f"load_data-{int(time.time())}", label='load_data'):
+                    cls._load()
+            else:
+                cls._load()
+
+    @classmethod
+    def _load(cls):
+        logger.info("Inicializando motor de busqueda (conectado a MongoDB)")
         try:
             Database.init_db()
             
+            # 0. Snapshot ligero del catálogo: facetas e índice de títulos
+            catalog = list(db.db.animes.find({}, {**CATALOG_FIELDS, **{f: 1 for f in WATERMARK_FIELDS}}))
+            watermark = catalog_watermark(catalog)
+            facets = FacetIndex(catalog)
+            titles = TitleIndex(catalog)
+            fuzzy = TrigramIndex(titles)
+            lexical = LexicalIndex(catalog)
+            with cls._lock:
+                cls.facets = facets
+                cls.titles = titles
+                cls.fuzzy = fuzzy
+                cls.lexical = lexical
+            logger.info("Indices de facetas y titulos listos", extra={'animes': len(facets)})
+            
             # 1. Cargar SOLO los IDs de los animes que tienen embeddings
             # DEBEN estar ordenados por 'id' igual que como se generó embeddings.npy
             cursor = db.db.animes.find(
@@ -24,15 +91,15 @@ class SearchEngine:
                 {"id": 1} 
             ).sort("id", 1)
             
-            cls.ids = [doc['id'] for doc in cursor]
+            ids = [doc['id'] for doc in cursor]
             
-            if not cls.ids:
-                print("! No se encontraron animes con embeddings en MongoDB.")
+            if not ids:
+                logger.warning("No se encontraron animes con embeddings en MongoDB")
                 return
 
             # 2. Cargar embeddings (FAISS)
             if not os.path.exists("embeddings.npy"):
-                print("ERROR: 'embeddings.npy' no existe. Ejecuta generate_embeddings.py primero.")
+                logger.error("'embeddings.npy' no existe. Ejecuta generate_embeddings.py primero")
                 return
 
             embeddings = np.load("embeddings.npy")
@@ -42,31 +109,53 @@ class SearchEngine:
             norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
             embeddings = embeddings / norms
             
-            cls.dim = embeddings.shape[1]
+            dim = embeddings.shape[1]
             
             # Verificación de consistencia
-            if len(cls.ids) != embeddings.shape[0]:
-                print(f"! ADVERTENCIA: Discrepancia entre IDs en DB ({len(cls.ids)}) y embeddings ({embeddings.shape[0]}).")
+            if len(ids) != embeddings.shape[0]:
+                logger.warning("Discrepancia entre IDs en DB y embeddings", extra={'db_ids': len(ids), 'embeddings': embeddings.shape[0]})
                 # Ajustar al mínimo
-                min_len = min(len(cls.ids), embeddings.shape[0])
-                cls.ids = cls.ids[:min_len]
+                min_len = min(len(ids), embeddings.shape[0])
+                ids = ids[:min_len]
                 embeddings = embeddings[:min_len]
             
             # Crear índice FAISS con INNER PRODUCT (similitud coseno con vectores normalizados)
-            print("Creando indice FAISS con similitud coseno...")
-            cls.index = faiss.IndexFlatIP(cls.dim)  # IP = Inner Product
-            cls.index.add(embeddings.astype('float32'))
-            print(f"✓ Motor de busqueda listo. Indice contiene {len(cls.ids)} vectores usando cosine similarity.")
+            logger.debug("Creando indice FAISS con similitud coseno")
+            index = faiss.IndexFlatIP(dim)  # IP = Inner Product
+            index.add(embeddings.astype('float32'))
+            
+            # Versión de datos: invalida cachés derivadas (fragmentos JSON, ETags,
+            # caché de resultados). Incluye el catálogo de MongoDB porque una
+            # sincronización incremental o un re-enriquecimiento no tocan embeddings.npy
+            stat = os.stat("embeddings.npy")
+            fingerprint = f"{stat.st_mtime_ns}:{stat.st_size}:{len(ids)}:{watermark}"
+            version = hashlib.sha1(fingerprint.encode()).hexdigest()[:12]
+            semantic_cache = None
+            if Config.SEMANTIC_CACHE_SIZE > 0:
+                semantic_cache = SemanticCache(dim, Config.SEMANTIC_CACHE_SIZE, Config.SEMANTIC_CACHE_THRESHOLD)
+            
+            with cls._lock:
+                cls.ids = ids
+                cls.positions = {anime_id: row for row, anime_id in enumerate(ids)}
+                cls.index = index
+                cls.dim = dim
+                cls.version = version
+                cls.semantic_cache = semantic_cache
+            logger.info("Motor de busqueda listo", extra={'vectors': len(ids), 'version': version})
             
         except Exception as e:
-            print(f"X Error cargando motor de busqueda: {e}")
+            logger.exception("Error cargando motor de busqueda")
 
     @classmethod
-    def search(cls, vector, top_k=10):
-        if not cls.index or not cls.ids:
+    def rank(cls, vector, top_k=10):
+        """Busca en FAISS y devuelve [(anime_id, score 0-100)] ordenado por similitud"""
+        # Snapshot consistente de (index, ids); la búsqueda en FAISS es de solo lectura
+        with cls._lock:
+            index, ids = cls.index, cls.ids
+        if not index or not ids:
             return []
             
-        top_k = max(1, min(int(top_k), len(cls.ids)))
+        top_k = max(1, min(int(top_k), len(ids)))
         
         # Normalizar el vector de búsqueda también
         vector = np.array([vector], dtype="float32")
@@ -75,46 +164,114 @@ class SearchEngine:
             vector = vector / norm
         
         # D contiene las similitudes (más alto = más similar con IndexFlatIP)
-        D, I = cls.index.search(vector, k=top_k)
+        with metrics.stage('faiss'):
+            D, I = index.search(vector, k=top_k)
         
-        # Obtener los IDs correspondientes a los vecinos más cercanos
-        found_indices = I[0]
-        similarities = D[0]  # Ya son similitudes (no distancias), más alto = mejor
-        
-        target_ids = []
-        score_map = {}
-        
-        for similarity, idx in zip(similarities, found_indices):
-            if idx < len(cls.ids):
-                anime_id = cls.ids[idx]
-                target_ids.append(anime_id)
+        ranked = []
+        for similarity, idx in zip(D[0], I[0]):
+            if 0 <= idx < len(ids):
                 # Convertir a un score entre 0-100 (similarity está entre -1 y 1, típicamente 0-1 para vectores positivos)
-                score_map[anime_id] = float(similarity * 100)
+                ranked.append((ids[idx], float(similarity * 100)))
+        return ranked
+
+    @classmethod
+    def rank_cached(cls, vector, top_k=10):
+        """
+        rank() con caché semántica: si una consulta reciente es casi idéntica
+        (coseno >= SEMANTIC_CACHE_THRESHOLD) se reutiliza su ranking.
+        Una fracción de los aciertos se recalcula para medir la deriva.
+        """
+        cache = cls.semantic_cache
+        if cache is None:
+            return cls.rank(vector, top_k)
+        with metrics.stage('semantic_cache'):
+            cached, similarity = cache.lookup(vector, top_k)
+        if cached is not None:
+            metrics.inc('otaku_semantic_cache_total', outcome='hit')
+            metrics.observe('otaku_semantic_cache_hit_similarity', similarity)
+            if random.random() < Config.SEMANTIC_CACHE_AUDIT_RATE:
+                fresh = cls.rank(vector, top_k)
+                metrics.observe('otaku_semantic_cache_overlap', overlap(cached, fresh))
+            return cached
+        metrics.inc('otaku_semantic_cache_total', outcome='miss')
+        ranked = cls.rank(vector, top_k)
+        if ranked:
+            cache.add(vector, ranked)
+        return ranked
+
+    @classmethod
+    def similar_to(cls, anime_id, top_k=10):
+        """Como rank(), usando como consulta el embedding ya indexado de un anime"""
+        with cls._lock:
+            index, row = cls.index, cls.positions.get(anime_id)
+        if index is None or row is None:
+            return [(anime_id, 100.0)]
+        return cls.rank(index.reconstruct(row), top_k)
+
+    @classmethod
+    def hydrate(cls, anime_ids):
+        """Trae de MongoDB los documentos (sin embedding) -> {anime_id: anime}"""
+        if not anime_ids:
+            return {}
+        with metrics.stage('hydrate'):
+            cursor = db.db.animes.find({"id": {"$in": list(anime_ids)}}, {"embedding": 0})
+            fetched = {}
+            for anime in cursor:
+                if '_id' in anime:
+                    anime['_id'] = str(anime['_id'])
+                anime['description_clean'] = limpiar_html(anime.get('description', ''))
+                fetched[anime['id']] = anime
+        return fetched
+
+    @classmethod
+    def search(cls, vector, top_k=10):
+        ranked = cls.rank(vector, top_k)
         
         # CONSULTA A MONGODB: Traer detalles de estos IDs
-        cursor = db.db.animes.find({"id": {"$in": target_ids}})
-        
-        results = []
         # Mongo no garantiza orden en $in, así que reordenamos manual
-        fetched_animes = {anime['id']: anime for anime in cursor}
+        fetched_animes = cls.hydrate([anime_id for anime_id, _ in ranked])
         
-        for anime_id in target_ids:
+        results = []
+        for anime_id, score in ranked:
             anime = fetched_animes.get(anime_id)
             if anime:
-                # Procesar para salida
-                if '_id' in anime:
-                    anime['_id'] = str(anime['_id'])
-                anime['similarity_score'] = score_map.get(anime_id, 0.0)
-                anime['description_clean'] = limpiar_html(anime.get('description', ''))
-                
-                # Opcional: eliminar el vector embedding del resultado para no enviarlo al frontend
-                if 'embedding' in anime:
-                    del anime['embedding']
-                    
+                anime['similarity_score'] = score
                 results.append(anime)
         
         return results
 
+    @classmethod
+    def facet_counts(cls, ids=None):
+        """Conteos de facetas sobre los IDs dados (o todo el catálogo si ids es None)"""
+        return cls.facets.counts(
+            ids,
+            limit=Config.FACET_LIMIT,
+            budget_ms=Config.FACET_BUDGET_MS
+        )
+
+    @classmethod
+    def autocomplete(cls, query, limit=10):
+        """Sugerencias de títulos por prefijo, ordenadas por popularidad"""
+        return cls.titles.complete(query, limit=limit)
+
+    @classmethod
+    def fuzzy_lookup(cls, query, limit=5):
+        """Títulos parecidos a query tolerando errores de escritura"""
+        return cls.fuzzy.lookup(query, limit=limit)
+
+    @classmethod
+    def title_match(cls, query):
+        """ID del anime si query es (casi) exactamente un título; None si no"""
+        if not Config.TITLE_SHORTCUT_ENABLED:
+            return None
+        return cls.fuzzy.exact_title(query, max_edits=Config.TITLE_SHORTCUT_MAX_EDITS)
+
+    @classmethod
+    def lexical_search(cls, query, top_k=10):
+        """Búsqueda por términos en títulos, tags y vibe_keywords -> [(anime_id, score)]"""
+        with metrics.stage('lexical'):
+            return cls.lexical.search(query, top_k=top_k)
+
     @classmethod
     def get_by_id(cls, anime_id):
         # Consulta directa a MongoDB
@@ -125,17 +282,14 @@ class SearchEngine:
                     {"idMal": anime_id}
                 ]
             }
-            anime = db.db.animes.find_one(query)
+            anime = db.db.animes.find_one(query, {"embedding": 0})
             
             if anime:
                 if '_id' in anime:
                     anime['_id'] = str(anime['_id'])
-                if 'embedding' in anime:
-                    del anime['embedding']
                 anime['description_clean'] = limpiar_html(anime.get('description', ''))
                 return anime
         except Exception as e:
-            print(f"Error en get_by_id: {e}")
-            pass
+            logger.exception("Error en get_by_id", extra={'anime_id': anime_id})
             
         return None
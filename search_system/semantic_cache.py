@@ -0,0 +1,67 @@
+import threading
+import numpy as np
+import faiss
+
+
+class SemanticCache:
+    """
+    Caché de rankings para consultas casi idénticas (paráfrasis).
+
+    Guarda los vectores de las últimas `capacity` consultas en un índice FAISS
+    pequeño (producto interno sobre vectores normalizados = coseno). Si una
+    consulta nueva tiene similitud >= threshold con una guardada, se reutiliza
+    su ranking sin recorrer el índice principal. Las entradas más antiguas se
+    sustituyen en orden FIFO.
+    """
+
+    def __init__(self, dim, capacity=2000, threshold=0.97):
+        self.dim = dim
+        self.capacity = capacity
+        self.threshold = threshold
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        self.entries = {}  # id FAISS -> [(anime_id, score)]
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype='float32').reshape(1, -1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, vector, top_k):
+        """(ranking[:top_k], similitud) de la consulta guardada más parecida, o (None, similitud)"""
+        query = self._normalize(vector)
+        with self._lock:
+            if not self.entries:
+                return None, 0.0
+            D, I = self.index.search(query, 1)
+            similarity, entry_id = float(D[0][0]), int(I[0][0])
+            ranked = self.entries.get(entry_id)
+        # Un ranking guardado con menos resultados no sirve para un top_k mayor
+        if ranked is None or similarity < self.threshold or len(ranked) < top_k:
+            return None, similarity
+        return ranked[:top_k], similarity
+
+    def add(self, vector, ranked):
+        query = self._normalize(vector)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            evict = entry_id - self.capacity
+            if evict >= 0 and evict in self.entries:
+                self.index.remove_ids(np.array([evict], dtype='int64'))
+                del self.entries[evict]
+            self.index.add_with_ids(query, np.array([entry_id], dtype='int64'))
+            self.entries[entry_id] = list(ranked)
+
+
+def overlap(a, b):
+    """Fracción de IDs de b presentes en a (1.0 = mismo conjunto de resultados)"""
+    if not b:
+        return 1.0
+    ids = {anime_id for anime_id, _ in a}
+    return sum(1 for anime_id, _ in b if anime_id in ids) / len(b)
@@ -0,0 +1,102 @@
+from bisect import bisect_left
+import numpy as np
+from utils import normalizar_texto
+
+
+def title_variants(doc):
+    """Todas las formas del título de un anime: [(normalizado, original)] sin repetidos"""
+    title = doc.get('title') or {}
+    raw = [
+        doc.get('main_title'),
+        title.get('english'),
+        title.get('romaji'),
+        title.get('native'),
+        *(doc.get('synonyms') or [])
+    ]
+    seen = set()
+    variants = []
+    for original in raw:
+        key = normalizar_texto(original)
+        if key and key not in seen:
+            seen.add(key)
+            variants.append((key, original))
+    return variants
+
+
+class TitleIndex:
+    """
+    Índice de prefijos sobre las variantes normalizadas de los títulos.
+
+    Arrays ordenados por clave: una búsqueda es dos bisecciones para acotar el
+    rango del prefijo y un top-k por popularidad vectorizado con NumPy sobre
+    ese rango, sin recorrer el catálogo.
+    """
+
+    def __init__(self, docs=()):
+        entries = []
+        self.meta = {}
+        for doc in docs:
+            anime_id = doc.get('id')
+            if anime_id is None:
+                continue
+            self.meta[anime_id] = {
+                'id': anime_id,
+                'title': doc.get('main_title'),
+                'cover_image': doc.get('cover_image'),
+                'popularity': doc.get('popularity') or 0
+            }
+            for key, original in title_variants(doc):
+                entries.append((key, anime_id, original))
+
+        entries.sort(key=lambda e: e[0])
+        self.keys = [e[0] for e in entries]
+        self.originals = [e[2] for e in entries]
+        self.ids = np.array([e[1] for e in entries], dtype=np.int64)
+        self.popularity = np.array(
+            [self.meta[e[1]]['popularity'] for e in entries], dtype=np.int64
+        )
+
+    def __len__(self):
+        return len(self.meta)
+
+    def prefix_range(self, prefix):
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + '\uffff')
+        return lo, hi
+
+    def complete(self, query, limit=10):
+        """Sugerencias cuyo título (en cualquier variante) empieza por query"""
+        prefix = normalizar_texto(query)
+        if not prefix or limit <= 0:
+            return []
+        lo, hi = self.prefix_range(prefix)
+        if lo >= hi:
+            return []
+
+        popularity = self.popularity[lo:hi]
+        # Un anime puede aparecer varias veces (romaji, inglés, sinónimos...):
+        # se piden candidatos de sobra y se deduplica en orden de popularidad
+        wanted = limit * 4
+        if len(popularity) > wanted:
+            top = np.argpartition(-popularity, wanted)[:wanted]
+            order = top[np.argsort(-popularity[top], kind='stable')]
+        else:
+            order = np.argsort(-popularity, kind='stable')
+
+        suggestions = self._collect(order, lo, limit)
+        if len(suggestions) < limit and len(order) < hi - lo:
+            suggestions = self._collect(np.argsort(-popularity, kind='stable'), lo, limit)
+        return suggestions
+
+    def _collect(self, order, offset, limit):
+        seen = set()
+        suggestions = []
+        for i in order:
+            anime_id = int(self.ids[offset + i])
+            if anime_id in seen:
+                continue
+            seen.add(anime_id)
+            suggestions.append({**self.meta[anime_id], 'matched': self.originals[offset + i]})
+            if len(suggestions) >= limit:
+                break
+        return suggestions
@@ -0,0 +1,152 @@
+"""
+Control de admisión con prioridad para las llamadas de embedding.
+
+Como mucho ADMISSION_MAX_IN_FLIGHT búsquedas por worker esperan a OpenAI a la
+vez; el resto hace cola por prioridad (premium > free > anonymous) y cada nivel
+espera como mucho su ADMISSION_MAX_WAIT. Si la cola está llena, una petición
+de más prioridad desplaza a la última de menos prioridad; si no puede, se
+rechaza al momento con Overloaded (la ruta responde 503 + Retry-After).
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from flask import g
+
+from config import Config
+from services import metrics
+from services.logging_service import get_logger, parse_rates
+
+logger = get_logger('admission')
+
+PRIORITIES = {'premium': 0, 'free': 1, 'anonymous': 2}
+
+
+class Overloaded(Exception):
+    """No hay hueco: la petición debe reintentarse pasados retry_after segundos"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'event', 'granted', 'shed')
+
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.seq = seq
+        self.event = threading.Event()
+        self.granted = False
+        self.shed = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class Ticket:
+    """Hueco concedido; release() es idempotente"""
+
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self._start = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._release(time.monotonic() - self._start)
+
+
+class PriorityLimiter:
+    def __init__(self, max_in_flight, max_queue):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters = []  # heap de _Waiter (menor prioridad numérica primero)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._avg_hold = 0.5  # media móvil de lo que se tarda en liberar un hueco (s)
+
+    def acquire(self, priority, timeout):
+        """Devuelve un Ticket o lanza Overloaded"""
+        with self._lock:
+            if self.in_flight < self.max_in_flight and not self._waiters:
+                self.in_flight += 1
+                return Ticket(self)
+            if len(self._waiters) >= self.max_queue:
+                worst = max(self._waiters) if self._waiters else None
+                if worst is None or worst.priority <= priority:
+                    raise Overloaded(self._retry_after())
+                # Desplazar a la petición de menos prioridad que más tarde llegó
+                self._waiters.remove(worst)
+                heapq.heapify(self._waiters)
+                worst.shed = True
+                worst.event.set()
+            waiter = _Waiter(priority, next(self._seq))
+            heapq.heappush(self._waiters, waiter)
+
+        waiter.event.wait(timeout)
+        with self._lock:
+            if waiter.granted:
+                return Ticket(self)
+            if not waiter.shed:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+            raise Overloaded(self._retry_after())
+
+    def _release(self, held):
+        with self._lock:
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+            if self._waiters:
+                # El hueco pasa directamente al siguiente en la cola
+                waiter = heapq.heappop(self._waiters)
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self.in_flight -= 1
+
+    def _retry_after(self):
+        estimate = self._avg_hold * (len(self._waiters) + 1) / max(1, self.max_in_flight)
+        return max(1, min(30, math.ceil(estimate)))
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': self.in_flight, 'queued': len(self._waiters), 'max_in_flight': self.max_in_flight}
+
+
+limiter = PriorityLimiter(Config.ADMISSION_MAX_IN_FLIGHT, Config.ADMISSION_MAX_QUEUE)
+_max_wait = parse_rates(Config.ADMISSION_MAX_WAIT)
+
+
+def admit(tier):
+    """
+    Reserva un hueco para la petición actual (tier: premium, free o anonymous).
+    Lanza Overloaded si hay que rechazarla. El hueco se libera con release()
+    o, como red de seguridad, al terminar la petición.
+    """
+    if limiter.max_in_flight <= 0:
+        return
+    start = time.monotonic()
+    try:
+        g.admission_ticket = limiter.acquire(PRIORITIES.get(tier, 2), _max_wait.get(tier, 1.0))
+    except Overloaded as e:
+        metrics.inc('otaku_admission_total', tier=tier, outcome='shed')
+        logger.warning("Search shed by admission control", extra={'tier': tier, 'retry_after': e.retry_after})
+        raise
+    metrics.inc('otaku_admission_total', tier=tier, outcome='admitted')
+    metrics.observe('otaku_admission_wait_seconds', time.monotonic() - start, tier=tier)
+
+
+def release():
+    ticket = g.pop('admission_ticket', None)
+    if ticket is not None:
+        ticket.release()
+
+
+def init_app(app):
+    @app.teardown_request
+    def _release_ticket(exc):
+        release()
@@ -0,0 +1,210 @@
+"""
+Embedding de consultas con presupuesto de latencia y circuit breaker.
+
+- Cada llamada a OpenAI tiene un timeout corto (EMBEDDING_TIMEOUT) y ningún
+  reintento: durante un incidente es mejor degradar que hacer esperar al usuario.
+- Los vectores ya calculados se guardan en un LRU por texto normalizado, y
+  las consultas idénticas en curso comparten una sola llamada (single-flight
+  en el worker y, con EMBEDDING_SHARED_DIR, también entre workers).
+- Tras BREAKER_FAILURE_THRESHOLD fallos (o llamadas más lentas que
+  EMBEDDING_SLOW_MS) seguidos el circuito se abre y durante
+  BREAKER_RESET_SECONDS no se llama a la API; después se deja pasar una sola
+  llamada de prueba (half-open) que decide si se cierra o vuelve a abrirse.
+
+Si no hay vector, embed_query lanza EmbeddingUnavailable y la ruta recurre a la
+búsqueda léxica.
+"""
+import os
+import threading
+import time
+
+from openai import OpenAI
+
+from config import Config
+from services import metrics
+from services.cache import LRUCache
+from services.logging_service import get_logger
+from services.singleflight import SharedFlight, SingleFlight
+
+logger = get_logger('embedding')
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class EmbeddingUnavailable(Exception):
+    """No se pudo obtener el vector de la consulta (circuito abierto, timeout o error)"""
+
+
+class CircuitBreaker:
+    """Circuit breaker de un proceso (cada worker de gunicorn tiene el suyo)"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True si se puede llamar a la API ahora"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_in_flight = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def _transition(self, state):
+        logger.warning("Circuit breaker state change", extra={'from': self.state, 'to': state, 'failures': self.failures})
+        self.state = state
+        metrics.inc('otaku_embedding_breaker_transitions_total', state=state)
+
+
+def _new_client():
+    return OpenAI(api_key=Config.OPENAI_API_KEY, timeout=Config.EMBEDDING_TIMEOUT, max_retries=0)
+
+
+client = _new_client()
+breaker = CircuitBreaker(Config.BREAKER_FAILURE_THRESHOLD, Config.BREAKER_RESET_SECONDS)
+_vectors = LRUCache(maxsize=Config.EMBEDDING_CACHE_SIZE)
+_flight = SingleFlight()
+_shared = SharedFlight(Config.EMBEDDING_SHARED_DIR, ttl=Config.EMBEDDING_SHARED_TTL)
+# Lo máximo que espera una petición duplicada a que termine la llamada original
+_WAIT = Config.EMBEDDING_TIMEOUT + 1.0
+
+
+def _reset_after_fork():
+    # Con preload_app el master puede haber usado el cliente (warm-up): sus
+    # conexiones keep-alive no deben compartirse entre workers
+    global client
+    client = _new_client()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def has_vector(text):
+    """True si el vector de text ya está en caché (no cuenta como acierto/fallo)"""
+    return text in _vectors
+
+
+def in_flight(text):
+    """True si este worker ya está calculando el vector de text"""
+    return text in _flight
+
+
+def _call_api(text):
+    """Una llamada a OpenAI detrás del circuit breaker"""
+    if not breaker.allow():
+        metrics.inc('otaku_embedding_requests_total', source='breaker_open')
+        raise EmbeddingUnavailable('circuit open')
+
+    start = time.perf_counter()
+    try:
+        with metrics.stage('embedding'):
+            resp = client.embeddings.create(model=Config.EMBEDDING_MODEL, input=text)
+        vector = resp.data[0].embedding
+    except Exception as e:
+        breaker.record_failure()
+        metrics.inc('otaku_embedding_requests_total', source='error')
+        logger.warning("Embedding call failed", extra={'error': type(e).__name__, 'breaker': breaker.state})
+        raise EmbeddingUnavailable(type(e).__name__) from e
+
+    # Una respuesta correcta pero lenta también cuenta para abrir el circuito
+    if (time.perf_counter() - start) * 1000 > Config.EMBEDDING_SLOW_MS:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return vector
+
+
+def _fetch(text):
+    """Vector desde la API, coordinado con los demás workers si hay directorio compartido"""
+    if not _shared.available:
+        return _call_api(text), 'api'
+    try:
+        vector, shared = _shared.do(f"{Config.EMBEDDING_MODEL}:{text}", lambda: _call_api(text), timeout=_WAIT)
+    except TimeoutError as e:
+        raise EmbeddingUnavailable('shared wait timed out') from e
+    return vector, 'shared' if shared else 'api'
+
+
+def embed_query(text):
+    """
+    Vector de una consulta ya normalizada -> (vector, origen), con origen
+    'cache', 'api', 'coalesced' (otra petición de este worker hizo la llamada)
+    o 'shared' (la hizo otro worker). Lanza EmbeddingUnavailable si no hay vector.
+    """
+    vector = _vectors.get(text)
+    if vector is not None:
+        metrics.inc('otaku_embedding_requests_total', source='cache')
+        return vector, 'cache'
+
+    try:
+        (vector, source), coalesced = _flight.do(text, lambda: _fetch(text), timeout=_WAIT)
+    except TimeoutError as e:
+        raise EmbeddingUnavailable('coalesced wait timed out') from e
+    if coalesced:
+        source = 'coalesced'
+    else:
+        _vectors.set(text, vector)
+    metrics.inc('otaku_embedding_requests_total', source=source)
+    return vector, source
+
+
+def embed_many(texts, batch_size=100, timeout=30.0):
+    """
+    Precalcula en lotes los vectores de texts que no estén en caché (warm-up).
+    Devuelve cuántos se añadieron; se detiene si el circuito está abierto.
+    """
+    pending = [t for t in dict.fromkeys(texts) if t and t not in _vectors]
+    added = 0
+    batch_client = client.with_options(timeout=timeout)
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i:i + batch_size]
+        if not breaker.allow():
+            logger.warning("Batch embedding stopped: circuit open", extra={'remaining': len(pending) - i})
+            break
+        try:
+            with metrics.stage('embedding_batch'):
+                resp = batch_client.embeddings.create(model=Config.EMBEDDING_MODEL, input=batch)
+        except Exception as e:
+            breaker.record_failure()
+            logger.warning("Batch embedding failed", extra={'error': type(e).__name__, 'batch': len(batch)})
+            continue
+        breaker.record_success()
+        for item in resp.data:
+            _vectors.set(batch[item.index], item.embedding)
+        added += len(resp.data)
+        metrics.inc('otaku_embedding_requests_total', value=len(resp.data), source='batch')
+    return added
+
+
+def stats():
+    return {
+        'breaker': breaker.state,
+        'failures': breaker.failures,
+        'cache': _vectors.stats(),
+        'shared': _shared.available
+    }
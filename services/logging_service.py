@@ -0,0 +1,149 @@
+"""
+Logging estructurado y asíncrono para los caminos calientes.
+
+- Cada registro se escribe como una línea JSON (ASCII, sin problemas de
+  codificación en consolas Windows).
+- Los handlers solo encolan: un hilo QueueListener hace la escritura real, así
+  las peticiones nunca esperan a stdout.
+- LOG_SAMPLE_RATES permite muestrear por endpoint los mensajes INFO/DEBUG;
+  WARNING y superiores se escriben siempre.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+from config import Config
+
+ROOT = 'otaku'
+
+# Atributos estándar de LogRecord; el resto (pasados con extra=) van al JSON
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RouteContextFilter(logging.Filter):
+    """Añade endpoint/request_id y aplica el muestreo por ruta"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        try:
+            from flask import g, has_request_context, request
+            if has_request_context():
+                record.route = request.endpoint
+                request_id = g.get('request_id')
+                if request_id:
+                    record.request_id = request_id
+        except ImportError:
+            pass
+
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, 'route', None), self.rates.get('*', 1.0))
+        return rate >= 1.0 or random.random() < rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Si la cola está llena se descarta el registro en vez de bloquear la petición"""
+    dropped = 0
+
+    def prepare(self, record):
+        # Como QueueHandler.prepare, pero conservando la traza aparte del mensaje
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def parse_rates(spec):
+    """'search.search_semantic=0.1,*=1' -> {'search.search_semantic': 0.1, '*': 1.0}"""
+    rates = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            name, value = item.split('=', 1)
+            try:
+                rates[name.strip()] = float(value)
+            except ValueError:
+                continue
+    return rates
+
+
+_lock = threading.Lock()
+_handler = None
+_listener = None
+
+
+def _start_listener():
+    global _listener
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(_handler.queue, stream, respect_handler_level=False)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # El hilo del listener no sobrevive al fork de gunicorn (preload_app):
+    # cada worker necesita su propia cola y su propio hilo escritor
+    if _handler is not None:
+        _handler.queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+        _start_listener()
+
+
+def setup_logging():
+    """Configura el logger 'otaku' (idempotente)"""
+    global _handler
+    with _lock:
+        if _handler is not None:
+            return
+        _handler = DroppingQueueHandler(queue.Queue(maxsize=Config.LOG_QUEUE_SIZE))
+        _handler.addFilter(RouteContextFilter(parse_rates(Config.LOG_SAMPLE_RATES)))
+        root = logging.getLogger(ROOT)
+        root.setLevel(Config.LOG_LEVEL)
+        root.addHandler(_handler)
+        root.propagate = False
+        _start_listener()
+
+        atexit.register(lambda: _listener and _listener.stop())
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def get_logger(name):
+    setup_logging()
+    return logging.getLogger(f"{ROOT}.{name}")
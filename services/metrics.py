@@ -0,0 +1,245 @@
+"""
+Métricas ligeras: tiempos por etapa, contadores e histogramas.
+
+- stage('embedding') mide un bloque; dentro de una petición el tiempo se suma
+  a la cabecera Server-Timing y siempre se registra en un histograma.
+- Cada worker de gunicorn vuelca su registro a METRICS_DIR/metrics_<pid>.json
+  y /metrics suma los ficheros de todos los workers en formato Prometheus.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+from config import Config
+
+# Límites de los buckets en segundos (desde sub-milisegundo hasta el timeout de gunicorn)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 120)
+
+HELP = {
+    'otaku_requests_total': ('counter', 'Peticiones HTTP atendidas'),
+    'otaku_request_duration_seconds': ('histogram', 'Duración total de la petición'),
+    'otaku_stage_duration_seconds': ('histogram', 'Duración de cada etapa del pipeline de búsqueda'),
+    'otaku_embedding_requests_total': ('counter', 'Vectores de consulta por origen (api, cache, error, breaker_open)'),
+    'otaku_embedding_breaker_transitions_total': ('counter', 'Cambios de estado del circuit breaker de embeddings'),
+    'otaku_admission_total': ('counter', 'Búsquedas admitidas o rechazadas por el control de admisión'),
+    'otaku_admission_wait_seconds': ('histogram', 'Espera en la cola de admisión'),
+    'otaku_semantic_cache_total': ('counter', 'Consultas servidas (hit) o no (miss) por la caché semántica'),
+    'otaku_result_cache_total': ('counter', 'Aciertos por nivel (local, shared) y fallos de la caché de resultados exactos'),
+    'otaku_semantic_cache_overlap': ('histogram', 'Fracción de resultados compartidos entre el ranking cacheado y el real (media = _sum/_count)'),
+    'otaku_semantic_cache_hit_similarity': ('histogram', 'Coseno entre la consulta y la consulta cacheada en cada acierto'),
+}
+
+
+class Registry:
+    """Contadores e histogramas de un proceso"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+
+    def inc(self, name, value=1, labels=()):
+        with self.lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        with self.lock:
+            key = (name, labels)
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    hist['buckets'][i] += 1
+                    break
+            else:
+                hist['buckets'][-1] += 1
+            hist['sum'] += value
+            hist['count'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[n, list(l), v] for (n, l), v in self.counters.items()],
+                'histograms': [[n, list(l), dict(h, buckets=list(h['buckets']))]
+                               for (n, l), h in self.histograms.items()],
+            }
+
+
+_registry = Registry()
+
+
+def _reset_after_fork():
+    # Con preload_app el worker hereda lo que registró el master: empezar de cero
+    global _registry
+    _registry = Registry()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    _registry.inc(name, value, _labels(labels))
+
+
+def observe(name, value, **labels):
+    _registry.observe(name, value, _labels(labels))
+
+
+@contextmanager
+def stage(name):
+    """Mide un bloque como etapa 'name' (histograma + Server-Timing)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe('otaku_stage_duration_seconds', elapsed, stage=name)
+        if has_request_context():
+            timings = g.setdefault('stage_timings', {})
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+# --- Agregación entre workers ---
+
+def _path(pid):
+    return os.path.join(Config.METRICS_DIR, f"metrics_{pid}.json")
+
+
+def flush(force=False):
+    """Vuelca el registro de este proceso a disco (como mucho cada METRICS_FLUSH_INTERVAL)"""
+    now = time.monotonic()
+    if not force and now - _registry.last_flush < Config.METRICS_FLUSH_INTERVAL:
+        return
+    _registry.last_flush = now
+    try:
+        os.makedirs(Config.METRICS_DIR, exist_ok=True)
+        path = _path(_registry.pid)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(_registry.snapshot(), f)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # las métricas nunca deben tumbar una petición
+
+
+def reset_shared_dir():
+    """Borra los volcados de ejecuciones anteriores (hook on_starting de gunicorn)"""
+    if not os.path.isdir(Config.METRICS_DIR):
+        return
+    for name in os.listdir(Config.METRICS_DIR):
+        if name.startswith('metrics_'):
+            try:
+                os.remove(os.path.join(Config.METRICS_DIR, name))
+            except OSError:
+                pass
+
+
+def collect():
+    """Suma los volcados de todos los workers (incluido este proceso)"""
+    flush(force=True)
+    counters = {}
+    histograms = {}
+    try:
+        names = [n for n in os.listdir(Config.METRICS_DIR) if n.startswith('metrics_') and n.endswith('.json')]
+    except OSError:
+        names = []
+    for name in names:
+        try:
+            with open(os.path.join(Config.METRICS_DIR, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for metric, labels, value in data.get('counters', []):
+            key = (metric, tuple(tuple(l) for l in labels))
+            counters[key] = counters.get(key, 0) + value
+        for metric, labels, hist in data.get('histograms', []):
+            key = (metric, tuple(tuple(l) for l in labels))
+            acc = histograms.setdefault(key, {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0})
+            acc['buckets'] = [a + b for a, b in zip(acc['buckets'], hist['buckets'])]
+            acc['sum'] += hist['sum']
+            acc['count'] += hist['count']
+    return counters, histograms
+
+
+def _fmt_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+
+def render():
+    """Texto en formato de exposición de Prometheus"""
+    counters, histograms = collect()
+    lines = []
+    declared = set()
+
+    def declare(metric, kind):
+        if metric in declared:
+            return
+        declared.add(metric)
+        help_text = HELP.get(metric, (kind, metric))[1]
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+
+    for (metric, labels), value in sorted(counters.items()):
+        declare(metric, 'counter')
+        lines.append(f"{metric}{_fmt_labels(labels)} {value}")
+
+    for (metric, labels), hist in sorted(histograms.items()):
+        declare(metric, 'histogram')
+        cumulative = 0
+        for bound, count in zip(BUCKETS, hist['buckets']):
+            cumulative += count
+            lines.append(f"{metric}_bucket{_fmt_labels(labels, ('le', bound))} {cumulative}")
+        lines.append(f"{metric}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {hist['count']}")
+        lines.append(f"{metric}_sum{_fmt_labels(labels)} {hist['sum']}")
+        lines.append(f"{metric}_count{_fmt_labels(labels)} {hist['count']}")
+
+    return '\n'.join(lines) + '\n'
+
+
+# --- Integración con Flask ---
+
+def init_app(app):
+    """Registra los hooks de petición y el endpoint /metrics"""
+
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.get('request_start')
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unknown'
+        observe('otaku_request_duration_seconds', elapsed, endpoint=endpoint)
+        inc('otaku_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+
+        timings = g.get('stage_timings') or {}
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+        entries.append(f"total;dur={elapsed * 1000:.2f}")
+        response.headers['Server-Timing'] = ', '.join(entries)
+        flush()
+        return response
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        if Config.METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {Config.METRICS_TOKEN}":
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,178 @@
+"""
+Perfilado estadístico bajo demanda para diagnosticar peticiones lentas en producción.
+
+Un hilo muestrea cada PROFILE_INTERVAL_MS la pila del hilo que atiende la
+petición (sys._current_frames) y acumula pilas "colapsadas"
+(func_a;func_b;func_c N), el formato de entrada de flamegraph.pl / speedscope.
+
+Se activa por petición con la cabecera X-Profile: <PROFILE_ADMIN_TOKEN> o por
+muestreo aleatorio (PROFILE_SAMPLE_RATE). El coste está acotado: como mucho
+PROFILE_MAX_CONCURRENT perfiles a la vez por worker y PROFILE_MAX_SECONDS por perfil.
+"""
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, g, jsonify, request
+
+from config import Config
+from services.logging_service import get_logger
+
+logger = get_logger('profiler')
+
+_slots = threading.BoundedSemaphore(max(1, Config.PROFILE_MAX_CONCURRENT))
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+
+class SamplingProfiler:
+    """Muestrea periódicamente la pila de un hilo concreto"""
+
+    def __init__(self, thread_id, interval=0.005, max_seconds=10.0):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self.started = None
+        self.elapsed = 0.0
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > deadline:
+                break
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            key = ';'.join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def folded(self):
+        """Salida en formato de pilas colapsadas (una pila por línea)"""
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+def _save(profile_id, profiler, label):
+    try:
+        os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(Config.PROFILE_DIR, f"{profile_id}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(profiler.folded())
+        _prune()
+        logger.info("Profile saved", extra={
+            'profile_id': profile_id, 'label': label, 'samples': profiler.samples,
+            'elapsed_ms': round(profiler.elapsed * 1000, 1), 'path': path
+        })
+    except OSError:
+        logger.exception("Could not save profile", extra={'profile_id': profile_id})
+
+
+def _prune():
+    """Conserva solo los PROFILE_MAX_FILES perfiles más recientes"""
+    files = [os.path.join(Config.PROFILE_DIR, n) for n in os.listdir(Config.PROFILE_DIR) if n.endswith('.folded')]
+    if len(files) <= Config.PROFILE_MAX_FILES:
+        return
+    files.sort(key=os.path.getmtime)
+    for path in files[:len(files) - Config.PROFILE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@contextmanager
+def profile(profile_id, label=None):
+    """
+    Perfila el bloque si hay un hueco libre; si no, lo ejecuta sin perfilar.
+    El resultado se guarda en PROFILE_DIR/<profile_id>.folded.
+    """
+    if not _slots.acquire(blocking=False):
+        yield None
+        return
+    profiler = SamplingProfiler(
+        threading.get_ident(),
+        interval=Config.PROFILE_INTERVAL_MS / 1000,
+        max_seconds=Config.PROFILE_MAX_SECONDS
+    ).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _slots.release()
+        _save(profile_id, profiler, label)
+
+
+def should_profile():
+    """Cabecera de administrador o muestreo aleatorio"""
+    token = Config.PROFILE_ADMIN_TOKEN
+    if token and request.headers.get('X-Profile') == token:
+        return True
+    return Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE
+
+
+def profiled(view):
+    """Decorador para vistas Flask: perfila la petición si procede"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not should_profile():
+            return view(*args, **kwargs)
+        profile_id = g.get('request_id') or uuid.uuid4().hex
+        with profile(profile_id, label=request.endpoint) as profiler:
+            response = view(*args, **kwargs)
+        if profiler is not None:
+            g.profiled = True
+        return response
+    return wrapper
+
+
+def init_app(app):
+    """Asigna un request id a cada petición y expone los perfiles guardados"""
+
+    @app.before_request
+    def _assign_request_id():
+        incoming = request.headers.get('X-Request-ID', '')
+        g.request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+
+    @app.after_request
+    def _echo_request_id(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers['X-Request-ID'] = request_id
+            if g.get('profiled'):
+                response.headers['X-Profile-Id'] = request_id
+        return response
+
+    @app.route('/api/admin/profiles/<profile_id>')
+    def get_profile(profile_id):
+        token = Config.PROFILE_ADMIN_TOKEN
+        path = os.path.join(Config.PROFILE_DIR, f"{profile_id}.folded")
+        if (not token or request.headers.get('X-Profile') != token
+                or not _REQUEST_ID.match(profile_id) or not os.path.exists(path)):
+            return jsonify({'error': 'Not found'}), 404
+        with open(path, encoding='utf-8') as f:
+            return Response(f.read(), mimetype='text/plain')
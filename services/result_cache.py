@@ -0,0 +1,179 @@
+"""
+Caché de resultados exactos de búsqueda: (consulta normalizada, top_k) -> resultados.
+
+Dos niveles, ambos atados a SearchEngine.version, que cambia con el índice y
+con el catálogo de MongoDB. Así un reindexado o una sincronización que solo
+toca MongoDB los invalidan solos, también el nivel compartido, que sobrevive
+en disco a los reinicios:
+- local: LRU en el proceso con el ranking y los fragmentos JSON ya codificados;
+- compartido: un fichero por clave en RESULT_CACHE_DIR/<version>/, visible para
+  todos los workers de la máquina (escritura atómica con os.replace).
+
+Un acierto sirve la búsqueda sin embedding, sin FAISS y sin MongoDB.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from config import Config
+from services import metrics
+from services.cache import LRUCache
+
+_local = LRUCache(maxsize=Config.RESULT_CACHE_SIZE)
+_lock = threading.Lock()
+_state = {'version': None, 'last_prune': 0.0}
+
+
+class CachedResult:
+    __slots__ = ('search_mode', 'ranked', 'results')
+
+    def __init__(self, search_mode, ranked, results):
+        self.search_mode = search_mode
+        self.ranked = ranked      # [(anime_id, score)] para facetas
+        self.results = results    # fragmentos JSON (bytes) listos para la respuesta
+
+
+def _key(normalized, top_k):
+    return f"{top_k}:{normalized}"
+
+
+def _version_dir(version):
+    return os.path.join(Config.RESULT_CACHE_DIR, str(version))
+
+
+def _path(version, key):
+    return os.path.join(_version_dir(version), hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+
+def _check_version(version):
+    """Con una versión nueva se vacía el nivel local y se retiran las versiones abandonadas"""
+    with _lock:
+        if _state['version'] == version:
+            return
+        _state['version'] = version
+    _local.clear()
+    _sweep_versions(version)
+
+
+def _sweep_versions(version):
+    """
+    Borra los directorios de otras versiones sin escrituras en RESULT_CACHE_TTL.
+
+    Durante un despliegue escalonado, o con varias instancias en la misma
+    máquina, conviven procesos con versiones distintas: cada uno sigue
+    escribiendo en su directorio (y actualizando su mtime), así que solo se
+    borran las versiones que ya nadie usa, cuyas entradas habrían caducado igual.
+    """
+    if not Config.RESULT_CACHE_DIR:
+        return
+    cutoff = time.time() - Config.RESULT_CACHE_TTL
+    try:
+        names = os.listdir(Config.RESULT_CACHE_DIR)
+    except OSError:
+        return
+    for name in names:
+        if name == str(version):
+            continue
+        path = os.path.join(Config.RESULT_CACHE_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def _read_shared(version, key):
+    path = _path(version, key)
+    try:
+        if time.time() - os.path.getmtime(path) > Config.RESULT_CACHE_TTL:
+            return None
+        with open(path, 'rb') as f:
+            lines = f.read().split(b'\n')
+    except OSError:
+        return None
+    try:
+        meta = json.loads(lines[0])
+    except ValueError:
+        return None
+    if meta.get('key') != key:
+        return None  # colisión de hash o fichero a medio escribir
+    ranked = [tuple(item) for item in meta['ranked']]
+    return CachedResult(meta['search_mode'], ranked, [line for line in lines[1:] if line])
+
+
+def _write_shared(version, key, entry):
+    # Formato: una línea JSON de metadatos y un fragmento por línea (el JSON
+    # codificado nunca contiene saltos de línea literales)
+    path = _path(version, key)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    meta = json.dumps({'key': key, 'search_mode': entry.search_mode, 'ranked': entry.ranked}).encode('utf-8')
+    try:
+        os.makedirs(_version_dir(version), exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(b'\n'.join([meta, *entry.results]))
+        os.replace(tmp, path)
+    except OSError:
+        pass  # la caché compartida es una optimización, nunca un error
+    _prune(version)
+
+
+def _prune(version):
+    """Como mucho una vez por minuto, recorta el directorio a RESULT_CACHE_MAX_FILES"""
+    now = time.monotonic()
+    with _lock:
+        if now - _state['last_prune'] < 60:
+            return
+        _state['last_prune'] = now
+    _sweep_versions(version)
+    directory = _version_dir(version)
+    try:
+        files = [os.path.join(directory, n) for n in os.listdir(directory)]
+        if len(files) <= Config.RESULT_CACHE_MAX_FILES:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - Config.RESULT_CACHE_MAX_FILES]:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def get(normalized, top_k, version):
+    """CachedResult o None"""
+    if Config.RESULT_CACHE_SIZE <= 0 or version is None:
+        return None
+    _check_version(version)
+    key = _key(normalized, top_k)
+    entry = _local.get(key)
+    if entry is not None:
+        metrics.inc('otaku_result_cache_total', tier='local', outcome='hit')
+        return entry
+    if Config.RESULT_CACHE_DIR:
+        entry = _read_shared(version, key)
+        if entry is not None:
+            _local.set(key, entry)
+            metrics.inc('otaku_result_cache_total', tier='shared', outcome='hit')
+            return entry
+    metrics.inc('otaku_result_cache_total', tier='all', outcome='miss')
+    return None
+
+
+def put(normalized, top_k, version, search_mode, ranked, results):
+    if Config.RESULT_CACHE_SIZE <= 0 or version is None:
+        return
+    _check_version(version)
+    key = _key(normalized, top_k)
+    entry = CachedResult(search_mode, [(anime_id, score) for anime_id, score in ranked], list(results))
+    _local.set(key, entry)
+    if Config.RESULT_CACHE_DIR:
+        _write_shared(version, key, entry)
+
+
+def clear():
+    _local.clear()
+
+
+def stats():
+    return _local.stats()
@@ -0,0 +1,145 @@
+"""
+Serialización JSON con fragmentos pre-codificados.
+
+Cada anime se codifica una sola vez por versión de datos y las respuestas se
+arman concatenando esos bytes. Hay dos representaciones: 'card' (listados y
+resultados de búsqueda) solo lleva CARD_FIELDS, sin las descripciones largas;
+'detail' (/api/anime/<id>) es el documento completo. orjson se usa si está
+instalado; si no, json estándar.
+"""
+import json
+from flask import Response
+
+from config import Config
+from services import metrics
+from services.cache import LRUCache
+from utils import limpiar_html
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+_fragments = LRUCache(maxsize=Config.FRAGMENT_CACHE_SIZE)
+
+# Lo que necesitan las tarjetas y la ordenación en el cliente; el resto sale en 'detail'
+CARD_FIELDS = ('id', 'main_title', 'title', 'cover_image', 'genres', 'tags', 'score',
+               'year', 'season', 'format', 'episodes', 'status', 'studios', 'popularity')
+
+
+def dumps(obj):
+    """Codifica a bytes JSON (UTF-8)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # claves no-string, enteros enormes, etc.
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def _prepare(anime, kind):
+    """Normaliza un documento de MongoDB para la salida"""
+    if kind == 'card':
+        return {field: anime[field] for field in CARD_FIELDS if field in anime}
+    anime = dict(anime)
+    if '_id' in anime:
+        anime['_id'] = str(anime['_id'])
+    anime.pop('embedding', None)
+    anime.pop('similarity_score', None)
+    if 'description_clean' not in anime:
+        anime['description_clean'] = limpiar_html(anime.get('description', ''))
+    return anime
+
+
+def fragment(anime, version, kind='card'):
+    """Bytes JSON de un anime, cacheados por (id, tipo, versión)"""
+    cached = cached_fragment(anime.get('id'), version, kind)
+    if cached is not None:
+        return cached
+    return _store(anime, version, kind)
+
+
+def _store(anime, version, kind):
+    encoded = dumps(_prepare(anime, kind))
+    # Sin índice cargado no hay versión que invalide el fragmento: no se cachea
+    if version is not None:
+        _fragments.set((anime.get('id'), kind, version), encoded)
+    return encoded
+
+
+def cached_fragment(anime_id, version, kind='card'):
+    if version is None:
+        return None
+    return _fragments.get((anime_id, kind, version))
+
+
+def with_score(encoded, score):
+    """Añade similarity_score a un fragmento ya codificado"""
+    return encoded[:-1] + b',"similarity_score":' + dumps(score) + b'}'
+
+
+def card_fragments(ranked, version, hydrate):
+    """
+    Fragmentos 'card' para una lista [(anime_id, score|None)].
+
+    Solo se llama a hydrate(ids) -> {id: anime} con los IDs cuyo fragmento no
+    está en caché. Los IDs que no se pueden hidratar se omiten.
+    """
+    fragments = {}
+    missing = []
+    for anime_id, _ in ranked:
+        encoded = cached_fragment(anime_id, version)
+        if encoded is None:
+            missing.append(anime_id)
+        else:
+            fragments[anime_id] = encoded
+
+    if missing:
+        hydrated = hydrate(missing)
+        # Codificación de los documentos que no estaban en caché (camino frío)
+        with metrics.stage('encode'):
+            for anime_id, anime in hydrated.items():
+                fragments[anime_id] = _store(anime, version, 'card')
+
+    out = []
+    for anime_id, score in ranked:
+        encoded = fragments.get(anime_id)
+        if encoded is None:
+            continue
+        out.append(encoded if score is None else with_score(encoded, score))
+    return out
+
+
+def fragment_response(payload, lists=None, status=200, headers=None):
+    """
+    Respuesta JSON armada a partir de un dict normal y listas de fragmentos.
+
+    lists = {'results': [b'{...}', ...]} se inserta como arrays JSON sin
+    volver a codificar sus elementos. Es el único punto que mide la etapa 'serialize'.
+    """
+    with metrics.stage('serialize'):
+        body = dumps(payload)
+        if lists:
+            parts = [body[:-1]]
+            first = body == b'{}'
+            for name, fragments in lists.items():
+                prefix = b'' if first else b','
+                parts.append(prefix + dumps(name) + b':[' + b','.join(fragments) + b']')
+                first = False
+            parts.append(b'}')
+            body = b''.join(parts)
+    return Response(body, status=status, headers=headers, mimetype='application/json')
+
+
+def json_response(payload, status=200, headers=None):
+    """Equivalente a jsonify usando el codificador rápido (acepta bytes ya codificados)"""
+    body = payload if isinstance(payload, bytes) else dumps(payload)
+    return Response(body, status=status, headers=headers, mimetype='application/json')
+
+
+def clear():
+    _fragments.clear()
+
+
+def stats():
+    return _fragments.stats()
@@ -0,0 +1,154 @@
+"""
+Coalescencia de llamadas idénticas en curso ("single-flight").
+
+- SingleFlight: dentro de un proceso, la primera petición con una clave hace
+  la llamada y las concurrentes con la misma clave esperan su resultado.
+- SharedFlight: lo mismo entre procesos (workers de gunicorn) con un flock por
+  clave en un directorio compartido; el resultado (un vector) se deja en
+  <dir>/<hash>.npy para que los demás workers lo lean. Requiere fcntl (POSIX);
+  sin él SharedFlight.available es False y no se usa.
+"""
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class _Call:
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, fn, timeout=None):
+        """
+        Ejecuta fn() una sola vez por clave en curso -> (valor, compartido).
+        compartido es True si el valor lo calculó otra petición. Los que esperan
+        reciben la misma excepción que el líder, o TimeoutError.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.event.wait(timeout):
+                raise TimeoutError(f"single-flight wait for {key!r} timed out")
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.value, False
+
+
+class SharedFlight:
+    """Single-flight entre procesos para funciones que devuelven un vector"""
+
+    def __init__(self, directory, ttl=600.0, poll=0.01):
+        self.directory = directory
+        self.ttl = ttl
+        self.poll = poll
+        self.available = bool(directory) and fcntl is not None
+        self._last_prune = 0.0
+
+    def _paths(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, digest)
+        return f"{base}.npy", f"{base}.lock"
+
+    def _read(self, path):
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            return np.load(path)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, vector):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                np.save(f, np.asarray(vector, dtype=np.float32))
+            os.replace(tmp, path)
+        except OSError:
+            pass  # el resultado compartido es una optimización, nunca un error
+
+    def do(self, key, fn, timeout):
+        """Como SingleFlight.do, pero coordinando con los demás procesos"""
+        os.makedirs(self.directory, exist_ok=True)
+        vector_path, lock_path = self._paths(key)
+        vector = self._read(vector_path)
+        if vector is not None:
+            return vector, True
+
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"shared single-flight lock for {key!r} timed out")
+                    time.sleep(self.poll)
+            try:
+                # Otro worker pudo terminar la misma llamada mientras esperábamos
+                vector = self._read(vector_path)
+                if vector is not None:
+                    return vector, True
+                value = fn()
+                self._write(vector_path, value)
+                return value, False
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+            self._prune()
+
+    def _prune(self):
+        """Borra de vez en cuando los resultados caducados"""
+        now = time.time()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl * 2:
+                    os.remove(path)
+            except OSError:
+                pass
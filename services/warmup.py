@@ -0,0 +1,148 @@
+"""
+Warm-up de cachés a partir del historial de búsquedas.
+
+Tras un despliegue todas las cachés están frías. El índice solo se carga al
+arrancar (app.py), así que un reindexado implica reiniciar la app y el
+warm-up se repite entonces para la nueva SearchEngine.version. run() agrega
+las consultas más frecuentes de `searches` y `anonymous_searches` en las
+últimas WARMUP_WINDOW_HOURS, calcula sus embeddings en lotes y rellena la
+caché de vectores y la de resultados exactos.
+
+Con preload_app (gunicorn.conf.py) se ejecuta una vez en el master antes del
+fork, así todos los workers nacen con las cachés calientes. Con
+WARMUP_BACKGROUND=true no bloquea el arranque, pero un hilo del master no
+sobrevive al fork: en ese caso el master no lo lanza y cada worker hace su
+propio warm-up desde el hook post_fork. /ready responde 503 mientras el
+warm-up del proceso no haya terminado.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import jsonify
+
+from config import Config
+from database import db
+from search_system import SearchEngine
+from services import embedding_service, metrics, result_cache, serialization
+from services.logging_service import get_logger
+from utils import normalizar_texto
+
+logger = get_logger('warmup')
+
+_state = {'status': 'pending', 'queries': 0, 'embedded': 0, 'results': 0, 'took_s': None, 'version': None}
+_lock = threading.Lock()
+
+
+def top_queries(window_hours, limit):
+    """Consultas normalizadas más frecuentes en la ventana -> [(consulta, veces)]"""
+    since = datetime.now() - timedelta(hours=window_hours)
+    pipeline = [
+        {'$match': {'timestamp': {'$gt': since}}},
+        {'$group': {'_id': '$query', 'count': {'$sum': 1}}},
+        {'$sort': {'count': -1}},
+        # Varias formas crudas pueden normalizarse a la misma consulta
+        {'$limit': limit * 3},
+    ]
+    counts = {}
+    for collection in (db.db.searches, db.db.anonymous_searches):
+        for row in collection.aggregate(pipeline, allowDiskUse=True):
+            if not isinstance(row['_id'], str):
+                continue
+            key = normalizar_texto(row['_id'])
+            if key:
+                counts[key] = counts.get(key, 0) + row['count']
+    return sorted(counts.items(), key=lambda item: -item[1])[:limit]
+
+
+def _warm_result(query, top_k, version):
+    """Mismo camino que search_semantic sin cuota ni registro"""
+    title_id = SearchEngine.title_match(query)
+    if title_id is not None:
+        ranked = SearchEngine.similar_to(title_id, top_k=top_k)
+        search_mode = 'title'
+    elif embedding_service.has_vector(query):
+        vector, _ = embedding_service.embed_query(query)
+        ranked = SearchEngine.rank_cached(vector, top_k=top_k)
+        search_mode = 'embeddings'
+    else:
+        return False
+    results = serialization.card_fragments(ranked, version, SearchEngine.hydrate)
+    result_cache.put(query, top_k, version, search_mode, ranked, results)
+    return True
+
+
+def run():
+    """Ejecuta el warm-up (acotado a WARMUP_MAX_SECONDS); devuelve el resumen"""
+    version = SearchEngine.version
+    with _lock:
+        _state.update(status='running', version=version)
+    start = time.monotonic()
+    deadline = start + Config.WARMUP_MAX_SECONDS
+    try:
+        with metrics.stage('warmup'):
+            queries = [q for q, _ in top_queries(Config.WARMUP_WINDOW_HOURS, Config.WARMUP_TOP_N)]
+            embedded = 0
+            batch = Config.WARMUP_BATCH_SIZE
+            # Los títulos no necesitan embedding: el atajo usa el vector ya indexado
+            to_embed = [q for q in queries if SearchEngine.title_match(q) is None]
+            for i in range(0, len(to_embed), batch):
+                if time.monotonic() > deadline:
+                    break
+                embedded += embedding_service.embed_many(to_embed[i:i + batch], batch_size=batch)
+
+            warmed = 0
+            for query in queries:
+                if time.monotonic() > deadline:
+                    break
+                if _warm_result(query, Config.WARMUP_TOP_K, version):
+                    warmed += 1
+        status = 'done'
+    except Exception:
+        # El warm-up nunca debe impedir que la app arranque
+        logger.exception("Warm-up failed")
+        queries, embedded, warmed, status = [], 0, 0, 'failed'
+
+    took = round(time.monotonic() - start, 2)
+    with _lock:
+        _state.update(status=status, queries=len(queries), embedded=embedded, results=warmed, took_s=took)
+    logger.info("Cache warm-up finished", extra=dict(_state))
+    return dict(_state)
+
+
+def start():
+    """Lanza el warm-up según la configuración (en este hilo o en segundo plano)"""
+    if not Config.WARMUP_ENABLED:
+        with _lock:
+            _state['status'] = 'disabled'
+        return
+    if Config.WARMUP_BACKGROUND:
+        if Config.WARMUP_AFTER_FORK:
+            # Master de gunicorn con preload_app: lo lanzará cada worker (start_after_fork)
+            logger.info("Cache warm-up deferred to workers")
+            return
+        _start_background()
+    else:
+        run()
+
+
+def start_after_fork():
+    """Hook post_fork: warm-up en segundo plano propio de este worker"""
+    if Config.WARMUP_ENABLED and Config.WARMUP_BACKGROUND and Config.WARMUP_AFTER_FORK:
+        _start_background()
+
+
+def _start_background():
+    threading.Thread(target=run, name='cache-warmup', daemon=True).start()
+
+
+def is_ready():
+    return SearchEngine.index is not None and _state['status'] in ('done', 'failed', 'disabled')
+
+
+def init_app(app):
+    @app.route('/ready')
+    def ready():
+        with _lock:
+            body = {'ready': is_ready(), 'index_version': SearchEngine.version, 'warmup': dict(_state)}
+        return jsonify(body), 200 if body['ready'] else 503
@@ -834,12 +834,21 @@ function mostrarResultados(animes, containerId) {
     }).join('');
 }
 
-window.verDetalle = function (id) {
-    const anime = animeById[id];
+window.verDetalle = async function (id) {
+    let anime = animeById[id];
     if (!anime) {
         alert("Error: Selected anime not found.");
         return;
     }
+    // Los listados solo traen la tarjeta; la ficha completa (descripción, banner...) sale de /api/anime/<id>
+    try {
+        const response = await fetch(`${API_URL}/api/anime/${id}`);
+        if (response.ok) {
+            anime = await response.json();
+        }
+    } catch (error) {
+        console.error('Error al cargar el detalle:', error);
+    }
     localStorage.setItem("animeSeleccionado", JSON.stringify(anime));
     window.location.href = "./detalle.html";
 };
@@ -1,4 +1,5 @@
 import re
+import hashlib
 import unicodedata
 import secrets
 
@@ -19,6 +20,10 @@ def normalizar_texto(texto):
     )
     return texto
 
+def content_hash(texto):
+    """Hash estable del texto de entrada de una etapa (detecta cambios entre ejecuciones)"""
+    return hashlib.sha256((texto or '').encode('utf-8')).hexdigest()
+
 def generate_api_key():
     """Genera una clave API única"""
     return f"ask_{secrets.token_urlsafe(32)}"